@@ -2,8 +2,9 @@
 標準化角色資料模型
 將 PoB XML 資料轉換為統一的內部格式
 """
-from typing import List, Dict, Optional, Any
-from pydantic import BaseModel, Field
+import threading
+from typing import List, Dict, Optional, Any, ClassVar, Tuple
+from pydantic import BaseModel, Field, PrivateAttr
 from enum import Enum
 
 
@@ -114,6 +115,11 @@ class PassiveAllocation(BaseModel):
     # 天賦樹 URL（用於視覺化）
     tree_url: Optional[str] = Field(None, description="天賦樹 URL")
     class_start_node: Optional[int] = Field(None, description="職業起始節點 ID")
+    ascendancy_class_id: Optional[int] = Field(None, description="昇華職業 ID")
+    mastery_effects: Dict[int, int] = Field(
+        default_factory=dict,
+        description="專精節點 ID -> 已選擇的專精效果 ID"
+    )
 
 
 # ===== 寶石配置 =====
@@ -347,6 +353,12 @@ class StandardizedCharacter(BaseModel):
         description="裝備快照"
     )
     
+    # PoB 計算的能力值（固定索引向量）
+    player_stats: List[Optional[float]] = Field(
+        default_factory=list,
+        description="PlayerStat 數值，索引對應 PLAYER_STAT_NAMES，缺值為 None"
+    )
+    
     # 元資料
     source: str = Field(default="pob_import", description="資料來源")
     pob_version: Optional[str] = Field(None, description="PoB 版本")
@@ -371,4 +383,161 @@ class StandardizedCharacter(BaseModel):
                 },
                 "source": "pob_import"
             }
-        }
\ No newline at end of file
+        }
+
+
+# 惰性區段組裝鎖（所有惰性角色共用；鎖無法 pickle，不放在實例上）
+_MATERIALIZE_LOCK = threading.RLock()
+
+
+class LazyStandardizedCharacter(StandardizedCharacter):
+    """
+    惰性標準化角色模型
+
+    character_core 與元資料在解析時建立；passive_allocation、skill_setup、
+    equipment_snapshot 於首次存取時才由保留的解析狀態組裝，只用到技能的
+    比對不會付出物品解析成本。非啟用的天賦樹 Spec、SkillSet 與 ItemSet
+    可透過 get_* 方法依 ID 取用。
+
+    序列化（model_dump / dict / pickle）與比較前會先組裝所有區段；
+    pickle 會一併保留解析狀態，跨行程後仍可取用其他設定。
+    快取的角色物件會被多個工作執行緒共用，區段組裝以鎖保護，每個區段只組裝一次。
+    """
+
+    LAZY_SECTIONS: ClassVar[Tuple[str, ...]] = (
+        "passive_allocation",
+        "skill_setup",
+        "equipment_snapshot"
+    )
+
+    # 區段組裝器（提供 build_section(state, section, set_id)）與解析狀態
+    _mapper: Any = PrivateAttr(default=None)
+    _state: Any = PrivateAttr(default=None)
+    _alternates: Dict[Tuple[str, Any], Any] = PrivateAttr(default_factory=dict)
+
+    @classmethod
+    def from_state(
+        cls,
+        mapper: Any,
+        state: Any,
+        character_core: CharacterCore,
+        **metadata: Any
+    ) -> "LazyStandardizedCharacter":
+        """
+        建立尚未組裝區段的角色物件
+
+        Args:
+            mapper: 區段組裝器（PobXmlMapper）
+            state: 解析狀態（PobBuildState）
+            character_core: 已建立的核心資訊
+            **metadata: source、pob_version、import_timestamp 等元資料
+
+        Returns:
+            惰性角色物件
+        """
+        character = cls.model_construct(character_core=character_core, **metadata)
+        for section in cls.LAZY_SECTIONS:
+            character.__dict__.pop(section, None)
+        character._mapper = mapper
+        character._state = state
+        return character
+
+    def __getattr__(self, name: str) -> Any:
+        if name in type(self).LAZY_SECTIONS:
+            return self._materialize(name)
+        return super().__getattr__(name)
+
+    def _materialize(self, section: str) -> Any:
+        """組裝單一區段並寫回欄位"""
+        with _MATERIALIZE_LOCK:
+            # 等待鎖期間可能已由其他執行緒組裝完成
+            if section in self.__dict__:
+                return self.__dict__[section]
+            value = self._mapper.build_section(self._state, section)
+            self.__dict__[section] = value
+            return value
+
+    def is_materialized(self, section: str) -> bool:
+        """區段是否已組裝"""
+        return section in self.__dict__
+
+    def materialize(self) -> "LazyStandardizedCharacter":
+        """組裝所有尚未組裝的區段"""
+        for section in self.LAZY_SECTIONS:
+            if section not in self.__dict__:
+                self._materialize(section)
+        return self
+
+    # ===== 非啟用設定 =====
+
+    def list_sets(self) -> Dict[str, List[Dict[str, Any]]]:
+        """列出可取用的天賦樹 Spec、SkillSet 與 ItemSet"""
+        if self._state is None:
+            return {"tree_specs": [], "skill_sets": [], "item_sets": []}
+        return self._state.list_sets()
+
+    def get_passive_allocation(self, spec_id: Optional[int] = None) -> PassiveAllocation:
+        """取得指定天賦樹 Spec（1 起算）的配置，None 為啟用中的 Spec"""
+        return self._get_alternate("passive_allocation", spec_id)
+
+    def get_skill_setup(self, skill_set_id: Optional[str] = None) -> SkillSetup:
+        """取得指定 SkillSet 的技能配置，None 為啟用中的 SkillSet"""
+        return self._get_alternate("skill_setup", skill_set_id)
+
+    def get_equipment_snapshot(self, item_set_id: Optional[str] = None) -> EquipmentSnapshot:
+        """取得指定 ItemSet 的裝備快照，None 為啟用中的 ItemSet"""
+        return self._get_alternate("equipment_snapshot", item_set_id)
+
+    def _get_alternate(self, section: str, set_id: Any) -> Any:
+        """依設定 ID 組裝（並快取）區段"""
+        if set_id is None:
+            return getattr(self, section)
+
+        if self._state is None:
+            raise ValueError("此角色物件未保留解析狀態，無法取用其他設定")
+
+        key = (section, set_id)
+        value = self._alternates.get(key)
+        if value is None:
+            with _MATERIALIZE_LOCK:
+                value = self._alternates.get(key)
+                if value is None:
+                    value = self._mapper.build_section(self._state, section, set_id)
+                    self._alternates[key] = value
+        return value
+
+    # ===== 序列化前組裝 =====
+
+    def model_dump(self, *args: Any, **kwargs: Any) -> Dict[str, Any]:
+        self.materialize()
+        return super().model_dump(*args, **kwargs)
+
+    def model_dump_json(self, *args: Any, **kwargs: Any) -> str:
+        self.materialize()
+        return super().model_dump_json(*args, **kwargs)
+
+    def model_copy(self, *args: Any, **kwargs: Any) -> "LazyStandardizedCharacter":
+        self.materialize()
+        return super().model_copy(*args, **kwargs)
+
+    def __iter__(self):
+        self.materialize()
+        return super().__iter__()
+
+    def __eq__(self, other: Any) -> bool:
+        # 只比較欄位內容（解析狀態與組裝器不參與比較）
+        if not isinstance(other, StandardizedCharacter):
+            return NotImplemented
+        self.materialize()
+        if isinstance(other, LazyStandardizedCharacter):
+            other.materialize()
+        return self.__dict__ == other.__dict__
+
+    def __repr_args__(self):
+        self.materialize()
+        return super().__repr_args__()
+
+    def __getstate__(self) -> Dict[Any, Any]:
+        # 跨行程傳遞時送出組裝完成的欄位，並保留解析狀態以便取用其他設定
+        self.materialize()
+        return super().__getstate__()
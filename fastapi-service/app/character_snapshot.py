@@ -0,0 +1,622 @@
+"""
+標準化角色二進位快照
+以版本化的緊湊二進位格式編碼 StandardizedCharacter，
+用於跨行程傳遞、快取與磁碟保存，解碼時不重新驗證
+"""
+import json
+import pickle
+import struct
+import sys
+import time
+import typing
+from array import array
+from enum import Enum
+from typing import Any, Dict, List, Tuple, Type
+import logging
+
+from pydantic import BaseModel
+
+from app.character_models import StandardizedCharacter, LazyStandardizedCharacter
+from app.pob_build_state import PobBuildState
+
+logger = logging.getLogger(__name__)
+
+
+# 格式識別與版本（欄位結構改變時遞增）
+SNAPSHOT_MAGIC = b"PCS"
+SNAPSHOT_VERSION = 3
+
+# 標頭旗標
+_FLAG_BUILD_STATE = 0x01
+
+# 動態值型別標記（用於 Dict[str, Any] 等非固定結構欄位）
+_TAG_NONE = 0
+_TAG_FALSE = 1
+_TAG_TRUE = 2
+_TAG_INT = 3
+_TAG_FLOAT = 4
+_TAG_STR = 5
+_TAG_LIST = 6
+_TAG_DICT = 7
+
+# 整數陣列打包格式
+_ARRAY_INT32 = 0
+_ARRAY_INT64 = 1
+
+_INT32_MIN = -(1 << 31)
+_INT32_MAX = (1 << 31) - 1
+
+_FLOAT = struct.Struct("<d")
+_NEEDS_BYTESWAP = sys.byteorder != "little"
+
+
+# ===== 欄位編碼計畫 =====
+
+# 欄位種類
+_KIND_INT = "int"
+_KIND_FLOAT = "float"
+_KIND_BOOL = "bool"
+_KIND_STR = "str"
+_KIND_ENUM = "enum"
+_KIND_MODEL = "model"
+_KIND_INT_LIST = "int_list"
+_KIND_INT_MAP = "int_map"
+_KIND_LIST = "list"
+_KIND_ANY = "any"
+
+# 模型類別 -> [(欄位名稱, 欄位種類, 是否可為 None, 附加資訊)]
+_PLANS: Dict[Type[BaseModel], List[Tuple[str, str, bool, Any]]] = {}
+
+
+def _field_kind(annotation: Any) -> Tuple[str, bool, Any]:
+    """依型別註記判斷欄位種類"""
+    optional = False
+    origin = typing.get_origin(annotation)
+
+    if origin is typing.Union:
+        args = [arg for arg in typing.get_args(annotation) if arg is not type(None)]
+        optional = True
+        annotation = args[0] if len(args) == 1 else Any
+        origin = typing.get_origin(annotation)
+
+    if origin in (list, List):
+        (item_type,) = typing.get_args(annotation) or (Any,)
+        if item_type is int:
+            return _KIND_INT_LIST, optional, None
+        item_kind = _field_kind(item_type)
+        return _KIND_LIST, optional, item_kind
+
+    if origin in (dict, Dict) and typing.get_args(annotation) == (int, int):
+        return _KIND_INT_MAP, optional, None
+
+    if isinstance(annotation, type):
+        if issubclass(annotation, BaseModel):
+            return _KIND_MODEL, optional, annotation
+        if issubclass(annotation, Enum):
+            return _KIND_ENUM, optional, annotation
+        if annotation is bool:
+            return _KIND_BOOL, optional, None
+        if annotation is int:
+            return _KIND_INT, optional, None
+        if annotation is float:
+            return _KIND_FLOAT, optional, None
+        if annotation is str:
+            return _KIND_STR, optional, None
+
+    return _KIND_ANY, optional, None
+
+
+def _get_plan(model_cls: Type[BaseModel]) -> List[Tuple[str, str, bool, Any]]:
+    """取得（必要時建立）模型的欄位編碼計畫（依欄位宣告順序）"""
+    plan = _PLANS.get(model_cls)
+    if plan is None:
+        plan = []
+        for name, field in model_cls.model_fields.items():
+            kind, optional, extra = _field_kind(field.annotation)
+            plan.append((name, kind, optional, extra))
+        _PLANS[model_cls] = plan
+    return plan
+
+
+# ===== 編碼 =====
+
+class _SnapshotWriter:
+    """快照寫入器（字串統一存入字串池，內文只記錄索引）"""
+
+    def __init__(self):
+        self.buffer = bytearray()
+        self.strings: Dict[str, int] = {}
+
+    def varint(self, value: int):
+        """寫入無號變長整數"""
+        buffer = self.buffer
+        while value > 0x7F:
+            buffer.append((value & 0x7F) | 0x80)
+            value >>= 7
+        buffer.append(value)
+
+    def int(self, value: int):
+        """寫入有號整數（zigzag）"""
+        self.varint((value << 1) if value >= 0 else ((-value << 1) - 1))
+
+    def string(self, value: str):
+        """寫入字串池索引"""
+        index = self.strings.get(value)
+        if index is None:
+            index = len(self.strings)
+            self.strings[value] = index
+        self.varint(index)
+
+    def int_array(self, values: List[int]):
+        """寫入打包整數陣列"""
+        self.varint(len(values))
+        if not values:
+            return
+        if _INT32_MIN <= min(values) and max(values) <= _INT32_MAX:
+            self.buffer.append(_ARRAY_INT32)
+            packed = array("i", values)
+        else:
+            self.buffer.append(_ARRAY_INT64)
+            packed = array("q", values)
+        if _NEEDS_BYTESWAP:
+            packed.byteswap()
+        self.buffer += packed.tobytes()
+
+    def model(self, model: BaseModel):
+        """依欄位計畫寫入模型"""
+        plan = _get_plan(type(model))
+        values = model.__dict__
+
+        # 已設定欄位的位元遮罩（還原 model_fields_set）
+        fields_set = model.model_fields_set
+        mask = 0
+        for bit, (name, _, _, _) in enumerate(plan):
+            if name in fields_set:
+                mask |= 1 << bit
+        self.varint(mask)
+
+        for name, kind, optional, extra in plan:
+            value = values[name] if name in values else getattr(model, name)
+            if optional:
+                if value is None:
+                    self.buffer.append(0)
+                    continue
+                self.buffer.append(1)
+            self.value(kind, extra, value)
+
+    def value(self, kind: str, extra: Any, value: Any):
+        """依欄位種類寫入單一值"""
+        if kind == _KIND_STR:
+            self.string(value)
+        elif kind == _KIND_INT:
+            self.int(value)
+        elif kind == _KIND_BOOL:
+            self.buffer.append(1 if value else 0)
+        elif kind == _KIND_ENUM:
+            self.string(value.value)
+        elif kind == _KIND_MODEL:
+            self.model(value)
+        elif kind == _KIND_INT_LIST:
+            self.int_array(value)
+        elif kind == _KIND_INT_MAP:
+            self.int_array(list(value.keys()))
+            self.int_array(list(value.values()))
+        elif kind == _KIND_LIST:
+            item_kind, item_optional, item_extra = extra
+            self.varint(len(value))
+            for item in value:
+                if item_optional:
+                    if item is None:
+                        self.buffer.append(0)
+                        continue
+                    self.buffer.append(1)
+                self.value(item_kind, item_extra, item)
+        elif kind == _KIND_FLOAT:
+            self.buffer += _FLOAT.pack(value)
+        else:
+            self.dynamic(value)
+
+    def dynamic(self, value: Any):
+        """寫入帶型別標記的動態值"""
+        buffer = self.buffer
+        if value is None:
+            buffer.append(_TAG_NONE)
+        elif value is True:
+            buffer.append(_TAG_TRUE)
+        elif value is False:
+            buffer.append(_TAG_FALSE)
+        elif isinstance(value, int):
+            buffer.append(_TAG_INT)
+            self.int(value)
+        elif isinstance(value, float):
+            buffer.append(_TAG_FLOAT)
+            buffer += _FLOAT.pack(value)
+        elif isinstance(value, str):
+            buffer.append(_TAG_STR)
+            self.string(value)
+        elif isinstance(value, (list, tuple)):
+            buffer.append(_TAG_LIST)
+            self.varint(len(value))
+            for item in value:
+                self.dynamic(item)
+        elif isinstance(value, dict):
+            buffer.append(_TAG_DICT)
+            self.varint(len(value))
+            for key, item in value.items():
+                self.string(key)
+                self.dynamic(item)
+        else:
+            raise TypeError(f"快照不支援的值型別: {type(value).__name__}")
+
+    def build_state(self, state: PobBuildState):
+        """寫入 PoB 解析狀態（保留非啟用設定的取用能力）"""
+        self.string(state.version)
+        self.dynamic(dict(state.build_attrs or {}))
+        self.dynamic(sorted(state.sections))
+        self.int(state.active_spec_id)
+        self.string(state.active_skill_set_id)
+        self.string(state.active_item_set_id)
+
+        self.varint(len(state.specs))
+        for spec_attrs, node_ids, tree_url in state.specs:
+            self.dynamic(dict(spec_attrs))
+            self.int_array(node_ids)
+            self.dynamic(tree_url)
+
+        self.dynamic([
+            [dict(set_attrs), [[dict(skill_attrs), [dict(g) for g in gems]] for skill_attrs, gems in skills]]
+            for set_attrs, skills in state.skill_sets
+        ])
+        self.dynamic(state.item_texts)
+        self.dynamic([[dict(set_attrs), slots] for set_attrs, slots in state.item_sets])
+
+    def finish(self, flags: int) -> bytes:
+        """組合標頭、字串池與內文"""
+        header = _SnapshotWriter()
+        header.buffer += SNAPSHOT_MAGIC
+        header.buffer.append(SNAPSHOT_VERSION)
+        header.buffer.append(flags)
+        header.varint(len(self.strings))
+        for text in self.strings:
+            encoded = text.encode("utf-8", errors="surrogatepass")
+            header.varint(len(encoded))
+            header.buffer += encoded
+        return bytes(header.buffer + self.buffer)
+
+
+def encode_character(
+    character: StandardizedCharacter,
+    include_build_state: bool = False
+) -> bytes:
+    """
+    將標準化角色編碼為二進位快照
+
+    Args:
+        character: 標準化角色物件（惰性角色會先組裝所有區段）
+        include_build_state: 是否一併保存解析狀態（解碼後可取用非啟用的設定）
+
+    Returns:
+        快照位元組
+    """
+    writer = _SnapshotWriter()
+    flags = 0
+
+    if isinstance(character, LazyStandardizedCharacter):
+        character.materialize()
+        if include_build_state and character._state is not None:
+            flags |= _FLAG_BUILD_STATE
+
+    writer.model(character)
+    if flags & _FLAG_BUILD_STATE:
+        writer.build_state(character._state)
+
+    return writer.finish(flags)
+
+
+# ===== 解碼 =====
+
+_object_setattr = object.__setattr__
+
+
+def _construct(model_cls: Type[BaseModel], values: Dict[str, Any], fields_set: set) -> BaseModel:
+    """
+    直接建立模型實例（與 model_construct 相同語意，但省略預設值處理）
+
+    快照中已包含每個欄位的值，因此可直接寫入實例屬性。
+    """
+    instance = model_cls.__new__(model_cls)
+    _object_setattr(instance, "__dict__", values)
+    _object_setattr(instance, "__pydantic_fields_set__", fields_set)
+    _object_setattr(instance, "__pydantic_extra__", None)
+    _object_setattr(instance, "__pydantic_private__", None)
+    return instance
+
+
+class _SnapshotReader:
+    """快照讀取器"""
+
+    def __init__(self, data: bytes):
+        self.data = memoryview(data)
+        self.pos = 0
+        self.strings: List[str] = []
+
+    def varint(self) -> int:
+        """讀取無號變長整數"""
+        data = self.data
+        pos = self.pos
+        result = 0
+        shift = 0
+        while True:
+            byte = data[pos]
+            pos += 1
+            result |= (byte & 0x7F) << shift
+            if byte < 0x80:
+                break
+            shift += 7
+        self.pos = pos
+        return result
+
+    def int(self) -> int:
+        """讀取有號整數（zigzag）"""
+        value = self.varint()
+        return (value >> 1) if not value & 1 else -((value + 1) >> 1)
+
+    def byte(self) -> int:
+        """讀取單一位元組"""
+        value = self.data[self.pos]
+        self.pos += 1
+        return value
+
+    def string(self) -> str:
+        """讀取字串池中的字串"""
+        return self.strings[self.varint()]
+
+    def int_array(self) -> List[int]:
+        """讀取打包整數陣列"""
+        count = self.varint()
+        if not count:
+            return []
+        typecode = "i" if self.byte() == _ARRAY_INT32 else "q"
+        packed = array(typecode)
+        end = self.pos + count * packed.itemsize
+        packed.frombytes(self.data[self.pos:end])
+        if _NEEDS_BYTESWAP:
+            packed.byteswap()
+        self.pos = end
+        return packed.tolist()
+
+    def model(self, model_cls: Type[BaseModel]) -> BaseModel:
+        """依欄位計畫讀取模型（不重新驗證）"""
+        plan = _get_plan(model_cls)
+        mask = self.varint()
+
+        values = {}
+        fields_set = set()
+        for bit, (name, kind, optional, extra) in enumerate(plan):
+            if mask >> bit & 1:
+                fields_set.add(name)
+            if optional and not self.byte():
+                values[name] = None
+                continue
+            values[name] = self.value(kind, extra)
+
+        return _construct(model_cls, values, fields_set)
+
+    def value(self, kind: str, extra: Any) -> Any:
+        """依欄位種類讀取單一值"""
+        if kind == _KIND_STR:
+            return self.string()
+        if kind == _KIND_INT:
+            return self.int()
+        if kind == _KIND_BOOL:
+            return self.byte() == 1
+        if kind == _KIND_ENUM:
+            return extra(self.string())
+        if kind == _KIND_MODEL:
+            return self.model(extra)
+        if kind == _KIND_INT_LIST:
+            return self.int_array()
+        if kind == _KIND_INT_MAP:
+            keys = self.int_array()
+            return dict(zip(keys, self.int_array()))
+        if kind == _KIND_LIST:
+            item_kind, item_optional, item_extra = extra
+            items = []
+            for _ in range(self.varint()):
+                if item_optional and not self.byte():
+                    items.append(None)
+                    continue
+                items.append(self.value(item_kind, item_extra))
+            return items
+        if kind == _KIND_FLOAT:
+            return self.float()
+        return self.dynamic()
+
+    def float(self) -> float:
+        """讀取 64 位元浮點數"""
+        (value,) = _FLOAT.unpack_from(self.data, self.pos)
+        self.pos += _FLOAT.size
+        return value
+
+    def dynamic(self) -> Any:
+        """讀取帶型別標記的動態值"""
+        tag = self.byte()
+        if tag == _TAG_NONE:
+            return None
+        if tag == _TAG_TRUE:
+            return True
+        if tag == _TAG_FALSE:
+            return False
+        if tag == _TAG_INT:
+            return self.int()
+        if tag == _TAG_FLOAT:
+            return self.float()
+        if tag == _TAG_STR:
+            return self.string()
+        if tag == _TAG_LIST:
+            return [self.dynamic() for _ in range(self.varint())]
+        if tag == _TAG_DICT:
+            result = {}
+            for _ in range(self.varint()):
+                key = self.string()
+                result[key] = self.dynamic()
+            return result
+        raise ValueError(f"快照資料損壞：未知的型別標記 {tag}")
+
+    def build_state(self) -> PobBuildState:
+        """讀取 PoB 解析狀態"""
+        state = PobBuildState()
+        state.version = self.string()
+        state.build_attrs = self.dynamic()
+        state.sections = set(self.dynamic())
+        state.active_spec_id = self.int()
+        state.active_skill_set_id = self.string()
+        state.active_item_set_id = self.string()
+
+        for _ in range(self.varint()):
+            spec_attrs = self.dynamic()
+            node_ids = self.int_array()
+            state.specs.append((spec_attrs, node_ids, self.dynamic()))
+
+        state.skill_sets = [
+            (set_attrs, [(skill_attrs, gems) for skill_attrs, gems in skills])
+            for set_attrs, skills in self.dynamic()
+        ]
+        state.item_texts = self.dynamic()
+        state.item_sets = [(set_attrs, slots) for set_attrs, slots in self.dynamic()]
+        return state
+
+
+def decode_character(data: bytes) -> StandardizedCharacter:
+    """
+    將二進位快照解碼為標準化角色
+
+    含解析狀態的快照會還原為 LazyStandardizedCharacter（可取用非啟用的設定）。
+
+    Args:
+        data: 快照位元組
+
+    Returns:
+        標準化角色物件
+
+    Raises:
+        ValueError: 格式或版本不符、資料損壞
+    """
+    if data[:len(SNAPSHOT_MAGIC)] != SNAPSHOT_MAGIC:
+        raise ValueError("不是角色快照資料")
+
+    reader = _SnapshotReader(data)
+    reader.pos = len(SNAPSHOT_MAGIC)
+    version = reader.byte()
+    if version != SNAPSHOT_VERSION:
+        raise ValueError(f"不支援的快照版本: {version}（目前為 {SNAPSHOT_VERSION}）")
+    flags = reader.byte()
+
+    try:
+        strings = reader.strings
+        data_view = reader.data
+        for _ in range(reader.varint()):
+            length = reader.varint()
+            strings.append(
+                str(data_view[reader.pos:reader.pos + length], "utf-8", "surrogatepass")
+            )
+            reader.pos += length
+
+        character = reader.model(StandardizedCharacter)
+
+        if flags & _FLAG_BUILD_STATE:
+            # 延遲匯入避免循環依賴（pob_xml_mapper 匯入模型模組）
+            from app.pob_xml_mapper import get_pob_mapper
+
+            state = reader.build_state()
+            lazy = LazyStandardizedCharacter.from_state(
+                get_pob_mapper(state.version),
+                state,
+                character.character_core
+            )
+            lazy.__dict__.update(character.__dict__)
+            object.__setattr__(lazy, "__pydantic_fields_set__", character.model_fields_set)
+            character = lazy
+    except (IndexError, KeyError, struct.error) as e:
+        raise ValueError(f"快照資料損壞: {str(e)}")
+
+    return character
+
+
+# ===== 效能比較 =====
+
+def benchmark_snapshot(
+    character: StandardizedCharacter,
+    rounds: int = 200
+) -> Dict[str, Any]:
+    """
+    比較快照與 .dict() + JSON、pickle 的大小與速度
+
+    Args:
+        character: 標準化角色物件
+        rounds: 每項測量的重複次數
+
+    Returns:
+        各格式的大小（位元組）與平均編碼 / 解碼時間（毫秒）
+    """
+    def measure(func, arg):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            result = func(arg)
+        return result, (time.perf_counter() - start) / rounds * 1000
+
+    snapshot, snapshot_encode_ms = measure(encode_character, character)
+    decoded, snapshot_decode_ms = measure(decode_character, snapshot)
+    if decoded != character:
+        raise AssertionError("快照往返結果與原始角色不一致")
+
+    json_payload, json_encode_ms = measure(
+        lambda c: json.dumps(c.dict()).encode("utf-8"),
+        character
+    )
+    _, json_decode_ms = measure(
+        lambda data: StandardizedCharacter(**json.loads(data)),
+        json_payload
+    )
+
+    pickle_payload, pickle_encode_ms = measure(pickle.dumps, character)
+    _, pickle_decode_ms = measure(pickle.loads, pickle_payload)
+
+    return {
+        "snapshot": {
+            "bytes": len(snapshot),
+            "encode_ms": snapshot_encode_ms,
+            "decode_ms": snapshot_decode_ms
+        },
+        "dict_json": {
+            "bytes": len(json_payload),
+            "encode_ms": json_encode_ms,
+            "decode_ms": json_decode_ms
+        },
+        "pickle": {
+            "bytes": len(pickle_payload),
+            "encode_ms": pickle_encode_ms,
+            "decode_ms": pickle_decode_ms
+        }
+    }
+
+
+if __name__ == "__main__":
+    # 用法：python -m app.character_snapshot <PoB 代碼檔案> [重複次數]
+    from app.comparison_api_endpoints import standardize_character_from_pob
+
+    if len(sys.argv) < 2:
+        print("用法: python -m app.character_snapshot <PoB 代碼檔案> [重複次數]")
+        sys.exit(1)
+
+    with open(sys.argv[1], "r", encoding="utf-8") as f:
+        pob_code = f.read()
+
+    rounds = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    result = benchmark_snapshot(standardize_character_from_pob(pob_code, lazy_load=False), rounds)
+
+    for name, stats in result.items():
+        print(
+            f"{name:10s} {stats['bytes']:>9,d} bytes  "
+            f"encode {stats['encode_ms']:.3f} ms  decode {stats['decode_ms']:.3f} ms"
+        )
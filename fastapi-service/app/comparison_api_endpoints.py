@@ -3,15 +3,28 @@ FastAPI 端點整合
 將標準化流程整合到 API 層
 """
 from fastapi import FastAPI, HTTPException
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Iterator, AsyncIterator, Tuple
+import asyncio
+import json
 import base64
+import binascii
 import zlib
 import xml.etree.ElementTree as ET
 import logging
 
 from app.character_models import StandardizedCharacter
-from app.pob_xml_mapper import PobXmlMapper
+from app.pob_stream_mapper import StreamingPobXmlMapper
+from app.pob_parse_cache import (
+    pob_parse_cache,
+    pob_cache_key,
+    POB_CODE_NORMALIZE_TABLE
+)
+from app.worker_pool import worker_pool
+from app.static_data import static_data
+from app.character_snapshot import encode_character, decode_character
+from app.player_stats import PLAYER_STAT_NAMES
 from app.priority_comparison_engine import (
     PriorityComparisonEngine,
     ComparisonDifference,
@@ -28,6 +41,12 @@ class PobCodeRequest(BaseModel):
     pob_code: str
 
 
+class PobBatchRequest(BaseModel):
+    """PoB 批次解析請求"""
+    pob_codes: List[str]
+    lazy_load: bool = True
+
+
 class CharacterComparisonRequest(BaseModel):
     """角色比對請求"""
     player_pob_code: str
@@ -48,12 +67,149 @@ class ComparisonResponse(BaseModel):
 
 # ===== 核心服務函數 =====
 
-def decode_and_parse_pob(pob_code: str) -> ET.Element:
+# 單次批次解析的 PoB 代碼數量上限
+MAX_BATCH_POB_CODES = 500
+
+# 解壓縮後 XML 大小上限（超過即視為惡意壓縮炸彈）
+MAX_INFLATED_POB_BYTES = 8 * 1024 * 1024
+
+# 串流解碼區塊大小（base64 字元數 / 解壓輸出位元組數）
+_BASE64_CHUNK_CHARS = 64 * 1024
+_INFLATE_CHUNK_BYTES = 64 * 1024
+
+
+class PobPayloadStream:
+    """
+    PoB 代碼串流解碼器
+    
+    以固定大小區塊依序完成 base64 解碼與 zlib 解壓縮，逐段產出 XML 位元組，
+    可直接送入 XML 解析器而不需保留完整的中間副本。解壓後總大小超過
+    max_inflated_size 時立即中止。
+    """
+    
+    def __init__(
+        self,
+        pob_code: str,
+        max_inflated_size: int = MAX_INFLATED_POB_BYTES
+    ):
+        """
+        初始化解碼器
+        
+        Args:
+            pob_code: Base64 編碼的 PoB 字串
+            max_inflated_size: 解壓後大小上限（位元組）
+        """
+        self.pob_code = pob_code
+        self.max_inflated_size = max_inflated_size
+        self.inflated_size = 0
+    
+    def __iter__(self) -> Iterator[bytes]:
+        """
+        逐段產出解壓後的 XML 位元組
+        
+        Raises:
+            ValueError: 解碼、解壓縮失敗或超過大小上限
+        """
+        try:
+            yield from self._inflate(self._iter_compressed())
+        except (binascii.Error, zlib.error) as e:
+            logger.error(f"PoB 解析失敗: {str(e)}")
+            raise ValueError(f"PoB 代碼解析失敗: {str(e)}")
+    
+    def _iter_compressed(self) -> Iterator[bytes]:
+        """逐段 base64 解碼（清理空白並統一 URL-safe 字母表）"""
+        pob_code = self.pob_code
+        carry = ""
+        
+        for offset in range(0, len(pob_code), _BASE64_CHUNK_CHARS):
+            piece = carry + pob_code[offset:offset + _BASE64_CHUNK_CHARS].translate(
+                POB_CODE_NORMALIZE_TABLE
+            )
+            # 只解碼 4 字元對齊的部分，餘數留給下一段
+            usable = len(piece) - len(piece) % 4
+            if usable:
+                yield base64.b64decode(piece[:usable])
+            carry = piece[usable:]
+        
+        # 補齊 padding
+        if carry:
+            yield base64.b64decode(carry + "=" * (-len(carry) % 4))
+    
+    def _inflate(self, compressed_chunks: Iterator[bytes]) -> Iterator[bytes]:
+        """逐段解壓縮並檢查大小上限"""
+        decompressor = None
+        
+        for data in compressed_chunks:
+            if decompressor is None:
+                if not data:
+                    continue
+                # 依標頭判斷 zlib 或 raw deflate 格式
+                wbits = zlib.MAX_WBITS if _has_zlib_header(data) else -zlib.MAX_WBITS
+                decompressor = zlib.decompressobj(wbits)
+            
+            while True:
+                output = decompressor.decompress(data, _INFLATE_CHUNK_BYTES)
+                data = decompressor.unconsumed_tail
+                
+                if output:
+                    self.inflated_size += len(output)
+                    if self.inflated_size > self.max_inflated_size:
+                        logger.warning(
+                            f"PoB 解壓後大小超過上限 {self.max_inflated_size} bytes，中止解析"
+                        )
+                        raise ValueError(
+                            f"PoB 代碼解析失敗: 解壓後資料超過 {self.max_inflated_size} bytes 上限"
+                        )
+                    yield output
+                
+                if decompressor.eof or (not data and len(output) < _INFLATE_CHUNK_BYTES):
+                    break
+            
+            if decompressor.eof:
+                break
+        
+        if decompressor is None or not decompressor.eof:
+            raise zlib.error("incomplete or truncated stream")
+
+
+def _has_zlib_header(data: bytes) -> bool:
+    """判斷資料是否以合法的 zlib 標頭開始"""
+    if len(data) < 2:
+        return False
+    cmf, flg = data[0], data[1]
+    return (cmf & 0x0F) == 8 and (cmf * 256 + flg) % 31 == 0
+
+
+def decode_pob_payload(
+    pob_code: str,
+    max_inflated_size: int = MAX_INFLATED_POB_BYTES
+) -> bytes:
+    """
+    解碼 PoB 代碼為完整的 XML 位元組
+    
+    Args:
+        pob_code: Base64 編碼的 PoB 字串
+        max_inflated_size: 解壓後大小上限（位元組）
+        
+    Returns:
+        解壓縮後的 XML 位元組
+        
+    Raises:
+        ValueError: 解碼、解壓縮失敗或超過大小上限
+    """
+    return b"".join(PobPayloadStream(pob_code, max_inflated_size))
+
+
+def decode_and_parse_pob(
+    pob_code: str,
+    max_inflated_size: int = MAX_INFLATED_POB_BYTES
+) -> ET.Element:
     """
     解碼並解析 PoB 代碼
     
     Args:
         pob_code: Base64 編碼的 PoB 字串
+        max_inflated_size: 解壓後大小上限（位元組）
         
     Returns:
         XML 根節點
@@ -62,35 +218,59 @@ def decode_and_parse_pob(pob_code: str) -> ET.Element:
         ValueError: 解碼或解析失敗
     """
     try:
-        # 清理代碼
-        pob_code_clean = pob_code.replace(' ', '').replace('\n', '').replace('\r', '')
-        
-        # 補齊 padding
-        missing_padding = len(pob_code_clean) % 4
-        if missing_padding:
-            pob_code_clean += '=' * (4 - missing_padding)
-        
-        # Base64 解碼
-        try:
-            decoded = base64.urlsafe_b64decode(pob_code_clean)
-        except Exception:
-            decoded = base64.b64decode(pob_code_clean)
-        
-        # Zlib 解壓縮
-        try:
-            decompressed = zlib.decompress(decoded)
-        except zlib.error:
-            decompressed = zlib.decompress(decoded, -zlib.MAX_WBITS)
-        
-        # XML 解析
-        xml_string = decompressed.decode('utf-8')
-        root = ET.fromstring(xml_string)
+        parser = ET.XMLParser()
+        for chunk in PobPayloadStream(pob_code, max_inflated_size):
+            parser.feed(chunk)
+        return parser.close()
+    except ET.ParseError as e:
+        logger.error(f"PoB 解析失敗: {str(e)}")
+        raise ValueError(f"PoB 代碼解析失敗: {str(e)}")
+
+
+def parse_pob_uncached(
+    pob_code: str,
+    lazy_load: bool = True
+) -> Tuple[StandardizedCharacter, int]:
+    """
+    解碼並映射 PoB 代碼（不經過快取）
+    
+    可在工作行程中執行：參數與返回值皆可被 pickle。
+    
+    Args:
+        pob_code: PoB 代碼
+        lazy_load: 是否惰性載入
         
-        return root
+    Returns:
+        (標準化角色物件, 解壓後 XML 大小)
         
-    except Exception as e:
+    Raises:
+        ValueError: 解碼或解析失敗
+    """
+    # 解壓縮片段直接送入串流映射器，不保留完整 XML 副本
+    payload = PobPayloadStream(pob_code)
+    try:
+        character = StreamingPobXmlMapper().extract_from_chunks(payload, lazy_load)
+    except ET.ParseError as e:
         logger.error(f"PoB 解析失敗: {str(e)}")
         raise ValueError(f"PoB 代碼解析失敗: {str(e)}")
+    
+    return character, payload.inflated_size
+
+
+def parse_pob_to_snapshot(
+    pob_code: str,
+    lazy_load: bool = True
+) -> Tuple[bytes, int]:
+    """
+    解碼並映射 PoB 代碼，以二進位快照返回（供工作行程使用）
+    
+    快照保留解析狀態，主行程解碼後仍可取用非啟用的設定。
+    
+    Returns:
+        (角色快照, 解壓後 XML 大小)
+    """
+    character, inflated_size = parse_pob_uncached(pob_code, lazy_load=False)
+    return encode_character(character, include_build_state=True), inflated_size
 
 
 def standardize_character_from_pob(
@@ -100,6 +280,9 @@ def standardize_character_from_pob(
     """
     從 PoB 代碼標準化角色資料
     
+    相同內容的 PoB 代碼會命中解析快取，直接返回共用的角色物件
+    （跳過 base64、zlib、XML 與映射），呼叫端不可修改返回值。
+    
     Args:
         pob_code: PoB 代碼
         lazy_load: 是否惰性載入
@@ -107,12 +290,48 @@ def standardize_character_from_pob(
     Returns:
         標準化角色物件
     """
-    # 解析 XML
-    root = decode_and_parse_pob(pob_code)
+    cache_key = pob_cache_key(pob_code, lazy_load)
+    cached = pob_parse_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    character, inflated_size = parse_pob_uncached(pob_code, lazy_load)
     
-    # 轉換為標準化格式
-    mapper = PobXmlMapper()
-    character = mapper.extract_standardized_character(root, lazy_load)
+    # 以解壓後 XML 大小作為快取成本
+    pob_parse_cache.put(cache_key, character, inflated_size)
+    
+    return character
+
+
+async def standardize_character_async(
+    pob_code: str,
+    lazy_load: bool = True
+) -> StandardizedCharacter:
+    """
+    非同步標準化角色資料
+    
+    快取查詢在本行程完成，未命中時才將解碼與映射交給工作池，
+    事件迴圈在解析期間可繼續處理其他請求。
+    
+    Args:
+        pob_code: PoB 代碼
+        lazy_load: 是否惰性載入
+        
+    Returns:
+        標準化角色物件
+    """
+    cache_key = pob_cache_key(pob_code, lazy_load)
+    cached = pob_parse_cache.get(cache_key)
+    if cached is not None:
+        return cached
+    
+    if worker_pool.mode == "process":
+        # 跨行程以緊湊快照傳遞，主行程解碼時不重新驗證
+        snapshot, inflated_size = await worker_pool.run(parse_pob_to_snapshot, pob_code, lazy_load)
+        character = decode_character(snapshot)
+    else:
+        character, inflated_size = await worker_pool.run(parse_pob_uncached, pob_code, lazy_load)
+    pob_parse_cache.put(cache_key, character, inflated_size)
     
     return character
 
@@ -169,6 +388,57 @@ def generate_comparison_summary(
     return summary
 
 
+def build_comparison_response(
+    player_character: StandardizedCharacter,
+    target_character: StandardizedCharacter
+) -> "ComparisonResponse":
+    """
+    執行比對並組裝回應（可在工作池中執行）
+    
+    Args:
+        player_character: 玩家角色
+        target_character: 目標角色
+        
+    Returns:
+        比對結果回應
+    """
+    # 執行優先級比對
+    logger.info("執行優先級比對分析")
+    differences, gem_differences_by_slot = compare_characters_with_priority(
+        player_character,
+        target_character
+    )
+
+    # 生成摘要
+    summary = generate_comparison_summary(differences)
+
+    # 統計有差異的裝備部位數量
+    slots_with_diff = len([s for s in gem_differences_by_slot if s.get('has_differences')])
+    logger.info(f"按裝備部位比較完成，{len(gem_differences_by_slot)} 個部位，"
+               f"{slots_with_diff} 個部位有差異")
+
+    return ComparisonResponse(
+        status="success",
+        message=f"比對完成，發現 {len(differences)} 項差異",
+        player_character=player_character.dict(),
+        target_character=target_character.dict(),
+        differences=[dict(d) for d in differences],
+        gem_differences_by_slot=[dict(s) for s in gem_differences_by_slot],
+        summary=summary
+    )
+
+
+def build_comparison_response_from_snapshots(
+    player_snapshot: bytes,
+    target_snapshot: bytes
+) -> "ComparisonResponse":
+    """由兩個角色快照執行比對（供工作行程使用）"""
+    return build_comparison_response(
+        decode_character(player_snapshot),
+        decode_character(target_snapshot)
+    )
+
+
 # ===== API 端點函數 =====
 
 async def parse_pob_endpoint(request: PobCodeRequest) -> Dict[str, Any]:
@@ -181,13 +451,18 @@ async def parse_pob_endpoint(request: PobCodeRequest) -> Dict[str, Any]:
     Returns:
         標準化角色資料
     """
+    # 天賦樹資料不可用時映射器改以節點 ID 判斷昇華節點，不阻擋解析
+    static_data.require("gems")
     try:
-        character = standardize_character_from_pob(request.pob_code)
+        character = await standardize_character_async(request.pob_code)
+        data = await worker_pool.run_local(character.dict)
         
         return {
             "status": "success",
             "message": "PoB 解析成功",
-            "data": character.dict(),
+            "data": data,
+            "available_sets": character.list_sets(),
+            "player_stat_names": PLAYER_STAT_NAMES,
             "note": "已轉換為標準化內部格式"
         }
         
@@ -212,6 +487,110 @@ async def parse_pob_endpoint(request: PobCodeRequest) -> Dict[str, Any]:
         )
 
 
+async def _parse_batch_entry(
+    indices: List[int],
+    pob_code: str,
+    lazy_load: bool
+) -> Tuple[List[int], str]:
+    """
+    解析批次中的一筆 PoB 代碼並編碼為 NDJSON 內容
+
+    Args:
+        indices: 使用此代碼的請求索引（批次內重複的代碼只解析一次）
+        pob_code: PoB 代碼
+        lazy_load: 是否惰性載入
+
+    Returns:
+        (請求索引, 不含 index 欄位的 JSON 物件內容)
+    """
+    try:
+        character = await standardize_character_async(pob_code, lazy_load)
+        body = await worker_pool.run_local(_encode_batch_success, character)
+    except ValueError as e:
+        body = _encode_batch_error("parse_error", str(e), "PoB 代碼解析失敗，請確認代碼是否完整")
+    except Exception as e:
+        logger.error(f"批次解析未預期錯誤: {str(e)}", exc_info=True)
+        body = _encode_batch_error("internal_error", str(e), "系統處理錯誤")
+
+    return indices, body
+
+
+def _encode_batch_success(character: StandardizedCharacter) -> str:
+    """編碼成功的批次項目（JSON 物件內容，不含大括號與 index）"""
+    return json.dumps({
+        "status": "success",
+        "data": character.dict()
+    }, ensure_ascii=False)[1:-1]
+
+
+def _encode_batch_error(error_type: str, message: str, user_message: str) -> str:
+    """編碼失敗的批次項目（JSON 物件內容，不含大括號與 index）"""
+    return json.dumps({
+        "status": "error",
+        "error": {
+            "error_type": error_type,
+            "message": message,
+            "user_message": user_message
+        }
+    }, ensure_ascii=False)[1:-1]
+
+
+async def parse_pob_batch_endpoint(request: PobBatchRequest) -> StreamingResponse:
+    """
+    PoB 批次解析端點
+
+    所有代碼並行解析，每完成一筆就輸出一行 NDJSON：
+      {"index": 0, "status": "success", "data": {...}}
+      {"index": 1, "status": "error", "error": {...}}
+    輸出順序為完成順序，客戶端以 index 對應請求中的位置。
+
+    Args:
+        request: 批次請求
+
+    Returns:
+        NDJSON 串流回應
+    """
+    static_data.require("gems")
+    count = len(request.pob_codes)
+    if count == 0 or count > MAX_BATCH_POB_CODES:
+        raise HTTPException(
+            status_code=400,
+            detail={
+                "error_type": "invalid_batch",
+                "message": f"批次數量必須介於 1 到 {MAX_BATCH_POB_CODES} 之間（收到 {count}）",
+                "user_message": "批次 PoB 代碼數量不符合限制"
+            }
+        )
+
+    # 批次內相同內容的代碼只解析一次
+    grouped: Dict[str, Tuple[List[int], str]] = {}
+    for index, pob_code in enumerate(request.pob_codes):
+        key = pob_cache_key(pob_code)
+        if key in grouped:
+            grouped[key][0].append(index)
+        else:
+            grouped[key] = ([index], pob_code)
+
+    async def generate_lines() -> AsyncIterator[bytes]:
+        tasks = [
+            asyncio.ensure_future(_parse_batch_entry(indices, pob_code, request.lazy_load))
+            for indices, pob_code in grouped.values()
+        ]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                indices, body = await next_done
+                yield "".join(
+                    f'{{"index": {index}, {body}}}\n' for index in indices
+                ).encode("utf-8")
+        finally:
+            # 客戶端中斷連線時取消尚未完成的解析
+            for task in tasks:
+                task.cancel()
+
+    logger.info(f"批次解析 {count} 個 PoB 代碼（{len(grouped)} 個不重複）")
+    return StreamingResponse(generate_lines(), media_type="application/x-ndjson")
+
+
 async def compare_characters_endpoint(
     request: CharacterComparisonRequest
 ) -> ComparisonResponse:
@@ -224,44 +603,27 @@ async def compare_characters_endpoint(
     Returns:
         比對結果
     """
+    static_data.require("gems")
     try:
-        # 解析並標準化兩個角色
-        logger.info("解析玩家角色")
-        player_character = standardize_character_from_pob(
-            request.player_pob_code,
-            request.lazy_load
+        # 並行解析並標準化兩個角色
+        logger.info("解析玩家與目標角色")
+        player_character, target_character = await asyncio.gather(
+            standardize_character_async(request.player_pob_code, request.lazy_load),
+            standardize_character_async(request.target_pob_code, request.lazy_load)
         )
 
-        logger.info("解析目標角色")
-        target_character = standardize_character_from_pob(
-            request.target_pob_code,
-            request.lazy_load
-        )
-
-        # 執行優先級比對
-        logger.info("執行優先級比對分析")
-        differences, gem_differences_by_slot = compare_characters_with_priority(
+        # 比對與回應組裝同樣移出事件迴圈
+        if worker_pool.mode == "process":
+            return await worker_pool.run(
+                build_comparison_response_from_snapshots,
+                encode_character(player_character),
+                encode_character(target_character)
+            )
+        return await worker_pool.run(
+            build_comparison_response,
             player_character,
             target_character
         )
-
-        # 生成摘要
-        summary = generate_comparison_summary(differences)
-
-        # 統計有差異的裝備部位數量
-        slots_with_diff = len([s for s in gem_differences_by_slot if s.get('has_differences')])
-        logger.info(f"按裝備部位比較完成，{len(gem_differences_by_slot)} 個部位，"
-                   f"{slots_with_diff} 個部位有差異")
-
-        return ComparisonResponse(
-            status="success",
-            message=f"比對完成，發現 {len(differences)} 項差異",
-            player_character=player_character.dict(),
-            target_character=target_character.dict(),
-            differences=[dict(d) for d in differences],
-            gem_differences_by_slot=[dict(s) for s in gem_differences_by_slot],
-            summary=summary
-        )
         
     except ValueError as e:
         raise HTTPException(
@@ -299,6 +661,11 @@ def register_comparison_routes(app: FastAPI):
         """解析 PoB 並返回標準化格式"""
         return await parse_pob_endpoint(request)
     
+    @app.post("/api/pob/parse-batch")
+    async def parse_pob_batch(request: PobBatchRequest):
+        """批次解析 PoB，以 NDJSON 串流逐筆返回標準化格式"""
+        return await parse_pob_batch_endpoint(request)
+    
     @app.post("/api/characters/compare")
     async def compare_characters(request: CharacterComparisonRequest):
         """比對兩個角色並返回優先級差異"""
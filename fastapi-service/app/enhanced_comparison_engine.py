@@ -2,7 +2,7 @@
 整合比對引擎
 整合天賦樹分析與裝備寶石分析功能
 """
-from typing import List, Dict, Any
+from typing import List, Dict, Any, Optional, Set, Union
 import logging
 
 from app.character_models import StandardizedCharacter
@@ -13,10 +13,13 @@ from app.priority_comparison_engine import (
     PriorityComparisonEngine
 )
 from app.passive_tree_analyzer import (
+    NodeType,
     PassiveTreeClassifier,
     PassiveTreePathFinder,
     ClusterJewelAnalyzer
 )
+from app.passive_tree_bitset import AllocationBits, AllocationSpace
+from app.passive_tree_nodes import PassiveNodeTable
 from app.equipment_gem_analyzer import (
     EquipmentAnalyzer,
     GemCombinationAnalyzer,
@@ -31,14 +34,15 @@ class EnhancedComparisonEngine(PriorityComparisonEngine):
     
     def __init__(
         self,
-        passive_tree_data: Dict = None,
+        passive_tree_data: Union[PassiveNodeTable, Dict, None] = None,
         enable_advanced_analysis: bool = True
     ):
         """
         初始化增強版引擎
         
         Args:
-            passive_tree_data: 天賦樹 JSON 資料
+            passive_tree_data: 共用節點表（建議傳入 passive_tree_service.nodes，建構不需複製資料）
+                或天賦樹 JSON 資料
             enable_advanced_analysis: 是否啟用進階分析
         """
         super().__init__()
@@ -58,6 +62,12 @@ class EnhancedComparisonEngine(PriorityComparisonEngine):
         self.gem_analyzer = GemCombinationAnalyzer()
         self.link_evaluator = LinkEvaluator()
     
+    def _resolve_allocation_space(self) -> AllocationSpace:
+        """有分類器時使用其天賦樹版本的座標系（各類型遮罩與分類器一致）"""
+        if self.tree_classifier and self.tree_classifier.space is not None:
+            return self.tree_classifier.space
+        return super()._resolve_allocation_space()
+    
     def compare_characters(
         self,
         player_character: StandardizedCharacter,
@@ -109,26 +119,17 @@ class EnhancedComparisonEngine(PriorityComparisonEngine):
         """天賦樹深度分析"""
         logger.info("開始天賦樹深度分析")
         
+        player_bits = self._allocation_bits(player)
+        target_bits = self._allocation_bits(target)
         player_nodes = set(player.passive_allocation.allocated_nodes)
-        target_nodes = set(target.passive_allocation.allocated_nodes)
-        
-        # 分類節點
-        target_classified = self.tree_classifier.classify_nodes(
-            list(target_nodes)
-        )
-        player_classified = self.tree_classifier.classify_nodes(
-            list(player_nodes)
-        )
         
-        # 分析缺失的基石天賦
-        missing_keystones = list(
-            set(target_classified["keystone"]) - set(player_classified["keystone"])
-        )
+        # 缺少的節點依類型取子集合（位元運算）
+        missing_bits = target_bits - player_bits
+        missing_keystones = sorted(missing_bits.of_class(NodeType.KEYSTONE.value).node_ids())
+        missing_notables = sorted(missing_bits.of_class(NodeType.NOTABLE.value).node_ids())
         
-        # 分析缺失的顯著天賦
-        missing_notables = list(
-            set(target_classified["notable"]) - set(player_classified["notable"])
-        )
+        # 點數不足以配置目標全部節點時，先在預算內挑選價值最高的組合
+        budget_plan = self._plan_within_budget(player, player_nodes, player_bits, missing_bits)
         
         if missing_keystones or missing_notables:
             # 使用路徑追蹤器建議最佳路徑
@@ -156,13 +157,102 @@ class EnhancedComparisonEngine(PriorityComparisonEngine):
                     path_details={
                         "path_nodes": suggestion["path"],
                         "efficiency": suggestion["efficiency"],
-                        "detour_count": suggestion.get("detour_count", 0)
+                        "detour_count": suggestion.get("detour_count", 0),
+                        "within_budget": (
+                            suggestion["target_node_id"] in budget_plan["path"]
+                            if budget_plan else None
+                        )
                     }
                 ))
+            
+            # 一次規劃所有缺少的關鍵天賦（共用路線只計算一次）
+            if len(missing_keystones) + len(missing_notables) > 1:
+                plan = self.tree_pathfinder.plan_allocation(
+                    player_nodes,
+                    missing_keystones + missing_notables
+                )
+                if plan["found"]:
+                    self.differences.append(ComparisonDifference(
+                        category=DifferenceCategory.PASSIVE_GENERAL,
+                        priority=ComparisonPriority.MEDIUM,
+                        message=(
+                            f"配置全部 {len(plan['targets'])} 個缺少的關鍵天賦"
+                            f"共需 {plan['cost']} 個天賦點"
+                        ),
+                        current_value=None,
+                        target_value=plan["targets"],
+                        action=(
+                            f"依建議順序投資 {plan['cost']} 個天賦點"
+                            f"（逐一計算需 {plan['independent_cost']} 點）"
+                        ),
+                        pob_instruction=(
+                            "在 PoB 的天賦樹中依建議順序配置節點，"
+                            "共用的路線只需配置一次"
+                        ),
+                        path_details={
+                            "path_nodes": plan["path"],
+                            "efficiency": plan["efficiency"],
+                            "detour_count": len(plan["detour_nodes"]),
+                            "saved_points": plan["saved_points"],
+                            "unreachable": plan["unreachable"]
+                        }
+                    ))
+        
+        if budget_plan and budget_plan["found"]:
+            self.differences.append(ComparisonDifference(
+                category=DifferenceCategory.PASSIVE_GENERAL,
+                priority=ComparisonPriority.HIGH,
+                message=(
+                    f"剩餘 {budget_plan['budget']} 個天賦點，"
+                    f"建議優先配置目標流派的 {budget_plan['cost']} 個節點"
+                ),
+                current_value=budget_plan["budget"],
+                target_value=budget_plan["path"],
+                action=f"依建議順序投資 {budget_plan['cost']} 個天賦點",
+                pob_instruction=(
+                    "在 PoB 的天賦樹中依建議順序配置節點，"
+                    "其餘目標節點待升級取得更多天賦點後再補上"
+                ),
+                path_details={
+                    "path_nodes": budget_plan["path"],
+                    "value": budget_plan["value"],
+                    "efficiency": budget_plan["efficiency"],
+                    "skipped_count": len(budget_plan["skipped"])
+                }
+            ))
         
         # 分析星團珠寶
         self._analyze_cluster_jewels(player, target)
     
+    def _plan_within_budget(
+        self,
+        player: StandardizedCharacter,
+        player_nodes: Set[int],
+        player_bits: AllocationBits,
+        missing_bits: AllocationBits
+    ) -> Optional[Dict]:
+        """
+        玩家剩餘點數不足以配置目標全部缺少的節點時，求預算內的最佳組合
+        
+        剩餘點數 = 可用點數（含任務獎勵）- 已配置的主天賦樹節點數；
+        昇華節點使用獨立點數，不列入候選。
+        
+        Returns:
+            最佳化結果；點數足夠或已無剩餘點數時為 None
+        """
+        used_points = len(player_bits) - player_bits.count_of(NodeType.ASCENDANCY.value)
+        budget = player.character_core.total_available_points - used_points
+        
+        # 天賦樹中、非昇華的缺少節點
+        candidate_bits = missing_bits.restrict(
+            ~self._get_allocation_space().class_mask(NodeType.ASCENDANCY.value)
+        )
+        candidates = sorted(candidate_bits.node_ids())
+        if budget <= 0 or budget >= len(candidates):
+            return None
+        
+        return self.tree_pathfinder.optimize_allocation(player_nodes, candidates, budget)
+    
     def _analyze_cluster_jewels(
         self,
         player: StandardizedCharacter,
@@ -6,13 +6,31 @@ RePoE 寶石資料服務
 
 import json
 import logging
+import sys
+import threading
 from pathlib import Path
-from functools import lru_cache
-from typing import Optional, Dict, Set
+from typing import Optional, Dict, Set, Tuple, NamedTuple, Any
 
 logger = logging.getLogger(__name__)
 
 
+# 未收錄寶石的分類快取上限（避免任意輸入名稱無限增長）
+MAX_UNKNOWN_GEM_RECORDS = 4096
+
+# 後備關鍵字判斷（RePoE 無資料時，向後兼容）
+_SUPPORT_KEYWORDS = ("Support", "support", "Awakened", "awakened")
+
+
+class GemRecord(NamedTuple):
+    """寶石分類記錄（不可變，跨角色共用）"""
+    name: str
+    is_support: bool
+    is_awakened: bool
+    is_vaal: bool
+    base_gem: str
+    tags: Tuple[str, ...]
+
+
 class GemService:
     """寶石資料服務"""
 
@@ -21,6 +39,7 @@ class GemService:
         self._support_gem_names: Set[str] = set()
         self._display_name_to_key: Dict[str, str] = {}
         self._loaded = False
+        self._load_lock = threading.Lock()
 
     def load_gem_data(self, data_dir: str = None) -> bool:
         """
@@ -35,6 +54,14 @@ class GemService:
         if self._loaded:
             return True
 
+        # 背景預熱與請求可能同時觸發，只讓一個執行緒載入
+        with self._load_lock:
+            if self._loaded:
+                return True
+            return self._load_gem_data_locked(data_dir)
+
+    def _load_gem_data_locked(self, data_dir: Optional[str]) -> bool:
+        """實際載入寶石資料（呼叫端須持有 _load_lock）"""
         if data_dir is None:
             data_dir = Path(__file__).parent.parent / "data" / "repoe"
         else:
@@ -83,6 +110,12 @@ class GemService:
             logger.error(f"載入寶石資料失敗: {e}")
             return False
 
+    def iter_gems(self):
+        """逐一取得 (RePoE key, 寶石資料)"""
+        if not self._loaded:
+            self.load_gem_data()
+        return iter(self._gems_data.items())
+
     def is_support_gem(self, gem_name: str) -> bool:
         """
         判斷是否為輔助寶石
@@ -128,9 +161,167 @@ class GemService:
         return len(self._gems_data)
 
 
-@lru_cache(maxsize=1)
+_gem_service: Optional[GemService] = None
+_gem_service_lock = threading.Lock()
+
+
 def get_gem_service() -> GemService:
-    """取得單例 GemService"""
-    service = GemService()
-    service.load_gem_data()
-    return service
+    """取得單例 GemService（只建立一次）"""
+    global _gem_service
+    if _gem_service is None:
+        with _gem_service_lock:
+            if _gem_service is None:
+                service = GemService()
+                service.load_gem_data()
+                _gem_service = service
+    return _gem_service
+
+
+# ===== 寶石分類註冊表 =====
+
+def _base_gem_name(name: str) -> str:
+    """取得基礎寶石名稱（去除 Awakened / Vaal 前綴與 Support 後綴）"""
+    for prefix in ("Awakened ", "Vaal "):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+            break
+    if name.endswith(" Support"):
+        name = name[:-len(" Support")]
+    return name
+
+
+def _gem_tags(gem_info: Dict[str, Any]) -> Tuple[str, ...]:
+    """取得 RePoE 寶石標籤（相容 list 與 dict 兩種格式）"""
+    tags = gem_info.get("tags")
+    if tags is None:
+        tags = (gem_info.get("static") or {}).get("tags")
+    if not tags:
+        return ()
+    return tuple(sys.intern(str(tag)) for tag in tags)
+
+
+class GemRegistry:
+    """
+    寶石分類註冊表
+
+    啟動時由 RePoE 資料一次建立，以 PoB 的 gemId 與 nameSpec 為鍵，
+    每次查詢只需一次字典命中即可取得預先建立的 GemRecord。
+    未收錄的寶石以名稱 / gemId 規則分類後同樣快取。
+    """
+
+    def __init__(self, gem_service: Optional[GemService] = None):
+        """
+        初始化並建立註冊表
+
+        Args:
+            gem_service: RePoE 寶石資料服務（預設為全域單例）
+        """
+        self._by_gem_id: Dict[str, GemRecord] = {}
+        self._by_name: Dict[str, GemRecord] = {}
+        self._by_name_lower: Dict[str, GemRecord] = {}
+        self._unknown: Dict[Tuple[str, str], GemRecord] = {}
+
+        self._build(gem_service or get_gem_service())
+
+    def _build(self, gem_service: GemService):
+        """由 RePoE 資料建立記錄"""
+        for key, gem_info in gem_service.iter_gems():
+            base_item = gem_info.get("base_item") or {}
+            display_name = gem_info.get("display_name") or base_item.get("display_name") or ""
+            if not display_name:
+                continue
+
+            is_support = bool(gem_info.get("is_support", False))
+            record = self._make_record(
+                display_name,
+                is_support,
+                _gem_tags(gem_info)
+            )
+
+            for gem_id in (key, base_item.get("id")):
+                if gem_id and gem_id.startswith("Metadata/"):
+                    self._by_gem_id.setdefault(sys.intern(gem_id), record)
+
+            # PoB 的 nameSpec 不含 "Support" 後綴，兩種名稱都建立索引
+            names = [display_name]
+            if is_support and display_name.endswith(" Support"):
+                names.append(display_name[:-len(" Support")])
+            for name in names:
+                self._by_name.setdefault(sys.intern(name), record)
+                self._by_name_lower.setdefault(name.lower(), record)
+
+        logger.info(
+            f"寶石註冊表建立完成：{len(self._by_gem_id)} 個 gemId、"
+            f"{len(self._by_name)} 個名稱"
+        )
+
+    @staticmethod
+    def _make_record(name: str, is_support: bool, tags: Tuple[str, ...] = ()) -> GemRecord:
+        """建立分類記錄"""
+        name = sys.intern(name)
+        return GemRecord(
+            name=name,
+            is_support=is_support,
+            is_awakened="Awakened" in name,
+            is_vaal="Vaal" in name,
+            base_gem=sys.intern(_base_gem_name(name)),
+            tags=tags
+        )
+
+    def lookup(self, gem_id: str = "", name: str = "") -> GemRecord:
+        """
+        查詢寶石分類
+
+        查詢順序：gemId -> nameSpec -> 不分大小寫名稱 -> 規則判斷。
+
+        Args:
+            gem_id: PoB 內部識別碼（如 Metadata/Items/Gems/SupportGemXxx）
+            name: PoB 的 nameSpec
+
+        Returns:
+            寶石分類記錄
+        """
+        record = self._by_gem_id.get(gem_id) if gem_id else None
+        if record is not None:
+            return record
+
+        record = self._by_name.get(name)
+        if record is not None:
+            return record
+
+        key = (gem_id, name)
+        record = self._unknown.get(key)
+        if record is not None:
+            return record
+
+        record = self._by_name_lower.get(name.lower())
+        if record is None:
+            # 規則判斷：gemId 標記或名稱關鍵字
+            is_support = (
+                (bool(gem_id) and "SupportGem" in gem_id)
+                or any(keyword in name for keyword in _SUPPORT_KEYWORDS)
+            )
+            record = self._make_record(name, is_support)
+
+        if len(self._unknown) < MAX_UNKNOWN_GEM_RECORDS:
+            self._unknown[key] = record
+        return record
+
+    @property
+    def size(self) -> int:
+        """已收錄記錄數（gemId 與名稱索引合計）"""
+        return len(self._by_gem_id) + len(self._by_name)
+
+
+_gem_registry: Optional[GemRegistry] = None
+_gem_registry_lock = threading.Lock()
+
+
+def get_gem_registry() -> GemRegistry:
+    """取得單例 GemRegistry（背景預熱與請求同時呼叫時只建立一次）"""
+    global _gem_registry
+    if _gem_registry is None:
+        with _gem_registry_lock:
+            if _gem_registry is None:
+                _gem_registry = GemRegistry()
+    return _gem_registry
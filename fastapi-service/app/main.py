@@ -2,7 +2,9 @@
 POE Build Simulator API - 重構版本
 整合標準化角色比對架構
 """
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from typing import Optional
+from fastapi.responses import JSONResponse
 from fastapi.middleware.cors import CORSMiddleware
 import logging
 
@@ -12,7 +14,25 @@ logger = logging.getLogger(__name__)
 
 # 引用新架構模組
 from app.comparison_api_endpoints import register_comparison_routes
+from app.passive_tree_field_cache import get_field_cache
+from app.passive_tree_http import (
+    CACHE_IMMUTABLE,
+    CACHE_PRIVATE,
+    CACHE_REVALIDATE,
+    accepts_gzip,
+    encode_payload,
+    matched_etag,
+    not_modified,
+    payload_response,
+    tree_digest,
+    tree_etag,
+    tree_payload_cache
+)
+from app.passive_tree_nodes import resolve_fields
 from app.passive_tree_service import passive_tree_service
+from app.pob_parse_cache import pob_parse_cache
+from app.static_data import static_data, RETRY_AFTER_SECONDS
+from app.worker_pool import worker_pool
 
 # 建立 FastAPI 應用實例
 app = FastAPI(
@@ -33,10 +53,14 @@ app.add_middleware(
 # ===== 應用程式生命週期事件 =====
 @app.on_event("startup")
 async def startup_event():
-    """應用啟動時預載入天賦樹資料"""
-    logger.info("FastAPI 啟動中，預載入天賦樹資料...")
-    passive_tree_service.load_tree_data()
-    logger.info("天賦樹資料載入完成")
+    """應用啟動時於背景預熱天賦樹與寶石資料（不阻塞接收請求）"""
+    logger.info("FastAPI 啟動中，背景預熱天賦樹與寶石資料...")
+    static_data.start()
+
+@app.on_event("shutdown")
+async def shutdown_event():
+    """應用關閉時釋放工作池"""
+    worker_pool.shutdown()
 
 # ===== 基礎健康檢查端點 =====
 @app.get("/")
@@ -55,24 +79,80 @@ def health_check():
         "status": "healthy",
         "service": "FastAPI POE Configuration Analyzer",
         "passive_tree_loaded": passive_tree_service.is_loaded(),
-        "node_count": len(passive_tree_service.node_map)
+        "node_count": passive_tree_service.node_count(),
+        "parse_cache": pob_parse_cache.stats(),
+        "executor_mode": worker_pool.mode,
+        "static_data": static_data.status()
     }
 
+@app.get("/api/health/live")
+def liveness_check():
+    """存活檢查（行程可回應即為存活，不依賴靜態資料）"""
+    return {"status": "alive"}
+
+@app.get("/api/health/ready")
+async def readiness_check():
+    """
+    就緒檢查（只依核心資源）
+    
+    核心資源預熱中返回 503 warming_up、載入失敗返回 503 failed；
+    核心資源就緒但天賦樹等其他資源不可用時返回 200 degraded。
+    失敗的資源會重新載入。
+    """
+    status = static_data.status()
+    if status["state"] in ("failed", "degraded"):
+        static_data.retry_failed()
+    if not status["ready"]:
+        return JSONResponse(
+            status_code=503,
+            content={"status": "failed" if status["state"] == "failed" else "warming_up", **status},
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+    return {"status": status["state"], **status}
+
 # ===== 天賦樹 API 端點 =====
 @app.get("/api/passive-tree/init")
 async def init_passive_tree():
-    """手動初始化天賦樹資料"""
-    success = passive_tree_service.load_tree_data()
+    """手動初始化天賦樹資料（與背景預熱共用同一個載入任務）"""
+    success = await static_data.ensure("passive_tree")
     return {
         "success": success,
-        "node_count": len(passive_tree_service.node_map),
+        "node_count": passive_tree_service.node_count(),
         "loaded": passive_tree_service.is_loaded()
     }
 
+# 節點資訊的輸出格式：rows 為節點 ID -> 節點物件，columnar 為欄位 -> 陣列
+NODE_RESPONSE_FORMATS = ("rows", "columnar")
+
+def _parse_node_fields(fields):
+    """解析欄位投影（陣列或逗號分隔字串），未指定時為全部欄位"""
+    if isinstance(fields, str):
+        fields = [field.strip() for field in fields.split(",") if field.strip()]
+    if fields is not None and (
+        not isinstance(fields, list) or not all(isinstance(f, str) for f in fields)
+    ):
+        raise HTTPException(status_code=400, detail="fields must be an array of strings")
+    try:
+        return resolve_fields(fields)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+def _parse_node_format(response_format):
+    """驗證節點資訊的輸出格式"""
+    if response_format not in NODE_RESPONSE_FORMATS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"format must be one of: {', '.join(NODE_RESPONSE_FORMATS)}"
+        )
+    return response_format
+
 @app.post("/api/passive-tree/nodes")
-async def get_passive_nodes_info(request: dict):
-    """批次取得天賦節點詳細資訊"""
+async def get_passive_nodes_info(request: dict, http_request: Request):
+    """批次取得天賦節點詳細資訊（可指定欄位與欄式格式，支援 ETag 條件請求）"""
+    static_data.require("passive_tree")
     node_ids = request.get('node_ids', [])
+    fields = _parse_node_fields(request.get('fields'))
+    response_format = _parse_node_format(request.get('format', 'rows'))
 
     if not isinstance(node_ids, list):
         raise HTTPException(status_code=400, detail="node_ids must be an array")
@@ -82,20 +162,161 @@ async def get_passive_nodes_info(request: dict):
     except (ValueError, TypeError):
         raise HTTPException(status_code=400, detail="All node_ids must be integers")
     
-    nodes_info = passive_tree_service.get_nodes_info(node_ids)
-    return {
-        "success": True,
-        "count": len(nodes_info),
-        "nodes": nodes_info
-    }
+    etag = tree_etag(passive_tree_service.nodes, "nodes", tuple(node_ids), fields, response_format)
+    cached_etag = matched_etag(http_request, etag)
+    if cached_etag is not None:
+        return not_modified(cached_etag, CACHE_PRIVATE)
+    
+    if response_format == "columnar":
+        columns = passive_tree_service.get_nodes_columns(node_ids, fields)
+        content = {
+            "success": True,
+            "count": len(columns["id"]),
+            "format": response_format,
+            "fields": list(fields),
+            "columns": columns
+        }
+    else:
+        nodes_info = passive_tree_service.get_nodes_info(node_ids, fields)
+        content = {
+            "success": True,
+            "count": len(nodes_info),
+            "nodes": nodes_info
+        }
+    payload = encode_payload(content, etag, compress=accepts_gzip(http_request))
+    return payload_response(http_request, payload, CACHE_PRIVATE)
 
 @app.get("/api/passive-tree/node/{node_id}")
-async def get_passive_node_info(node_id: int):
-    """取得單一節點詳細資訊"""
-    node_info = passive_tree_service.get_node_info(node_id)
+async def get_passive_node_info(node_id: int, http_request: Request, fields: Optional[str] = None):
+    """取得單一節點詳細資訊（fields 為逗號分隔的欄位，支援 ETag 條件請求）"""
+    static_data.require("passive_tree")
+    fields = _parse_node_fields(fields)
+    etag = tree_etag(passive_tree_service.nodes, "node", node_id, fields)
+    cached_etag = matched_etag(http_request, etag)
+    if cached_etag is not None:
+        return not_modified(cached_etag, CACHE_REVALIDATE)
+    
+    node_info = passive_tree_service.get_node_info(node_id, fields)
+    return JSONResponse(
+        content={
+            "success": True, 
+            "node": node_info
+        },
+        headers={"ETag": etag, "Cache-Control": CACHE_REVALIDATE}
+    )
+
+@app.get("/api/passive-tree/dump")
+async def dump_passive_tree(
+    http_request: Request,
+    version: Optional[str] = None,
+    digest: Optional[str] = None,
+    fields: Optional[str] = None,
+    format: str = "columnar"
+):
+    """
+    取得整棵天賦樹的節點資訊（預先編碼與 gzip 壓縮，依資料內容快取）
+    
+    同一版本標籤下的資料可能被替換，只有同時帶 version 與 digest
+    （/status 的 tree_version、tree_digest）的網址內容永不改變，
+    瀏覽器每份資料只需下載一次；其餘情況每次使用前以 ETag 驗證。
+    """
+    static_data.require("passive_tree")
+    fields = _parse_node_fields(fields)
+    response_format = _parse_node_format(format)
+    table = passive_tree_service.nodes
+    current_version = passive_tree_service.version
+    current_digest = tree_digest(table)
+    if version is not None and version != current_version:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Passive tree version {version} is not loaded (current: {current_version})"
+        )
+    if digest is not None and digest != current_digest:
+        raise HTTPException(
+            status_code=404,
+            detail=f"Passive tree data {digest} is not loaded (current: {current_digest})"
+        )
+    immutable = version is not None and digest is not None
+    cache_control = CACHE_IMMUTABLE if immutable else CACHE_REVALIDATE
+    
+    etag = tree_etag(table, "dump", fields, response_format)
+    cached_etag = matched_etag(http_request, etag)
+    if cached_etag is not None:
+        return not_modified(cached_etag, cache_control)
+    
+    def build_payload():
+        if response_format == "columnar":
+            columns = passive_tree_service.get_nodes_columns(None, fields)
+            content = {"columns": columns}
+        else:
+            node_ids = list(table.node_ids) if table is not None else []
+            content = {"nodes": passive_tree_service.get_nodes_info(node_ids, fields)}
+        return encode_payload({
+            "success": True,
+            "version": current_version,
+            "digest": current_digest,
+            "count": passive_tree_service.node_count(),
+            "format": response_format,
+            "fields": list(fields),
+            **content
+        }, etag)
+    
+    # 首次請求時編碼與壓縮整棵樹，於執行緒池中執行
+    payload = await worker_pool.run_local(tree_payload_cache.get_or_build, (etag,), build_payload)
+    return payload_response(http_request, payload, cache_control)
+
+# 節點搜尋的筆數與查詢長度上限
+MAX_SEARCH_RESULTS = 100
+MAX_SEARCH_QUERY_LENGTH = 200
+
+@app.post("/api/passive-tree/search")
+async def search_passive_nodes(request: dict):
+    """依名稱與能力描述搜尋天賦節點（支援前綴、拼字容錯與類型篩選）"""
+    static_data.require("passive_tree")
+    query = request.get('query', '')
+    node_types = request.get('types')
+    limit = request.get('limit', 20)
+    fuzzy = bool(request.get('fuzzy', True))
+    include_nodes_info = bool(request.get('include_nodes_info', False))
+
+    if not isinstance(query, str) or not query.strip():
+        raise HTTPException(status_code=400, detail="query must be a non-empty string")
+    if len(query) > MAX_SEARCH_QUERY_LENGTH:
+        raise HTTPException(
+            status_code=400,
+            detail=f"query must be at most {MAX_SEARCH_QUERY_LENGTH} characters"
+        )
+    if node_types is not None and (
+        not isinstance(node_types, list) or not all(isinstance(t, str) for t in node_types)
+    ):
+        raise HTTPException(status_code=400, detail="types must be an array of strings")
+    try:
+        limit = int(limit)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="limit must be an integer")
+    if not 1 <= limit <= MAX_SEARCH_RESULTS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"limit must be between 1 and {MAX_SEARCH_RESULTS}"
+        )
+
+    try:
+        # 首次搜尋會建立該版本的索引，於執行緒池中執行
+        results = await worker_pool.run_local(
+            passive_tree_service.search_nodes,
+            query,
+            node_types,
+            limit,
+            fuzzy,
+            include_nodes_info
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
     return {
-        "success": True, 
-        "node": node_info
+        "success": True,
+        "query": query,
+        "count": len(results),
+        "results": results
     }
 
 @app.get("/api/passive-tree/status")
@@ -103,20 +324,36 @@ async def get_passive_tree_status():
     """檢查天賦樹資料載入狀態"""
     return {
         "loaded": passive_tree_service.is_loaded(),
-        "node_count": len(passive_tree_service.node_map)
+        "node_count": passive_tree_service.node_count(),
+        "tree_version": passive_tree_service.version,
+        "tree_digest": tree_digest(passive_tree_service.nodes),
+        "source": passive_tree_service.source,
+        "dump_cache": tree_payload_cache.stats(),
+        "field_cache": (
+            get_field_cache(passive_tree_service.tree_index).stats()
+            if passive_tree_service.tree_index is not None else None
+        )
     }
 
 @app.post("/api/passive-tree/path")
 async def calculate_path(request: dict):
     """計算從已點節點到目標節點的最短路徑"""
+    static_data.require("passive_tree")
     try:
         start_nodes = request.get('start_nodes', [])
         target_node = request.get('target_node')
+        weighted = bool(request.get('weighted', False))
 
         if not target_node:
             return {"success": False, "message": "Missing target_node"}
         
-        result = passive_tree_service.calculate_path(start_nodes, target_node)
+        # 路徑搜尋依賴本行程已載入的天賦樹，於執行緒池中執行
+        result = await worker_pool.run_local(
+            passive_tree_service.calculate_weighted_path if weighted
+            else passive_tree_service.calculate_path,
+            start_nodes,
+            target_node
+        )
         return {
             "success": result.get('found', False),
             "path": result
@@ -128,18 +365,173 @@ async def calculate_path(request: dict):
             "message": str(e)
         }
 
+# 批次路徑查詢的目標數上限
+MAX_PATH_TARGETS = 1000
+
+@app.post("/api/passive-tree/paths")
+async def calculate_paths(request: dict):
+    """一次計算從已點節點到多個目標節點的成本與路徑（共用同一次 BFS）"""
+    static_data.require("passive_tree")
+    start_nodes = request.get('start_nodes', [])
+    target_nodes = request.get('target_nodes', [])
+    include_nodes_info = bool(request.get('include_nodes_info', False))
+
+    if not isinstance(start_nodes, list) or not isinstance(target_nodes, list):
+        raise HTTPException(status_code=400, detail="start_nodes and target_nodes must be arrays")
+    if not target_nodes or len(target_nodes) > MAX_PATH_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"target_nodes must contain 1 to {MAX_PATH_TARGETS} items"
+        )
+
+    try:
+        start_nodes = [int(nid) for nid in start_nodes]
+        target_nodes = list(dict.fromkeys(int(nid) for nid in target_nodes))
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="All node ids must be integers")
+
+    results = await worker_pool.run_local(
+        passive_tree_service.calculate_paths,
+        start_nodes,
+        target_nodes,
+        include_nodes_info
+    )
+    return {
+        "success": True,
+        "count": len(results),
+        "found_count": sum(1 for result in results.values() if result['found']),
+        "results": results
+    }
+
+@app.post("/api/passive-tree/plan")
+async def plan_allocation(request: dict):
+    """規劃一次到達所有目標節點的連通配置（近似最小 Steiner 樹）"""
+    static_data.require("passive_tree")
+    allocated_nodes = request.get('allocated_nodes', [])
+    target_nodes = request.get('target_nodes', [])
+    include_nodes_info = bool(request.get('include_nodes_info', False))
+
+    if not isinstance(allocated_nodes, list) or not isinstance(target_nodes, list):
+        raise HTTPException(status_code=400, detail="allocated_nodes and target_nodes must be arrays")
+    if not target_nodes or len(target_nodes) > MAX_PATH_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"target_nodes must contain 1 to {MAX_PATH_TARGETS} items"
+        )
+
+    try:
+        allocated_nodes = [int(nid) for nid in allocated_nodes]
+        target_nodes = [int(nid) for nid in target_nodes]
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="All node ids must be integers")
+
+    result = await worker_pool.run_local(
+        passive_tree_service.plan_allocation,
+        allocated_nodes,
+        target_nodes,
+        include_nodes_info
+    )
+    return {
+        "success": True,
+        **result
+    }
+
+@app.post("/api/passive-tree/optimize")
+async def optimize_allocation(request: dict):
+    """在點數預算內挑選價值最高、且與已點節點連通的候選節點（樹狀背包）"""
+    static_data.require("passive_tree")
+    allocated_nodes = request.get('allocated_nodes', [])
+    candidate_nodes = request.get('candidate_nodes', [])
+    budget = request.get('budget')
+    include_nodes_info = bool(request.get('include_nodes_info', False))
+
+    if not isinstance(allocated_nodes, list) or not isinstance(candidate_nodes, list):
+        raise HTTPException(status_code=400, detail="allocated_nodes and candidate_nodes must be arrays")
+    if not candidate_nodes or len(candidate_nodes) > MAX_PATH_TARGETS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"candidate_nodes must contain 1 to {MAX_PATH_TARGETS} items"
+        )
+
+    try:
+        allocated_nodes = [int(nid) for nid in allocated_nodes]
+        candidate_nodes = [int(nid) for nid in candidate_nodes]
+        budget = int(budget)
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Node ids and budget must be integers")
+    if budget < 0:
+        raise HTTPException(status_code=400, detail="budget must not be negative")
+
+    result = await worker_pool.run_local(
+        passive_tree_service.optimize_allocation,
+        allocated_nodes,
+        candidate_nodes,
+        budget,
+        include_nodes_info
+    )
+    return {
+        "success": True,
+        **result
+    }
+
+# 相似度排序的候選配置數上限
+MAX_SIMILARITY_BUILDS = 1000
+
+@app.post("/api/passive-tree/similarity")
+async def rank_similar_allocations(request: dict):
+    """依天賦配置的 Jaccard 相似度排序多個流派（位元集合運算）"""
+    static_data.require("passive_tree")
+    reference_nodes = request.get('reference_nodes', [])
+    builds = request.get('builds', [])
+    limit = request.get('limit')
+
+    if not isinstance(reference_nodes, list) or not isinstance(builds, list):
+        raise HTTPException(status_code=400, detail="reference_nodes and builds must be arrays")
+    if not builds or len(builds) > MAX_SIMILARITY_BUILDS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"builds must contain 1 to {MAX_SIMILARITY_BUILDS} items"
+        )
+    if not all(isinstance(nodes, list) for nodes in builds):
+        raise HTTPException(status_code=400, detail="Each build must be an array of node ids")
+
+    try:
+        reference_nodes = [int(nid) for nid in reference_nodes]
+        builds = [[int(nid) for nid in nodes] for nodes in builds]
+        limit = int(limit) if limit is not None else None
+    except (ValueError, TypeError):
+        raise HTTPException(status_code=400, detail="Node ids and limit must be integers")
+    if limit is not None and limit < 1:
+        raise HTTPException(status_code=400, detail="limit must be positive")
+
+    results = await worker_pool.run_local(
+        passive_tree_service.rank_similar_allocations,
+        reference_nodes,
+        builds,
+        limit
+    )
+    return {
+        "success": True,
+        "count": len(results),
+        "results": results
+    }
+
 @app.post("/api/passive-tree/suggest-paths")
 async def suggest_paths(request: dict):
     """建議最佳天賦路徑"""
+    static_data.require("passive_tree")
     try:
         allocated_nodes = request.get('allocated_nodes', [])
         missing_nodes = request.get('missing_nodes', [])
         max_suggestions = request.get('max_suggestions', 5)
+        weighted = bool(request.get('weighted', False))
 
-        suggestions = passive_tree_service.suggest_optimal_paths(
-            allocated_nodes, 
-            missing_nodes, 
-            max_suggestions
+        suggestions = await worker_pool.run_local(
+            passive_tree_service.suggest_optimal_paths,
+            allocated_nodes,
+            missing_nodes,
+            max_suggestions,
+            weighted
         )
         return {
             "success": True,
@@ -1,11 +1,18 @@
 """
 天賦樹節點分類器與路徑分析引擎
 """
-from typing import Dict, List, Set, Optional, Tuple
+from typing import Dict, List, Set, Optional, Tuple, Union
 from enum import Enum
-from collections import deque
 import logging
 
+from app.passive_tree_bitset import AllocationSpace, allocation_space_for
+from app.passive_tree_classes import CLASS_UNKNOWN, NODE_CLASSES, NodeClassIndex
+from app.passive_tree_field_cache import get_field_cache
+from app.passive_tree_index import PassiveTreeIndex
+from app.passive_tree_nodes import PassiveNodeTable
+from app.passive_tree_planner import plan_budget_allocation, plan_steiner_allocation
+from app.passive_tree_routing import WeightedRouter, get_weighted_router
+
 logger = logging.getLogger(__name__)
 
 
@@ -28,6 +35,7 @@ class NodeWeight(int, Enum):
     MASTERY = 40
     ASCENDANCY = 80
     SMALL_PASSIVE = 1
+    CLASS_START = 0
 
 
 class ClusterJewelSize(str, Enum):
@@ -38,25 +46,49 @@ class ClusterJewelSize(str, Enum):
 
 
 class PassiveNode:
-    """天賦節點資料結構"""
+    """
+    天賦節點（共用節點表中一列的唯讀檢視）
     
-    def __init__(
-        self,
-        node_id: int,
-        name: str,
-        node_type: NodeType,
-        stats: List[str],
-        connections: List[int],
-        is_cluster_socket: bool = False,
-        cluster_size: Optional[ClusterJewelSize] = None
-    ):
-        self.node_id = node_id
-        self.name = name
-        self.node_type = node_type
-        self.stats = stats
-        self.connections = connections
-        self.is_cluster_socket = is_cluster_socket
-        self.cluster_size = cluster_size
+    只保存節點表與位置，欄位於存取時由節點表讀取，不複製資料。
+    """
+    
+    __slots__ = ("table", "position")
+    
+    def __init__(self, table: PassiveNodeTable, position: int):
+        self.table = table
+        self.position = position
+    
+    @property
+    def node_id(self) -> int:
+        return self.table.node_ids[self.position]
+    
+    @property
+    def name(self) -> str:
+        return self.table.names[self.position]
+    
+    @property
+    def node_type(self) -> NodeType:
+        return NodeType(NODE_CLASSES[self.table.classes.codes[self.position]])
+    
+    @property
+    def stats(self) -> List[str]:
+        return self.table.stats_at(self.position)
+    
+    @property
+    def connections(self) -> List[int]:
+        return self.table.index.to_node_ids(self.table.index.neighbors_of(self.position))
+    
+    @property
+    def cluster_size(self) -> Optional[ClusterJewelSize]:
+        """星團珠寶大小（一般珠寶插槽與非插槽為 None）"""
+        socket_type = self.table.classes.socket_type_of(self.node_id)
+        if socket_type is None or socket_type == "regular":
+            return None
+        return ClusterJewelSize(socket_type[len("cluster_"):])
+    
+    @property
+    def is_cluster_socket(self) -> bool:
+        return self.cluster_size is not None
     
     @property
     def weight(self) -> int:
@@ -64,130 +96,62 @@ class PassiveNode:
         base_weight = NodeWeight[self.node_type.upper()].value
         
         # 星團珠寶插槽根據大小調整權重
-        if self.is_cluster_socket and self.cluster_size:
-            if self.cluster_size == ClusterJewelSize.LARGE:
-                return base_weight + 20
-            elif self.cluster_size == ClusterJewelSize.MEDIUM:
-                return base_weight + 10
+        cluster_size = self.cluster_size
+        if cluster_size == ClusterJewelSize.LARGE:
+            return base_weight + 20
+        elif cluster_size == ClusterJewelSize.MEDIUM:
+            return base_weight + 10
         
         return base_weight
+    
+    @property
+    def path_value(self) -> int:
+        """路徑價值（無效果的小型天賦視為純過路節點，價值為 0）"""
+        if self.node_type == NodeType.SMALL_PASSIVE and self.table.stat_count_at(self.position) == 0:
+            return 0
+        return self.weight
+
+
+# 服務與分析器共用的路徑價值設定（加權路徑搜尋器依此快取）
+PATH_VALUE_PROFILE = "path_value"
+
+
+def path_values(table: PassiveNodeTable) -> List[int]:
+    """依節點表順序排列的路徑價值（PassiveNode.path_value）"""
+    return [PassiveNode(table, position).path_value for position in range(len(table))]
 
 
 class PassiveTreeClassifier:
     """天賦樹節點分類器"""
     
-    def __init__(self, passive_tree_data: Dict):
+    def __init__(self, passive_tree_data: Union[PassiveNodeTable, Dict, None]):
         """
         初始化分類器
         
         Args:
-            passive_tree_data: 天賦樹 JSON 資料（來自官方 API）
+            passive_tree_data: 共用節點表（例如 passive_tree_service.nodes，不需建立任何資料）；
+                也接受天賦樹 JSON 資料（來自官方 API，會另外編譯一份節點表）
         """
-        self.tree_data = passive_tree_data
-        self.node_map: Dict[int, PassiveNode] = {}
-        self._build_node_map()
-    
-    def _build_node_map(self):
-        """建立節點 ID -> PassiveNode 的映射"""
-        if not self.tree_data or 'nodes' not in self.tree_data:
+        self.table: Optional[PassiveNodeTable] = None
+        if isinstance(passive_tree_data, PassiveNodeTable):
+            self.table = passive_tree_data
+        elif passive_tree_data and 'nodes' in passive_tree_data:
+            self.table = PassiveNodeTable.from_tree_data(passive_tree_data)
+            logger.info(f"成功建立 {len(self.table)} 個天賦節點的節點表")
+        else:
             logger.warning("天賦樹資料不完整")
-            return
-        
-        for node_id_str, node_data in self.tree_data['nodes'].items():
-            try:
-                node_id = int(node_id_str)
-                
-                # 判斷節點類型
-                node_type = self._classify_node_type(node_data)
-                
-                # 提取節點資訊
-                name = node_data.get('name', node_data.get('dn', f'Node {node_id}'))
-                stats = node_data.get('sd', node_data.get('stats', []))
-                connections = node_data.get('out', [])
-                
-                # 判斷是否為星團珠寶插槽
-                is_cluster = self._is_cluster_jewel_socket(node_data)
-                cluster_size = self._determine_cluster_size(node_data) if is_cluster else None
-                
-                # 建立節點物件
-                passive_node = PassiveNode(
-                    node_id=node_id,
-                    name=name,
-                    node_type=node_type,
-                    stats=stats,
-                    connections=connections,
-                    is_cluster_socket=is_cluster,
-                    cluster_size=cluster_size
-                )
-                
-                self.node_map[node_id] = passive_node
-                
-            except (ValueError, KeyError) as e:
-                logger.warning(f"無法處理節點 {node_id_str}: {str(e)}")
-                continue
         
-        logger.info(f"成功建立 {len(self.node_map)} 個天賦節點映射")
-    
-    def _classify_node_type(self, node_data: Dict) -> NodeType:
-        """
-        分類節點類型
-        
-        Args:
-            node_data: 節點資料
-            
-        Returns:
-            節點類型
-        """
-        # 檢查是否為基石天賦
-        if node_data.get('ks', node_data.get('isKeystone', False)):
-            return NodeType.KEYSTONE
-        
-        # 檢查是否為顯著天賦
-        if node_data.get('not', node_data.get('isNotable', False)):
-            return NodeType.NOTABLE
-        
-        # 檢查是否為精通
-        if node_data.get('m', node_data.get('isMastery', False)):
-            return NodeType.MASTERY
-        
-        # 檢查是否為珠寶插槽
-        if node_data.get('isJewelSocket', False):
-            return NodeType.JEWEL_SOCKET
-        
-        # 檢查是否為昇華節點（通常 ID >= 60000）
-        node_id = int(node_data.get('skill', 0))
-        if node_id >= 60000:
-            return NodeType.ASCENDANCY
-        
-        # 預設為小型天賦
-        return NodeType.SMALL_PASSIVE
-    
-    def _is_cluster_jewel_socket(self, node_data: Dict) -> bool:
-        """判斷是否為星團珠寶插槽"""
-        # 星團珠寶插槽通常有特殊標記或在特定區域
-        # 這需要根據實際資料結構調整
-        expansion_jewel = node_data.get('expansionJewel', {})
-        return bool(expansion_jewel)
-    
-    def _determine_cluster_size(self, node_data: Dict) -> Optional[ClusterJewelSize]:
-        """判斷星團珠寶大小"""
-        expansion_jewel = node_data.get('expansionJewel', {})
-        if not expansion_jewel:
-            return None
-        
-        # 根據星團珠寶的節點數判斷大小
-        total_indices = expansion_jewel.get('totalIndices', 0)
-        
-        if total_indices <= 3:
-            return ClusterJewelSize.SMALL
-        elif total_indices <= 6:
-            return ClusterJewelSize.MEDIUM
-        else:
-            return ClusterJewelSize.LARGE
+        # 無向鄰接索引（含 out / in 兩個方向與昇華邊界過濾）、節點分類索引與配置位元座標系
+        self.index: Optional[PassiveTreeIndex] = self.table.index if self.table else None
+        self.classes: Optional[NodeClassIndex] = self.table.classes if self.table else None
+        self.space: Optional[AllocationSpace] = (
+            allocation_space_for(self.classes) if self.classes is not None else None
+        )
     
     def get_node(self, node_id: int) -> Optional[PassiveNode]:
         """獲取節點資訊"""
-        return self.node_map.get(node_id)
+        position = self.table.position(node_id) if self.table is not None else None
+        return None if position is None else PassiveNode(self.table, position)
     
     def classify_nodes(self, node_ids: List[int]) -> Dict[NodeType, List[int]]:
         """
@@ -205,13 +169,18 @@ class PassiveTreeClassifier:
             NodeType.JEWEL_SOCKET: [],
             NodeType.MASTERY: [],
             NodeType.ASCENDANCY: [],
-            NodeType.SMALL_PASSIVE: []
+            NodeType.SMALL_PASSIVE: [],
+            NodeType.CLASS_START: []
         }
         
+        if self.classes is None:
+            return classified
+        
+        buckets = [classified[NodeType(name)] for name in NODE_CLASSES]
         for node_id in node_ids:
-            node = self.get_node(node_id)
-            if node:
-                classified[node.node_type].append(node_id)
+            code = self.classes.code_of(node_id)
+            if code != CLASS_UNKNOWN:
+                buckets[code].append(node_id)
         
         return classified
 
@@ -245,6 +214,25 @@ class PassiveTreePathFinder:
         Returns:
             路徑資訊字典，包含路徑、成本、效益比
         """
+        return self.find_paths(start_nodes, [target_node], allocated_nodes)[target_node]
+    
+    def find_weighted_path(
+        self,
+        start_nodes: List[int],
+        target_node: int,
+        allocated_nodes: Set[int]
+    ) -> Dict:
+        """
+        尋找加權成本最低的路徑（ALT A*，經過高價值節點較便宜）
+        
+        Args:
+            start_nodes: 起始節點列表（已配置的節點）
+            target_node: 目標節點
+            allocated_nodes: 已配置節點集合
+            
+        Returns:
+            路徑資訊字典，另含加權成本與展開節點數
+        """
         if target_node in allocated_nodes:
             return {
                 "found": True,
@@ -253,60 +241,81 @@ class PassiveTreePathFinder:
                 "already_allocated": True
             }
         
-        # 從所有起始節點開始 BFS
-        queue = deque()
-        visited = set(allocated_nodes)
-        parent_map = {}
+        router = self._weighted_router()
+        result = None
+        if router is not None:
+            result = router.find_path(
+                [start for start in start_nodes if start in allocated_nodes],
+                target_node
+            )
+        if result is None:
+            return {
+                "found": False,
+                "message": "無法從已配置節點到達目標節點"
+            }
         
-        # 初始化佇列
-        for start in start_nodes:
-            if start in allocated_nodes:
-                queue.append(start)
-                visited.add(start)
+        analysis = self._analyze_path(result.path, allocated_nodes)
+        analysis["weighted_cost"] = result.weighted_cost
+        analysis["explored_nodes"] = result.explored
+        return analysis
+    
+    def _weighted_router(self) -> Optional[WeightedRouter]:
+        """取得分類器天賦樹的加權路徑搜尋器（首次使用時計算地標）"""
+        table = self.classifier.table
+        if table is None:
+            return None
+        return get_weighted_router(table.index, lambda: path_values(table), PATH_VALUE_PROFILE)
+    
+    def find_paths(
+        self,
+        start_nodes: List[int],
+        target_nodes: List[int],
+        allocated_nodes: Set[int]
+    ) -> Dict[int, Dict]:
+        """
+        一次尋找到多個目標的最短路徑（多起點 BFS 距離場）
         
-        # BFS 搜尋
-        while queue:
-            current = queue.popleft()
-            
-            # 獲取當前節點
-            current_node = self.classifier.get_node(current)
-            if not current_node:
-                continue
+        Args:
+            start_nodes: 起始節點列表（已配置的節點）
+            target_nodes: 目標節點列表
+            allocated_nodes: 已配置節點集合
             
-            # 檢查所有連接的節點
-            for neighbor in current_node.connections:
-                if neighbor == target_node:
-                    # 找到目標，重建路徑
-                    path = self._reconstruct_path(parent_map, current, neighbor)
-                    return self._analyze_path(path, allocated_nodes)
-                
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    parent_map[neighbor] = current
-                    queue.append(neighbor)
+        Returns:
+            目標節點 ID -> 路徑資訊字典
+        """
+        results = {}
+        pending = []
+        for target_node in target_nodes:
+            if target_node in allocated_nodes:
+                results[target_node] = {
+                    "found": True,
+                    "path": [],
+                    "cost": 0,
+                    "already_allocated": True
+                }
+            else:
+                pending.append(target_node)
+        
+        # 從所有已配置的起始節點同時 BFS（共用的無向鄰接索引，依配置快取距離場）
+        index = self.classifier.index
+        field = None
+        if index is not None and pending:
+            field = get_field_cache(index).get(
+                [start for start in start_nodes if start in allocated_nodes]
+            )
         
-        # 找不到路徑
-        return {
-            "found": False,
-            "message": "無法從已配置節點到達目標節點"
-        }
-    
-    def _reconstruct_path(
-        self,
-        parent_map: Dict[int, int],
-        last_node: int,
-        target_node: int
-    ) -> List[int]:
-        """重建路徑"""
-        path = [target_node]
-        current = last_node
-        
-        while current in parent_map:
-            path.append(current)
-            current = parent_map[current]
-        
-        path.reverse()
-        return path
+        for target_node in pending:
+            path = field.path(target_node) if field is not None else None
+            if path is not None:
+                results[target_node] = self._analyze_path(path, allocated_nodes)
+            else:
+                # 找不到路徑
+                results[target_node] = {
+                    "found": False,
+                    "message": "無法從已配置節點到達目標節點"
+                }
+        
+        return results
     
     def _analyze_path(
         self,
@@ -331,16 +340,27 @@ class PassiveTreePathFinder:
         detour_nodes = []  # 繞路節點（低價值節點）
         valuable_nodes = []  # 高價值節點
         
+        node_details = []
+        
         for node_id in new_nodes:
             node = self.classifier.get_node(node_id)
             if node:
-                total_weight += node.weight
+                weight = node.weight
+                node_type = node.node_type
+                total_weight += weight
                 
                 # 判斷是否為繞路節點
-                if node.node_type == NodeType.SMALL_PASSIVE and len(node.stats) == 0:
+                if node_type == NodeType.SMALL_PASSIVE and node.path_value == 0:
                     detour_nodes.append(node_id)
-                elif node.weight >= NodeWeight.NOTABLE.value:
+                elif weight >= NodeWeight.NOTABLE.value:
                     valuable_nodes.append(node_id)
+                
+                node_details.append({
+                    "id": node_id,
+                    "name": node.name,
+                    "type": node_type.value,
+                    "weight": weight
+                })
         
         # 計算效益比
         cost = len(new_nodes)
@@ -354,24 +374,89 @@ class PassiveTreePathFinder:
             "efficiency": efficiency,
             "detour_nodes": detour_nodes,
             "valuable_nodes": valuable_nodes,
-            "node_details": [
-                {
-                    "id": node_id,
-                    "name": self.classifier.get_node(node_id).name,
-                    "type": self.classifier.get_node(node_id).node_type.value,
-                    "weight": self.classifier.get_node(node_id).weight
-                }
-                for node_id in new_nodes
-                if self.classifier.get_node(node_id)
-            ]
+            "node_details": node_details
         }
     
+    def plan_allocation(
+        self,
+        allocated_nodes: Set[int],
+        target_nodes: List[int]
+    ) -> Dict:
+        """
+        規劃一次配置所有目標的連通路線（近似最小 Steiner 樹）
+        
+        Args:
+            allocated_nodes: 已配置節點
+            target_nodes: 目標節點（通常為缺少的基石與顯著天賦）
+            
+        Returns:
+            規劃結果，包含新增節點順序、總點數與逐一計算的總點數
+        """
+        index = self.classifier.index
+        if index is None:
+            return {
+                "found": False,
+                "message": "天賦樹索引不可用"
+            }
+        
+        plan = plan_steiner_allocation(index, allocated_nodes, target_nodes)
+        analysis = self._analyze_path(plan.order, allocated_nodes)
+        analysis.update({
+            "found": plan.found,
+            "independent_cost": plan.independent_cost,
+            "saved_points": plan.independent_cost - plan.total_cost,
+            "targets": plan.targets,
+            "unreachable": plan.unreachable
+        })
+        return analysis
+    
+    def optimize_allocation(
+        self,
+        allocated_nodes: Set[int],
+        candidate_nodes: List[int],
+        budget: int
+    ) -> Dict:
+        """
+        在點數預算內挑選路徑價值最高的連通節點組合（樹狀背包）
+        
+        Args:
+            allocated_nodes: 已配置節點
+            candidate_nodes: 可選取的節點（通常為目標流派有、玩家缺少的節點）
+            budget: 可用天賦點數
+            
+        Returns:
+            最佳化結果，包含選取節點順序、價值總和與未選取的節點
+        """
+        index = self.classifier.index
+        if index is None:
+            return {
+                "found": False,
+                "message": "天賦樹索引不可用"
+            }
+        
+        values = {}
+        for node_id in candidate_nodes:
+            node = self.classifier.get_node(node_id)
+            values[node_id] = node.path_value if node else 0
+        
+        plan = plan_budget_allocation(index, allocated_nodes, candidate_nodes, values, budget)
+        analysis = self._analyze_path(plan.order, allocated_nodes)
+        analysis.update({
+            "found": bool(plan.order),
+            "value": plan.value,
+            "budget": plan.budget,
+            "skipped": plan.skipped,
+            "unreachable": plan.unreachable
+        })
+        return analysis
+    
     def suggest_optimal_paths(
         self,
         allocated_nodes: Set[int],
         missing_keystones: List[int],
         missing_notables: List[int],
-        max_suggestions: int = 5
+        max_suggestions: int = 5,
+        weighted: bool = False
     ) -> List[Dict]:
         """
         建議最佳天賦路徑
@@ -381,6 +466,7 @@ class PassiveTreePathFinder:
             missing_keystones: 缺少的基石天賦
             missing_notables: 缺少的顯著天賦
             max_suggestions: 最大建議數量
+            weighted: 是否以加權成本搜尋（偏好沿途價值高的路線）
             
         Returns:
             建議列表（按效益比排序）
@@ -394,12 +480,23 @@ class PassiveTreePathFinder:
             (node_id, "notable") for node_id in missing_notables
         ]
         
-        for target_id, node_category in priority_targets[:max_suggestions * 2]:
-            path_result = self.find_shortest_path(
+        priority_targets = priority_targets[:max_suggestions * 2]
+        
+        if weighted:
+            path_results = {
+                target_id: self.find_weighted_path(list(allocated_nodes), target_id, allocated_nodes)
+                for target_id, _ in priority_targets
+            }
+        else:
+            # 所有目標共用一次距離場計算
+            path_results = self.find_paths(
                 list(allocated_nodes),
-                target_id,
+                [target_id for target_id, _ in priority_targets],
                 allocated_nodes
             )
+        
+        for target_id, node_category in priority_targets:
+            path_result = path_results[target_id]
             
             if path_result.get("found") and not path_result.get("already_allocated"):
                 target_node = self.classifier.get_node(target_id)
@@ -415,8 +512,13 @@ class PassiveTreePathFinder:
                     "priority": 10 if node_category == "keystone" else 5
                 })
         
-        # 按效益比排序
-        suggestions.sort(key=lambda x: (-x["priority"], x["cost"], -x["efficiency"]))
+        # 按效益比排序（加權模式改以加權成本取代點數）
+        if weighted:
+            for suggestion in suggestions:
+                suggestion["weighted_cost"] = path_results[suggestion["target_node_id"]]["weighted_cost"]
+            suggestions.sort(key=lambda x: (-x["priority"], x["weighted_cost"], -x["efficiency"]))
+        else:
+            suggestions.sort(key=lambda x: (-x["priority"], x["cost"], -x["efficiency"]))
         
         return suggestions[:max_suggestions]
 
@@ -0,0 +1,224 @@
+"""
+天賦配置位元集合
+以節點表的連續索引為位元位置，將配置表示為 Python 整數位元集合；
+缺少、多出、共同與各類型子集合都是整數的 AND / OR / 位元計數運算，
+也用於大量配置之間的相似度排序
+"""
+import threading
+from typing import Dict, FrozenSet, Iterable, List, Optional, Sequence, Tuple
+import logging
+
+from app.passive_tree_classes import NODE_CLASSES, NodeClassIndex
+
+logger = logging.getLogger(__name__)
+
+
+# 位元計數（Python 3.10 以前沒有 int.bit_count）
+_popcount = getattr(int, "bit_count", None) or (lambda value: bin(value).count("1"))
+
+
+class AllocationSpace:
+    """
+    配置位元集合的座標系（每個天賦樹版本一份）
+
+    第 i 個位元對應節點表（分類索引）第 i 個節點；各類型節點的遮罩預先計算。
+    沒有天賦樹資料時座標系為空，所有節點都以集合保存，運算結果不變。
+    """
+
+    def __init__(self, classes: Optional[NodeClassIndex]):
+        """
+        由節點分類索引建立座標系
+
+        Args:
+            classes: 節點分類索引（與共用節點表的 classes 相同）；None 表示沒有天賦樹資料
+        """
+        self.classes = classes
+        self.version = classes.version if classes is not None else None
+        self.index_of: Dict[int, int] = classes.index_of if classes is not None else {}
+        self.node_ids = classes.node_ids if classes is not None else ()
+        self.size = len(self.node_ids)
+
+        # 各類型的遮罩：先以位元組陣列設定位元，再一次轉為整數
+        codes = classes.codes if classes is not None else b""
+        buffers = [bytearray((self.size + 7) // 8) for _ in NODE_CLASSES]
+        for position, code in enumerate(codes):
+            buffers[code][position >> 3] |= 1 << (position & 7)
+        self.class_masks: Dict[str, int] = {
+            name: int.from_bytes(buffer, "little")
+            for name, buffer in zip(NODE_CLASSES, buffers)
+        }
+
+    def encode(self, node_ids: Iterable[int]) -> "AllocationBits":
+        """
+        將節點 ID 轉為位元集合
+
+        不在天賦樹中的節點（例如星團珠寶展開的節點）另外以集合保存，
+        集合運算結果與直接比較節點 ID 相同。
+        """
+        index_of = self.index_of
+        buffer = bytearray((self.size + 7) // 8)
+        extra = set()
+        for node_id in node_ids:
+            position = index_of.get(node_id)
+            if position is None:
+                extra.add(node_id)
+            else:
+                buffer[position >> 3] |= 1 << (position & 7)
+        return AllocationBits(self, int.from_bytes(buffer, "little"), frozenset(extra))
+
+    def class_mask(self, *node_classes: str) -> int:
+        """
+        取得一或多個類型的聯集遮罩
+
+        Raises:
+            ValueError: 未知的節點類型
+        """
+        mask = 0
+        for node_class in node_classes:
+            if node_class not in self.class_masks:
+                raise ValueError(f"未知的節點類型: {node_class}")
+            mask |= self.class_masks[node_class]
+        return mask
+
+    def decode(self, mask: int) -> List[int]:
+        """將遮罩轉回節點 ID（依節點表順序）"""
+        node_ids = self.node_ids
+        result = []
+        data = mask.to_bytes((self.size + 7) // 8, "little")
+        for byte_index, byte in enumerate(data):
+            while byte:
+                low = byte & -byte
+                result.append(node_ids[(byte_index << 3) + low.bit_length() - 1])
+                byte ^= low
+        return result
+
+
+class AllocationBits:
+    """
+    天賦配置位元集合（不可變）
+
+    mask 為天賦樹中節點的位元，extra 為不在天賦樹中的節點 ID；
+    只能與同一座標系的位元集合運算。
+    """
+
+    __slots__ = ("space", "mask", "extra")
+
+    def __init__(self, space: AllocationSpace, mask: int, extra: FrozenSet[int] = frozenset()):
+        self.space = space
+        self.mask = mask
+        self.extra = extra
+
+    def _check(self, other: "AllocationBits"):
+        if other.space is not self.space:
+            raise ValueError("位元集合屬於不同的天賦樹版本")
+
+    def __and__(self, other: "AllocationBits") -> "AllocationBits":
+        self._check(other)
+        return AllocationBits(self.space, self.mask & other.mask, self.extra & other.extra)
+
+    def __or__(self, other: "AllocationBits") -> "AllocationBits":
+        self._check(other)
+        return AllocationBits(self.space, self.mask | other.mask, self.extra | other.extra)
+
+    def __sub__(self, other: "AllocationBits") -> "AllocationBits":
+        self._check(other)
+        return AllocationBits(self.space, self.mask & ~other.mask, self.extra - other.extra)
+
+    def __len__(self) -> int:
+        return _popcount(self.mask) + len(self.extra)
+
+    def __bool__(self) -> bool:
+        return bool(self.mask or self.extra)
+
+    def __contains__(self, node_id: int) -> bool:
+        position = self.space.index_of.get(node_id)
+        if position is None:
+            return node_id in self.extra
+        return bool(self.mask >> position & 1)
+
+    def restrict(self, mask: int) -> "AllocationBits":
+        """只保留遮罩內的節點（不在天賦樹中的節點一併移除）"""
+        return AllocationBits(self.space, self.mask & mask)
+
+    def of_class(self, *node_classes: str) -> "AllocationBits":
+        """只保留指定類型的節點"""
+        return self.restrict(self.space.class_mask(*node_classes))
+
+    def count_of(self, *node_classes: str) -> int:
+        """指定類型的節點數"""
+        return _popcount(self.mask & self.space.class_mask(*node_classes))
+
+    def node_ids(self) -> List[int]:
+        """轉回節點 ID（天賦樹節點依節點表順序，其後為排序後的其他節點）"""
+        return self.space.decode(self.mask) + sorted(self.extra)
+
+    def jaccard(self, other: "AllocationBits") -> float:
+        """Jaccard 相似度（共同節點數 / 聯集節點數；兩者皆空時為 1.0）"""
+        self._check(other)
+        union = _popcount(self.mask | other.mask) + len(self.extra | other.extra)
+        if union == 0:
+            return 1.0
+        return (_popcount(self.mask & other.mask) + len(self.extra & other.extra)) / union
+
+
+def rank_by_similarity(
+    reference: AllocationBits,
+    candidates: Sequence[AllocationBits],
+    limit: Optional[int] = None
+) -> List[Tuple[int, float, int, int, int]]:
+    """
+    依 Jaccard 相似度排序多個配置
+
+    Args:
+        reference: 參考配置
+        candidates: 候選配置
+        limit: 最多返回筆數；None 表示全部
+
+    Returns:
+        (候選索引, 相似度, 共同節點數, 參考有而候選缺少的節點數, 候選多出的節點數)，
+        相似度高者在前
+    """
+    reference_count = len(reference)
+    results = []
+    for position, candidate in enumerate(candidates):
+        reference._check(candidate)
+        shared = _popcount(reference.mask & candidate.mask) + len(reference.extra & candidate.extra)
+        candidate_count = len(candidate)
+        union = reference_count + candidate_count - shared
+        similarity = shared / union if union else 1.0
+        results.append((
+            position,
+            similarity,
+            shared,
+            reference_count - shared,
+            candidate_count - shared
+        ))
+
+    results.sort(key=lambda result: (-result[1], result[0]))
+    return results if limit is None else results[:limit]
+
+
+# ===== 依天賦樹版本共用 =====
+
+_SPACE_CACHE: Dict[Optional[str], AllocationSpace] = {}
+_SPACE_LOCK = threading.Lock()
+
+
+def allocation_space_for(classes: Optional[NodeClassIndex]) -> AllocationSpace:
+    """
+    取得分類索引對應的位元座標系（同一版本只建立一次）
+
+    Args:
+        classes: 節點分類索引；None 表示沒有天賦樹資料（空座標系）
+
+    Returns:
+        位元座標系
+    """
+    key = classes.version if classes is not None else None
+    space = _SPACE_CACHE.get(key)
+    if space is None or space.classes is not classes:
+        with _SPACE_LOCK:
+            space = _SPACE_CACHE.get(key)
+            if space is None or space.classes is not classes:
+                space = _SPACE_CACHE[key] = AllocationSpace(classes)
+    return space
@@ -0,0 +1,222 @@
+"""
+天賦樹節點分類索引
+依天賦樹資料（ascendancyName、isKeystone、isNotable、isMastery、
+isJewelSocket、職業起始節點）將每個節點壓縮為一個位元組的類型代碼，
+每個天賦樹版本建立一次，供 PoB 映射器與分析器以 O(1) 查詢
+"""
+import threading
+from typing import Dict, Iterable, List, NamedTuple, Optional, Tuple
+import logging
+
+from app.passive_tree_snapshot import (
+    DEFAULT_TREE_VERSION,
+    FLAG_CLASS_START,
+    FLAG_JEWEL_SOCKET,
+    FLAG_KEYSTONE,
+    FLAG_MASTERY,
+    FLAG_NOTABLE,
+    PassiveTreeSnapshot,
+    compile_tree_data,
+    decode_tree_snapshot,
+    read_tree_snapshot,
+    snapshot_path
+)
+
+logger = logging.getLogger(__name__)
+
+
+# 類型代碼（名稱與 NodeType 的值相同）
+NODE_CLASSES: Tuple[str, ...] = (
+    "small_passive", "keystone", "notable", "mastery", "jewel_socket", "ascendancy", "class_start"
+)
+CLASS_SMALL_PASSIVE = 0
+CLASS_KEYSTONE = 1
+CLASS_NOTABLE = 2
+CLASS_MASTERY = 3
+CLASS_JEWEL_SOCKET = 4
+CLASS_ASCENDANCY = 5
+CLASS_START = 6
+
+# 不在天賦樹中的節點
+CLASS_UNKNOWN = 0xFF
+
+# 珠寶插槽類型（索引為快照的 jewel_sizes 代碼，名稱與 JewelSocketInfo.socket_type 相同）
+JEWEL_SOCKET_TYPES: Tuple[str, ...] = ("regular", "cluster_small", "cluster_medium", "cluster_large")
+
+
+def _node_class(flags: int, ascendancy: str) -> int:
+    """
+    由旗標決定類型代碼
+
+    優先順序：職業起始 > 昇華 > 基石 > 顯著 > 專精 > 珠寶插槽；
+    昇華區的顯著天賦使用昇華點數，歸類為昇華節點。
+    """
+    if flags & FLAG_CLASS_START:
+        return CLASS_START
+    if ascendancy:
+        return CLASS_ASCENDANCY
+    if flags & FLAG_KEYSTONE:
+        return CLASS_KEYSTONE
+    if flags & FLAG_NOTABLE:
+        return CLASS_NOTABLE
+    if flags & FLAG_MASTERY:
+        return CLASS_MASTERY
+    if flags & FLAG_JEWEL_SOCKET:
+        return CLASS_JEWEL_SOCKET
+    return CLASS_SMALL_PASSIVE
+
+
+class ClassifiedNodes(NamedTuple):
+    """一次走訪分類後的節點"""
+    keystones: List[int]
+    notables: List[int]
+    masteries: List[int]
+    jewel_sockets: List[Tuple[int, str]]    # (節點 ID, 插槽類型)
+    ascendancy: List[int]
+    small_passives: List[int]
+    unknown: List[int]                      # 不在天賦樹中的節點
+
+
+class NodeClassIndex:
+    """
+    節點分類索引（不可變）
+
+    codes[i] 與 jewel_sizes[i] 對應快照中第 i 個節點。
+    """
+
+    def __init__(self, snapshot: PassiveTreeSnapshot):
+        """
+        由天賦樹快照建立索引
+
+        Args:
+            snapshot: 已解碼的天賦樹快照
+        """
+        self.version = snapshot.version
+        self.source_digest = snapshot.source_digest
+        self.node_ids = snapshot.node_ids
+        self.index_of: Dict[int, int] = {
+            node_id: index for index, node_id in enumerate(snapshot.node_ids)
+        }
+        self.codes = bytes(
+            _node_class(flags, ascendancy)
+            for flags, ascendancy in zip(snapshot.node_flags, snapshot.ascendancies)
+        )
+        self.jewel_sizes = bytes(snapshot.jewel_sizes)
+
+    @classmethod
+    def from_tree_data(cls, tree_data: Dict, version: str = "") -> "NodeClassIndex":
+        """由原始 data.json 內容建立索引"""
+        return cls(decode_tree_snapshot(compile_tree_data(tree_data, version)))
+
+    def __len__(self) -> int:
+        return len(self.codes)
+
+    def code_of(self, node_id: int) -> int:
+        """取得節點的類型代碼（不在天賦樹中為 CLASS_UNKNOWN）"""
+        index = self.index_of.get(node_id)
+        return CLASS_UNKNOWN if index is None else self.codes[index]
+
+    def class_of(self, node_id: int) -> Optional[str]:
+        """取得節點的類型名稱（不在天賦樹中為 None）"""
+        code = self.code_of(node_id)
+        return None if code == CLASS_UNKNOWN else NODE_CLASSES[code]
+
+    def is_ascendancy(self, node_id: int) -> bool:
+        """是否為昇華節點"""
+        return self.code_of(node_id) == CLASS_ASCENDANCY
+
+    def socket_type_of(self, node_id: int) -> Optional[str]:
+        """珠寶插槽類型（非插槽為 None）"""
+        index = self.index_of.get(node_id)
+        if index is None or self.codes[index] != CLASS_JEWEL_SOCKET:
+            return None
+        return JEWEL_SOCKET_TYPES[self.jewel_sizes[index]]
+
+    def classify(self, node_ids: Iterable[int]) -> ClassifiedNodes:
+        """
+        一次走訪將節點依類型分組
+
+        Args:
+            node_ids: 節點 ID
+
+        Returns:
+            分類結果（職業起始節點不列入）
+        """
+        index_of = self.index_of
+        codes = self.codes
+        jewel_sizes = self.jewel_sizes
+        result = ClassifiedNodes([], [], [], [], [], [], [])
+        buckets = {
+            CLASS_KEYSTONE: result.keystones,
+            CLASS_NOTABLE: result.notables,
+            CLASS_MASTERY: result.masteries,
+            CLASS_ASCENDANCY: result.ascendancy,
+            CLASS_SMALL_PASSIVE: result.small_passives,
+        }
+
+        for node_id in node_ids:
+            index = index_of.get(node_id)
+            if index is None:
+                result.unknown.append(node_id)
+                continue
+            code = codes[index]
+            if code == CLASS_JEWEL_SOCKET:
+                result.jewel_sockets.append((node_id, JEWEL_SOCKET_TYPES[jewel_sizes[index]]))
+            elif code != CLASS_START:
+                buckets[code].append(node_id)
+
+        return result
+
+
+# ===== 依天賦樹版本共用 =====
+
+_CLASS_INDEX_CACHE: Dict[str, NodeClassIndex] = {}
+_CLASS_INDEX_LOCK = threading.Lock()
+
+
+def node_class_index_for(snapshot: PassiveTreeSnapshot) -> NodeClassIndex:
+    """
+    取得天賦樹快照對應的分類索引（同一版本只建立一次）
+
+    Args:
+        snapshot: 已解碼的天賦樹快照
+
+    Returns:
+        分類索引
+    """
+    index = _CLASS_INDEX_CACHE.get(snapshot.version)
+    if index is None or index.source_digest != snapshot.source_digest:
+        with _CLASS_INDEX_LOCK:
+            index = _CLASS_INDEX_CACHE.get(snapshot.version)
+            if index is None or index.source_digest != snapshot.source_digest:
+                index = _CLASS_INDEX_CACHE[snapshot.version] = NodeClassIndex(snapshot)
+    return index
+
+
+def get_node_class_index(version: Optional[str] = None) -> Optional[NodeClassIndex]:
+    """
+    取得指定版本的分類索引
+
+    本行程已載入該版本時直接使用；否則（例如 process 模式的子行程）
+    讀取本機快照檔。指定版本沒有快照時退回預設版本。
+
+    Args:
+        version: 天賦樹版本（例如 PoB Spec 的 treeVersion）；None 表示預設版本
+
+    Returns:
+        分類索引；沒有可用的快照時為 None
+    """
+    for candidate in dict.fromkeys((version or DEFAULT_TREE_VERSION, DEFAULT_TREE_VERSION)):
+        index = _CLASS_INDEX_CACHE.get(candidate)
+        if index is not None:
+            return index
+
+        path = snapshot_path(candidate)
+        if not path.exists():
+            continue
+        try:
+            return node_class_index_for(read_tree_snapshot(path))
+        except (OSError, ValueError) as e:
+            logger.warning(f"天賦樹快照讀取失敗 {path}: {str(e)}")
+
+    return None
@@ -0,0 +1,238 @@
+"""
+天賦樹配置解碼器
+將 PoB Spec 的 nodes / masteryEffects 屬性或官方天賦樹 URL 一次解碼為緊湊陣列
+"""
+import base64
+import binascii
+import re
+import struct
+from array import array
+from typing import Dict, Iterable, NamedTuple, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 官方天賦樹 URL 支援的版本範圍
+MIN_TREE_URL_VERSION = 3
+MAX_TREE_URL_VERSION = 6
+
+# 星團珠寶節點在 URL 中以 16 位元儲存，實際 ID 需加上此偏移
+CLUSTER_NODE_OFFSET = 65536
+
+_MASTERY_PATTERN = re.compile(r"\{\s*(\d+)\s*,\s*(\d+)\s*\}")
+
+
+class DecodedAllocation(NamedTuple):
+    """單一天賦樹 Spec 的解碼結果"""
+    nodes: array                    # array('I')，已配置節點（含星團節點）
+    class_id: Optional[int]
+    ascendancy_id: Optional[int]
+    mastery_effects: Dict[int, int]  # 專精節點 ID -> 效果 ID
+    source: str                     # nodes_attr / node_elements / url / empty
+
+
+class DecodedTreeUrl(NamedTuple):
+    """官方天賦樹 URL 的解碼結果"""
+    version: int
+    class_id: int
+    ascendancy_id: int
+    secondary_ascendancy_id: int
+    nodes: array                    # array('I')
+    cluster_nodes: array            # array('I')，已加上 CLUSTER_NODE_OFFSET
+    mastery_effects: Dict[int, int]
+
+
+def parse_nodes_attribute(nodes: str) -> array:
+    """
+    解析 Spec 的 nodes 屬性（逗號分隔的節點 ID）
+
+    Args:
+        nodes: 例如 "1234,5678,9012"
+
+    Returns:
+        array('I') 節點 ID（忽略空白項目與非正數）
+    """
+    values = array("I")
+    for token in nodes.split(","):
+        token = token.strip()
+        if token:
+            node_id = int(token)
+            if node_id > 0:
+                values.append(node_id)
+    return values
+
+
+def parse_mastery_effects(mastery_effects: str) -> Dict[int, int]:
+    """
+    解析 Spec 的 masteryEffects 屬性
+
+    Args:
+        mastery_effects: 例如 "{53188,64875},{1234,5678}"
+
+    Returns:
+        專精節點 ID -> 效果 ID
+    """
+    return {
+        int(node_id): int(effect_id)
+        for node_id, effect_id in _MASTERY_PATTERN.findall(mastery_effects)
+    }
+
+
+def decode_tree_url(url: str) -> DecodedTreeUrl:
+    """
+    解碼官方天賦樹 URL（版本 3–6）
+
+    位元組格式（大端序）：
+      [0:4] 版本、[4] 職業、[5] 昇華（v4+，高位為第二昇華）、
+      v4: [6] 全螢幕旗標，節點從 [7] 開始直到結尾；
+      v5+: [6] 節點數 N，之後 N 個 uint16 節點、1 位元組星團節點數 M 與 M 個 uint16；
+      v6+: 1 位元組專精數 K 與 K 組 (效果 uint16, 節點 uint16)。
+
+    Args:
+        url: 天賦樹 URL 或其 base64 片段
+
+    Returns:
+        解碼結果
+
+    Raises:
+        ValueError: 格式或版本不支援
+    """
+    data = _tree_url_bytes(url)
+    if len(data) < 6:
+        raise ValueError("天賦樹 URL 資料過短")
+
+    version = struct.unpack_from(">I", data, 0)[0]
+    if not MIN_TREE_URL_VERSION <= version <= MAX_TREE_URL_VERSION:
+        raise ValueError(f"不支援的天賦樹 URL 版本: {version}")
+
+    class_id = data[4]
+    ascendancy_byte = data[5] if version >= 4 else 0
+    cluster_nodes = array("I")
+    mastery_effects: Dict[int, int] = {}
+
+    if version < 5:
+        start = 7 if version >= 4 else 6
+        count = (len(data) - start) // 2
+        nodes = _unpack_uint16(data, start, count)
+        position = len(data)
+    else:
+        count = data[6]
+        nodes = _unpack_uint16(data, 7, count)
+        position = 7 + count * 2
+
+        if position < len(data):
+            cluster_count = data[position]
+            cluster_nodes = array(
+                "I",
+                (node_id + CLUSTER_NODE_OFFSET
+                 for node_id in _unpack_uint16(data, position + 1, cluster_count))
+            )
+            position += 1 + cluster_count * 2
+
+        if version >= 6 and position < len(data):
+            mastery_count = data[position]
+            pairs = _unpack_uint16(data, position + 1, mastery_count * 2)
+            mastery_effects = {
+                pairs[i + 1]: pairs[i] for i in range(0, len(pairs), 2)
+            }
+
+    return DecodedTreeUrl(
+        version=version,
+        class_id=class_id,
+        ascendancy_id=ascendancy_byte & 0x03,
+        secondary_ascendancy_id=ascendancy_byte >> 2,
+        nodes=nodes,
+        cluster_nodes=cluster_nodes,
+        mastery_effects=mastery_effects
+    )
+
+
+def _tree_url_bytes(url: str) -> bytes:
+    """取出 URL 最後一段並以 URL-safe base64 解碼"""
+    payload = url.strip().split("?", 1)[0].rstrip("/").rsplit("/", 1)[-1]
+    try:
+        return base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4))
+    except (binascii.Error, ValueError) as e:
+        raise ValueError(f"天賦樹 URL 解碼失敗: {str(e)}")
+
+
+def _unpack_uint16(data: bytes, offset: int, count: int) -> array:
+    """一次解開連續的大端序 uint16"""
+    if count <= 0:
+        return array("I")
+    if offset + count * 2 > len(data):
+        raise ValueError("天賦樹 URL 資料截斷")
+    return array("I", struct.unpack_from(f">{count}H", data, offset))
+
+
+def decode_spec_allocation(
+    spec_attrs: Dict[str, str],
+    node_ids: Iterable[int] = (),
+    tree_url: Optional[str] = None
+) -> DecodedAllocation:
+    """
+    解碼單一 Spec 的天賦配置
+
+    依序使用 nodes 屬性、Node 子節點、天賦樹 URL 中第一個可用的來源；
+    職業、昇華與專精優先取 Spec 屬性，缺少時由 URL 補齊。
+
+    Args:
+        spec_attrs: Spec 節點屬性
+        node_ids: Node 子節點的 nodeId
+        tree_url: URL 子節點文字
+
+    Returns:
+        解碼結果
+    """
+    class_id = _optional_int(spec_attrs.get("classId"))
+    ascendancy_id = _optional_int(spec_attrs.get("ascendClassId"))
+    mastery_attr = spec_attrs.get("masteryEffects")
+    mastery_effects = parse_mastery_effects(mastery_attr) if mastery_attr else {}
+
+    nodes_attr = spec_attrs.get("nodes")
+    node_list = node_ids if isinstance(node_ids, (list, array)) else list(node_ids)
+
+    if nodes_attr:
+        nodes, source = parse_nodes_attribute(nodes_attr), "nodes_attr"
+    elif node_list:
+        nodes, source = array("I", (n for n in node_list if n > 0)), "node_elements"
+    else:
+        nodes, source = array("I"), "empty"
+
+    # URL 只在缺少資料時才解碼
+    if tree_url and (source == "empty" or class_id is None or ascendancy_id is None
+                     or (mastery_attr is None and not mastery_effects)):
+        try:
+            decoded = decode_tree_url(tree_url)
+        except ValueError as e:
+            logger.warning(f"天賦樹 URL 無法解碼: {str(e)}")
+        else:
+            if source == "empty":
+                nodes = decoded.nodes + decoded.cluster_nodes
+                source = "url"
+            if class_id is None:
+                class_id = decoded.class_id
+            if ascendancy_id is None:
+                ascendancy_id = decoded.ascendancy_id
+            if mastery_attr is None and not mastery_effects:
+                mastery_effects = decoded.mastery_effects
+
+    return DecodedAllocation(
+        nodes=nodes,
+        class_id=class_id,
+        ascendancy_id=ascendancy_id,
+        mastery_effects=mastery_effects,
+        source=source
+    )
+
+
+def _optional_int(value: Optional[str]) -> Optional[int]:
+    """將屬性值轉為整數（空值或格式錯誤為 None）"""
+    if value is None or value == "":
+        return None
+    try:
+        return int(value)
+    except ValueError:
+        return None
+
@@ -0,0 +1,285 @@
+"""
+天賦樹距離場快取
+以配置指紋為鍵快取完整距離場；新配置與快取中的配置只差幾個節點時，
+以增量方式更新距離場，而非重新走訪整棵天賦樹
+"""
+import hashlib
+import os
+import threading
+from array import array
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Iterable, List, Optional, Tuple
+import logging
+
+from app.passive_tree_index import DistanceField, PassiveTreeIndex
+
+logger = logging.getLogger(__name__)
+
+
+# 快取的距離場數量上限
+DEFAULT_MAX_FIELDS = int(os.getenv("PASSIVE_TREE_FIELD_CACHE_SIZE", "64"))
+
+# 與快取配置相差超過此節點數時改為重新建立
+DEFAULT_MAX_DELTA = 16
+
+
+def allocation_fingerprint(indices: Iterable[int]) -> str:
+    """
+    計算配置的指紋（與節點順序、重複無關）
+
+    Args:
+        indices: 已配置節點的索引
+
+    Returns:
+        BLAKE2b 十六進位摘要
+    """
+    return hashlib.blake2b(
+        array("I", sorted(set(indices))).tobytes(),
+        digest_size=16
+    ).hexdigest()
+
+
+class DistanceFieldCache:
+    """
+    距離場快取（依最久未使用淘汰）
+
+    快取中的距離場會被多個請求共用，呼叫端必須視為唯讀；
+    增量更新一律在複本上進行。
+    增量更新得到的距離與重新建立相同，但距離相同的多條路徑可能選到不同的一條。
+    """
+
+    def __init__(
+        self,
+        index: PassiveTreeIndex,
+        max_fields: int = DEFAULT_MAX_FIELDS,
+        max_delta: int = DEFAULT_MAX_DELTA
+    ):
+        """
+        初始化快取
+
+        Args:
+            index: 天賦樹鄰接索引
+            max_fields: 快取的距離場數量上限
+            max_delta: 允許增量更新的最大節點差異數
+        """
+        self.index = index
+        self.max_fields = max_fields
+        self.max_delta = max_delta
+        self._entries: "OrderedDict[str, Tuple[FrozenSet[int], DistanceField]]" = OrderedDict()
+        self._lock = threading.Lock()
+
+        # 統計計數
+        self.hits = 0
+        self.incremental = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, start_nodes: Iterable[int]) -> DistanceField:
+        """
+        取得由起點出發、走訪整棵天賦樹的距離場
+
+        Args:
+            start_nodes: 起點節點 ID（通常為已配置節點）
+
+        Returns:
+            距離場（唯讀）
+        """
+        sources = frozenset(self.index.to_indices(start_nodes))
+        key = allocation_fingerprint(sources)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            base = self._nearest_entry(sources)
+
+        if base is not None:
+            field = self._update(base[1], base[0], sources)
+        else:
+            field = self.index.distance_field(self.index.to_node_ids(sources))
+
+        with self._lock:
+            if base is not None:
+                self.incremental += 1
+            else:
+                self.misses += 1
+            self._entries[key] = (sources, field)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_fields:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+        return field
+
+    def _nearest_entry(self, sources: FrozenSet[int]) -> Optional[Tuple[FrozenSet[int], DistanceField]]:
+        """找出差異最小且不超過上限的快取項目（須持有鎖；最近使用者優先）"""
+        best = None
+        best_delta = self.max_delta + 1
+        for cached_sources, field in reversed(self._entries.values()):
+            if abs(len(cached_sources) - len(sources)) >= best_delta:
+                continue
+            delta = len(cached_sources ^ sources)
+            if delta < best_delta:
+                best, best_delta = (cached_sources, field), delta
+                if delta <= 1:
+                    break
+        return best
+
+    # ===== 增量更新 =====
+
+    def _update(
+        self,
+        base: DistanceField,
+        old_sources: FrozenSet[int],
+        new_sources: FrozenSet[int]
+    ) -> DistanceField:
+        """
+        由既有距離場增量更新為新起點集合的距離場
+
+        移除的起點：只有路徑屬於該起點的節點需要重算，
+        由周圍仍有效的節點作為種子，依距離分桶重新擴展。
+        新增的起點：由新起點 BFS，只沿距離變短的節點擴展。
+        """
+        distances = array("i", base.distances)
+        parents = array("i", base.parents)
+        roots = array("i", base.roots)
+
+        removed = old_sources - new_sources
+        if removed:
+            self._repair_removed(distances, parents, roots, removed, new_sources)
+
+        added = new_sources - old_sources
+        if added:
+            self._relax_added(distances, parents, roots, added, new_sources)
+
+        return DistanceField(self.index, distances, parents, roots)
+
+    def _can_expand(self, position: int, sources: FrozenSet[int]) -> bool:
+        """節點可否往外延伸（起點一律可以，其餘須非職業起始節點）"""
+        return position in sources or bool(self.index.traversable[position])
+
+    def _repair_removed(
+        self,
+        distances: array,
+        parents: array,
+        roots: array,
+        removed: FrozenSet[int],
+        sources: FrozenSet[int]
+    ):
+        """重算路徑屬於已移除起點的節點"""
+        offsets = self.index.offsets
+        neighbors = self.index.neighbors
+
+        invalid = [position for position, root in enumerate(roots) if root in removed]
+        for position in invalid:
+            distances[position] = -1
+            parents[position] = -1
+            roots[position] = -1
+
+        # 由仍有效的鄰居取得暫定距離，依距離分桶
+        buckets: Dict[int, List[int]] = {}
+        for position in invalid:
+            best_distance, best_parent = -1, -1
+            for neighbor in neighbors[offsets[position]:offsets[position + 1]]:
+                distance = distances[neighbor]
+                if distance < 0 or not self._can_expand(neighbor, sources):
+                    continue
+                if best_distance < 0 or distance + 1 < best_distance:
+                    best_distance, best_parent = distance + 1, neighbor
+            if best_parent >= 0:
+                distances[position] = best_distance
+                parents[position] = best_parent
+                roots[position] = roots[best_parent]
+                buckets.setdefault(best_distance, []).append(position)
+
+        invalid_set = set(invalid)
+        distance = min(buckets) if buckets else 0
+        while buckets:
+            frontier = buckets.pop(distance, [])
+            for current in frontier:
+                if distances[current] != distance or not self._can_expand(current, sources):
+                    continue
+                for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                    if neighbor not in invalid_set:
+                        continue
+                    if distances[neighbor] < 0 or distances[neighbor] > distance + 1:
+                        distances[neighbor] = distance + 1
+                        parents[neighbor] = current
+                        roots[neighbor] = roots[current]
+                        buckets.setdefault(distance + 1, []).append(neighbor)
+            distance += 1
+
+    def _relax_added(
+        self,
+        distances: array,
+        parents: array,
+        roots: array,
+        added: FrozenSet[int],
+        sources: FrozenSet[int]
+    ):
+        """由新增起點 BFS，只更新距離變短的節點"""
+        offsets = self.index.offsets
+        neighbors = self.index.neighbors
+
+        frontier = []
+        for position in added:
+            distances[position] = 0
+            parents[position] = -1
+            roots[position] = position
+            frontier.append(position)
+
+        distance = 0
+        while frontier:
+            distance += 1
+            next_frontier = []
+            for current in frontier:
+                if not self._can_expand(current, sources):
+                    continue
+                for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                    if distances[neighbor] < 0 or distances[neighbor] > distance:
+                        distances[neighbor] = distance
+                        parents[neighbor] = current
+                        roots[neighbor] = roots[current]
+                        next_frontier.append(neighbor)
+            frontier = next_frontier
+
+    def stats(self) -> Dict[str, Any]:
+        """取得快取統計資訊"""
+        with self._lock:
+            lookups = self.hits + self.incremental + self.misses
+            return {
+                "entries": len(self._entries),
+                "max_fields": self.max_fields,
+                "hits": self.hits,
+                "incremental": self.incremental,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": (self.hits + self.incremental) / lookups if lookups else 0.0
+            }
+
+
+# ===== 依天賦樹版本共用 =====
+
+_CACHE_BY_INDEX: Dict[int, DistanceFieldCache] = {}
+_CACHE_LOCK = threading.Lock()
+
+
+def get_field_cache(index: PassiveTreeIndex) -> DistanceFieldCache:
+    """
+    取得鄰接索引對應的距離場快取
+
+    Args:
+        index: 天賦樹鄰接索引
+
+    Returns:
+        距離場快取
+    """
+    key = id(index)
+    cache = _CACHE_BY_INDEX.get(key)
+    if cache is None or cache.index is not index:
+        with _CACHE_LOCK:
+            cache = _CACHE_BY_INDEX.get(key)
+            if cache is None or cache.index is not index:
+                cache = _CACHE_BY_INDEX[key] = DistanceFieldCache(index)
+    return cache
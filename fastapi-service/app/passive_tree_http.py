@@ -0,0 +1,252 @@
+"""
+天賦樹 API 的 HTTP 快取輔助
+由天賦樹版本與來源摘要推導強 ETag、處理 If-None-Match 條件請求，
+並快取全樹傾印的 JSON 與預先 gzip 壓縮後的內容
+"""
+import gzip
+import hashlib
+import json
+import re
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, NamedTuple, Optional, Tuple
+import logging
+
+from fastapi import Request, Response
+
+from app.passive_tree_nodes import PassiveNodeTable
+
+logger = logging.getLogger(__name__)
+
+
+# 同一版本內容可能更新（重新載入），每次使用前都要驗證
+CACHE_REVALIDATE = "public, no-cache"
+# 網址帶有版本的內容永不改變
+CACHE_IMMUTABLE = "public, max-age=31536000, immutable"
+# POST 回應只允許瀏覽器自行保存
+CACHE_PRIVATE = "private, no-cache"
+
+# 小於此大小的回應不壓縮
+MIN_COMPRESS_SIZE = 1024
+GZIP_LEVEL = 6
+
+# 最多保存的預先編碼傾印數（不同版本 / 欄位 / 格式的組合）
+MAX_CACHED_PAYLOADS = 8
+
+_ETAG_UNSAFE = re.compile(r"[^\w.-]")
+
+# gzip 表示的 ETag 後綴（強驗證器必須依內容編碼區分）
+GZIP_ETAG_SUFFIX = "-gz"
+
+
+def tree_digest(table: Optional[PassiveNodeTable]) -> Optional[str]:
+    """
+    天賦樹資料的內容摘要（十六進位）；沒有資料或快照未記錄來源摘要時為 None
+
+    同一版本標籤下的資料被替換或重新下載時摘要必定改變，可放入網址作為快取鍵。
+    """
+    if table is None or not table.source_digest.strip(b"\0"):
+        return None
+    return table.source_digest.hex()
+
+
+def tree_etag(table: Optional[PassiveNodeTable], *parts: Any) -> str:
+    """
+    產生強 ETag（天賦樹版本 + 來源摘要 + 請求參數）
+
+    同一份天賦樹資料與相同參數得到相同的 ETag；重新載入不同內容時必定改變。
+    此為原始（未壓縮）表示的 ETag，gzip 表示使用 gzip_etag。
+
+    Args:
+        table: 天賦樹節點表；None 表示沒有天賦樹資料
+        parts: 影響回應內容的參數（欄位、格式、節點 ID 等）
+
+    Returns:
+        帶雙引號的 ETag
+    """
+    digest = hashlib.blake2b(digest_size=12)
+    version = "none"
+    if table is not None:
+        version = _ETAG_UNSAFE.sub("_", str(table.version))
+        digest.update(table.source_digest)
+    for part in parts:
+        digest.update(b"\0")
+        digest.update(repr(part).encode("utf-8"))
+    return f'"{version}-{digest.hexdigest()}"'
+
+
+def gzip_etag(etag: str) -> str:
+    """同一內容 gzip 表示的 ETag"""
+    return f'{etag[:-1]}{GZIP_ETAG_SUFFIX}"'
+
+
+def matched_etag(request: Request, etag: str) -> Optional[str]:
+    """
+    檢查 If-None-Match 是否命中此內容的任一表示（原始或 gzip）
+
+    If-None-Match 使用弱比較，忽略 W/ 前綴；兩種表示內容相同，
+    客戶端保存任一種都可以沿用。
+
+    Returns:
+        命中的 ETag（304 回應時原樣送回）；未命中為 None
+    """
+    header = request.headers.get("if-none-match")
+    if not header:
+        return None
+    variants = (etag, gzip_etag(etag))
+    for candidate in header.split(","):
+        candidate = candidate.strip()
+        if candidate == "*":
+            return etag
+        if candidate.startswith("W/"):
+            candidate = candidate[2:]
+        if candidate in variants:
+            return candidate
+    return None
+
+
+def accepts_gzip(request: Request) -> bool:
+    """
+    檢查 Accept-Encoding 是否接受 gzip（q=0 表示拒絕）
+
+    明確的 gzip 項目優先於萬用字元 *，例如 "*;q=0, gzip" 接受 gzip、
+    "gzip;q=0, *" 拒絕 gzip；沒有 gzip 項目時才依 * 的 q 值判斷。
+    """
+    header = request.headers.get("accept-encoding", "")
+    wildcard = None
+    for coding in header.split(","):
+        name, _, params = coding.partition(";")
+        name = name.strip().lower()
+        if name == "gzip":
+            return _quality(params) > 0
+        if name == "*" and wildcard is None:
+            wildcard = _quality(params)
+    return wildcard is not None and wildcard > 0
+
+
+def _quality(params: str) -> float:
+    """解析編碼項目的 q 值（未指定為 1，格式錯誤視為 0）"""
+    for param in params.split(";"):
+        key, _, value = param.partition("=")
+        if key.strip().lower() == "q":
+            try:
+                return float(value.strip())
+            except ValueError:
+                return 0.0
+    return 1.0
+
+
+class TreePayload(NamedTuple):
+    """預先編碼的回應內容"""
+    etag: str
+    body: bytes
+    gzip_body: Optional[bytes]  # 太小而不壓縮時為 None
+
+
+def encode_payload(content: Any, etag: str, compress: bool = True) -> TreePayload:
+    """
+    將回應內容編碼為 JSON（與 FastAPI 預設輸出相同的緊湊格式），必要時一併壓縮
+
+    Args:
+        content: 可 JSON 序列化的回應內容
+        etag: 此內容的 ETag
+        compress: 是否產生 gzip 版本
+    """
+    body = json.dumps(content, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+    gzip_body = None
+    if compress and len(body) >= MIN_COMPRESS_SIZE:
+        gzip_body = gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+    return TreePayload(etag, body, gzip_body)
+
+
+def not_modified(etag: str, cache_control: str) -> Response:
+    """304 回應（保留快取標頭，讓瀏覽器延長快取）"""
+    return Response(
+        status_code=304,
+        headers={"ETag": etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    )
+
+
+def payload_response(request: Request, payload: TreePayload, cache_control: str) -> Response:
+    """
+    依條件請求與 Accept-Encoding 返回 304、gzip 或原始 JSON
+
+    Args:
+        request: HTTP 請求
+        payload: 預先編碼的內容
+        cache_control: Cache-Control 標頭
+    """
+    etag = matched_etag(request, payload.etag)
+    if etag is not None:
+        return not_modified(etag, cache_control)
+
+    if payload.gzip_body is not None and accepts_gzip(request):
+        headers = {
+            "ETag": gzip_etag(payload.etag),
+            "Cache-Control": cache_control,
+            "Vary": "Accept-Encoding",
+            "Content-Encoding": "gzip"
+        }
+        return Response(content=payload.gzip_body, media_type="application/json", headers=headers)
+    headers = {"ETag": payload.etag, "Cache-Control": cache_control, "Vary": "Accept-Encoding"}
+    return Response(content=payload.body, media_type="application/json", headers=headers)
+
+
+class TreePayloadCache:
+    """
+    預先編碼回應的 LRU 快取
+
+    鍵由呼叫端提供且必須包含天賦樹版本與來源摘要（通常就是 ETag），
+    重新載入的資料自然使用新的鍵，舊內容會被淘汰。
+    """
+
+    def __init__(self, max_entries: int = MAX_CACHED_PAYLOADS):
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[Tuple, TreePayload]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+    def get_or_build(self, key: Tuple, builder: Callable[[], TreePayload]) -> TreePayload:
+        """
+        取得快取的內容；沒有時呼叫 builder 建立（同一個鍵只建立一次）
+
+        Args:
+            key: 快取鍵
+            builder: 產生預先編碼內容的函式
+        """
+        with self._lock:
+            payload = self._entries.get(key)
+            if payload is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return payload
+
+            # 傾印只有少數組合，持鎖建立避免同時重複編碼與壓縮
+            self.misses += 1
+            payload = builder()
+            self._entries[key] = payload
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            logger.info(
+                f"已編碼天賦樹傾印: {len(payload.body)} bytes"
+                f"（gzip {len(payload.gzip_body) if payload.gzip_body else '-'} bytes）"
+            )
+            return payload
+
+    def stats(self) -> dict:
+        """快取統計"""
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "misses": self.misses,
+                "bytes": sum(
+                    len(payload.body) + len(payload.gzip_body or b"")
+                    for payload in self._entries.values()
+                )
+            }
+
+
+# 全域快取實例
+tree_payload_cache = TreePayloadCache()
@@ -0,0 +1,254 @@
+"""
+天賦樹鄰接索引
+將天賦樹快照轉為以連續整數索引表示的無向 CSR 鄰接結構，
+每個天賦樹版本只建立一次，供所有路徑搜尋共用
+"""
+import threading
+from array import array
+from typing import Any, Collection, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.passive_tree_snapshot import (
+    FLAG_CLASS_START,
+    PassiveTreeSnapshot,
+    compile_tree_data,
+    decode_tree_snapshot
+)
+
+logger = logging.getLogger(__name__)
+
+
+def _readonly(values: array) -> memoryview:
+    """轉為唯讀的整數視圖（切片不複製資料）"""
+    return memoryview(values.tobytes()).cast(values.typecode)
+
+
+class DistanceField:
+    """
+    多起點 BFS 的結果（距離與父節點指標）
+
+    一次走訪即可回答任意數量目標的成本與路徑。
+    """
+
+    def __init__(self, index: "PassiveTreeIndex", distances: array, parents: array, roots: array):
+        self.index = index
+        self.distances = distances  # array('i')，-1 表示未到達
+        self.parents = parents      # array('i')，起點與未到達為 -1
+        self.roots = roots          # array('i')，路徑所屬的起點索引，未到達為 -1
+
+    def cost(self, node_id: int) -> Optional[int]:
+        """到達節點所需的新增點數（起點為 0，無法到達為 None）"""
+        position = self.index.index_of.get(node_id)
+        if position is None:
+            return None
+        distance = self.distances[position]
+        return distance if distance >= 0 else None
+
+    def path(self, node_id: int) -> Optional[List[int]]:
+        """
+        由最近起點到節點的路徑
+
+        Returns:
+            含起點與目標的節點 ID 路徑；無法到達時為 None
+        """
+        position = self.index.index_of.get(node_id)
+        if position is None or self.distances[position] < 0:
+            return None
+
+        parents = self.parents
+        path = []
+        while position != -1:
+            path.append(position)
+            position = parents[position]
+        path.reverse()
+        return self.index.to_node_ids(path)
+
+
+class PassiveTreeIndex:
+    """
+    天賦樹無向鄰接索引（不可變）
+
+    節點以 0..N-1 的連續索引表示；第 i 個節點的鄰居為
+    neighbors[offsets[i]:offsets[i + 1]]。
+
+    建立時已套用遊戲的連線規則：
+      - data.json 的 out / in 只各記錄一半，這裡兩個方向都加入
+      - 不同昇華（或昇華與主天賦樹）之間的連線移除
+      - 職業起始節點不可作為路徑中繼（traversable 為 0）
+    """
+
+    def __init__(self, snapshot: PassiveTreeSnapshot):
+        """
+        由天賦樹快照建立索引
+
+        Args:
+            snapshot: 已解碼的天賦樹快照
+        """
+        self.version = snapshot.version
+        node_ids = snapshot.node_ids
+        count = len(node_ids)
+
+        index_of = {node_id: index for index, node_id in enumerate(node_ids)}
+        ascendancies = snapshot.ascendancies
+        out_offsets = snapshot.out_offsets
+        out_targets = snapshot.out_targets
+
+        # 兩個方向都加入，並過濾跨昇華邊界的連線
+        adjacency: List[set] = [set() for _ in range(count)]
+        for source in range(count):
+            source_ascendancy = ascendancies[source]
+            for target_id in out_targets[out_offsets[source]:out_offsets[source + 1]]:
+                target = index_of.get(target_id)
+                if target is None or target == source:
+                    continue
+                if ascendancies[target] != source_ascendancy:
+                    continue
+                adjacency[source].add(target)
+                adjacency[target].add(source)
+
+        offsets = array("I", [0])
+        neighbors = array("I")
+        for linked in adjacency:
+            neighbors.extend(sorted(linked))
+            offsets.append(len(neighbors))
+
+        self.node_ids = _readonly(array("I", node_ids))
+        self.index_of: Dict[int, int] = index_of
+        self.offsets = _readonly(offsets)
+        self.neighbors = _readonly(neighbors)
+        self.flags = bytes(snapshot.node_flags)
+        self.traversable = bytes(
+            0 if flags & FLAG_CLASS_START else 1 for flags in snapshot.node_flags
+        )
+        self.ascendancies: Tuple[str, ...] = tuple(ascendancies)
+
+        logger.info(
+            f"天賦樹鄰接索引建立完成：{count} 個節點、{len(neighbors) // 2} 條連線"
+        )
+
+    @classmethod
+    def from_tree_data(cls, tree_data: Dict[str, Any], version: str = "") -> "PassiveTreeIndex":
+        """
+        由原始 data.json 內容建立索引
+
+        Args:
+            tree_data: 已解析的 data.json
+            version: 天賦樹版本
+
+        Returns:
+            鄰接索引
+        """
+        return cls(decode_tree_snapshot(compile_tree_data(tree_data, version)))
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self.index_of
+
+    def neighbors_of(self, index: int) -> memoryview:
+        """取得節點（索引）的鄰居索引"""
+        return self.neighbors[self.offsets[index]:self.offsets[index + 1]]
+
+    def to_indices(self, node_ids: Iterable[int]) -> List[int]:
+        """將節點 ID 轉為索引（略過不在天賦樹中的節點）"""
+        index_of = self.index_of
+        return [index_of[node_id] for node_id in node_ids if node_id in index_of]
+
+    def to_node_ids(self, indices: Iterable[int]) -> List[int]:
+        """將索引轉回節點 ID"""
+        node_ids = self.node_ids
+        return [node_ids[index] for index in indices]
+
+    def distance_field(
+        self,
+        start_nodes: Iterable[int],
+        targets: Optional[Collection[int]] = None,
+        max_distance: Optional[int] = None,
+        nearest_only: bool = False
+    ) -> DistanceField:
+        """
+        由所有起點同時 BFS，建立距離場
+
+        Args:
+            start_nodes: 起點節點 ID（通常為已配置節點）
+            targets: 目標節點 ID；全部到達後提前停止（None 表示走訪整棵樹）
+            max_distance: 最大搜尋距離
+            nearest_only: 到達任一目標的那一層走完後即停止（同距離的目標都會一起到達）
+
+        Returns:
+            距離場
+        """
+        count = len(self.node_ids)
+        distances = array("i", [-1]) * count
+        parents = array("i", [-1]) * count
+        roots = array("i", [-1]) * count
+
+        frontier = []
+        for start in self.to_indices(start_nodes):
+            if distances[start] < 0:
+                distances[start] = 0
+                roots[start] = start
+                frontier.append(start)
+
+        remaining = None
+        if targets is not None:
+            remaining = {
+                self.index_of[node_id] for node_id in targets
+                if node_id in self.index_of and distances[self.index_of[node_id]] < 0
+            }
+
+        offsets = self.offsets
+        neighbors = self.neighbors
+        traversable = self.traversable
+        distance = 0
+        target_count = len(remaining) if remaining is not None else 0
+
+        # 逐層擴展：非起點的職業起始節點可到達但不再往外延伸
+        while frontier and (remaining is None or remaining):
+            if max_distance is not None and distance >= max_distance:
+                break
+            if nearest_only and remaining is not None and len(remaining) < target_count:
+                break
+            distance += 1
+            next_frontier = []
+            for current in frontier:
+                if distance > 1 and not traversable[current]:
+                    continue
+                for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                    if distances[neighbor] < 0:
+                        distances[neighbor] = distance
+                        parents[neighbor] = current
+                        roots[neighbor] = roots[current]
+                        next_frontier.append(neighbor)
+                        if remaining is not None:
+                            remaining.discard(neighbor)
+            frontier = next_frontier
+
+        return DistanceField(self, distances, parents, roots)
+
+
+# ===== 依天賦樹版本共用 =====
+
+_INDEX_CACHE: Dict[Tuple[str, bytes, int], PassiveTreeIndex] = {}
+_INDEX_LOCK = threading.Lock()
+
+
+def get_tree_index(snapshot: PassiveTreeSnapshot) -> PassiveTreeIndex:
+    """
+    取得天賦樹快照對應的鄰接索引（同一版本只建立一次）
+
+    Args:
+        snapshot: 已解碼的天賦樹快照
+
+    Returns:
+        鄰接索引
+    """
+    key = (snapshot.version, snapshot.source_digest, len(snapshot))
+    index = _INDEX_CACHE.get(key)
+    if index is None:
+        with _INDEX_LOCK:
+            index = _INDEX_CACHE.get(key)
+            if index is None:
+                index = _INDEX_CACHE[key] = PassiveTreeIndex(snapshot)
+    return index
@@ -0,0 +1,234 @@
+"""
+天賦樹共用節點表
+每個天賦樹版本一份不可變的欄式節點表（直接引用快照欄位與字串池，不複製），
+整合鄰接索引與分類索引，供服務層與分析器共用；
+節點資訊字典只在 API 回應時依需要產生
+"""
+import threading
+from typing import Any, Callable, Dict, Iterable, List, Optional, Tuple
+import logging
+
+from app.passive_tree_classes import NodeClassIndex, node_class_index_for
+from app.passive_tree_index import PassiveTreeIndex, get_tree_index
+from app.passive_tree_snapshot import (
+    FLAG_JEWEL_SOCKET,
+    FLAG_KEYSTONE,
+    FLAG_MASTERY,
+    FLAG_NOTABLE,
+    NODE_TYPES,
+    PassiveTreeSnapshot,
+    compile_tree_data,
+    decode_tree_snapshot
+)
+
+logger = logging.getLogger(__name__)
+
+
+# 節點資訊可投影的欄位（順序即輸出順序）
+NODE_FIELDS: Tuple[str, ...] = (
+    'id', 'name', 'stats', 'type', 'isKeystone', 'isNotable', 'isMastery',
+    'isJewelSocket', 'icon', 'flavourText', 'out', 'ascendancyName'
+)
+
+
+def resolve_fields(fields: Optional[Iterable[str]]) -> Tuple[str, ...]:
+    """
+    驗證並正規化投影欄位（一律包含 id，依 NODE_FIELDS 的順序排列）
+
+    Args:
+        fields: 要求的欄位；None 或空表示全部欄位
+
+    Returns:
+        正規化後的欄位
+
+    Raises:
+        ValueError: 未知的欄位
+    """
+    if not fields:
+        return NODE_FIELDS
+    requested = set(fields)
+    unknown = requested.difference(NODE_FIELDS)
+    if unknown:
+        raise ValueError(f"未知的節點欄位: {', '.join(sorted(unknown))}")
+    requested.add('id')
+    return tuple(field for field in NODE_FIELDS if field in requested)
+
+
+class PassiveNodeTable:
+    """
+    天賦樹節點表（不可變）
+
+    第 i 個節點的資料位於各欄的第 i 個位置（與鄰接索引、分類索引的索引相同）；
+    名稱、圖示、能力描述等字串皆引用快照字串池中的同一個物件。
+    """
+
+    def __init__(
+        self,
+        snapshot: PassiveTreeSnapshot,
+        index: Optional[PassiveTreeIndex] = None,
+        classes: Optional[NodeClassIndex] = None
+    ):
+        """
+        由天賦樹快照建立節點表
+
+        Args:
+            snapshot: 已解碼的天賦樹快照
+            index: 鄰接索引（未指定時建立新的）
+            classes: 分類索引（未指定時建立新的）
+        """
+        self.version = snapshot.version
+        self.source_digest = snapshot.source_digest
+        self.index = index if index is not None else PassiveTreeIndex(snapshot)
+        self.classes = classes if classes is not None else NodeClassIndex(snapshot)
+        self.index_of: Dict[int, int] = self.index.index_of
+
+        self.node_ids = snapshot.node_ids
+        self.node_types = snapshot.node_types
+        self.node_flags = snapshot.node_flags
+        self.names = snapshot.names
+        self.icons = snapshot.icons
+        self.ascendancies = snapshot.ascendancies
+        self.stat_offsets = snapshot.stat_offsets
+        self.stat_texts = snapshot.stats
+        self.flavour_offsets = snapshot.flavour_offsets
+        self.flavour_texts = snapshot.flavour_texts
+        self.out_offsets = snapshot.out_offsets
+        self.out_targets = snapshot.out_targets
+
+    @classmethod
+    def from_tree_data(cls, tree_data: Dict[str, Any], version: str = "") -> "PassiveNodeTable":
+        """由原始 data.json 內容建立節點表（不進入共用快取）"""
+        return cls(decode_tree_snapshot(compile_tree_data(tree_data, version)))
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+    def __contains__(self, node_id: int) -> bool:
+        return node_id in self.index_of
+
+    def position(self, node_id: int) -> Optional[int]:
+        """節點在表中的位置（不在天賦樹中為 None）"""
+        return self.index_of.get(node_id)
+
+    def stats_at(self, position: int) -> List[str]:
+        """第 position 個節點的能力描述"""
+        return self.stat_texts[self.stat_offsets[position]:self.stat_offsets[position + 1]]
+
+    def stat_count_at(self, position: int) -> int:
+        """第 position 個節點的能力描述數量"""
+        return self.stat_offsets[position + 1] - self.stat_offsets[position]
+
+    def type_at(self, position: int) -> str:
+        """第 position 個節點的類型（normal / keystone / notable / mastery / jewel_socket）"""
+        return NODE_TYPES[self.node_types[position]]
+
+    def name(self, node_id: int) -> Optional[str]:
+        """節點名稱（不在天賦樹中為 None）"""
+        position = self.index_of.get(node_id)
+        return None if position is None else self.names[position]
+
+    def stats(self, node_id: int) -> List[str]:
+        """節點的能力描述（不在天賦樹中為空列表）"""
+        position = self.index_of.get(node_id)
+        return [] if position is None else self.stats_at(position)
+
+    def node_info(self, node_id: int) -> Optional[Dict[str, Any]]:
+        """
+        產生節點資訊字典（API 回應格式）
+
+        Args:
+            node_id: 節點 ID
+
+        Returns:
+            節點資訊；不在天賦樹中為 None
+        """
+        position = self.index_of.get(node_id)
+        if position is None:
+            return None
+
+        flags = self.node_flags[position]
+        out_offsets = self.out_offsets
+        flavour_offsets = self.flavour_offsets
+        return {
+            'id': node_id,
+            'name': self.names[position],
+            'stats': self.stats_at(position),
+            'type': NODE_TYPES[self.node_types[position]],
+            'isKeystone': bool(flags & FLAG_KEYSTONE),
+            'isNotable': bool(flags & FLAG_NOTABLE),
+            'isMastery': bool(flags & FLAG_MASTERY),
+            'isJewelSocket': bool(flags & FLAG_JEWEL_SOCKET),
+            'icon': self.icons[position],
+            'flavourText': self.flavour_texts[flavour_offsets[position]:flavour_offsets[position + 1]],
+            'out': self.out_targets[out_offsets[position]:out_offsets[position + 1]].tolist(),
+            'ascendancyName': self.ascendancies[position] or None
+        }
+
+    def project(self, node_id: int, fields: Tuple[str, ...]) -> Optional[Dict[str, Any]]:
+        """
+        只產生指定欄位的節點資訊字典
+
+        Args:
+            node_id: 節點 ID
+            fields: resolve_fields 正規化後的欄位
+
+        Returns:
+            節點資訊；不在天賦樹中為 None
+        """
+        position = self.index_of.get(node_id)
+        if position is None:
+            return None
+        if fields == NODE_FIELDS:
+            return self.node_info(node_id)
+        return {field: _FIELD_GETTERS[field](self, position) for field in fields}
+
+
+# 欄位 -> 取值函式（以節點表位置取值，只計算被投影的欄位）
+_FIELD_GETTERS: Dict[str, Callable[[PassiveNodeTable, int], Any]] = {
+    'id': lambda table, position: table.node_ids[position],
+    'name': lambda table, position: table.names[position],
+    'stats': lambda table, position: table.stats_at(position),
+    'type': lambda table, position: table.type_at(position),
+    'isKeystone': lambda table, position: bool(table.node_flags[position] & FLAG_KEYSTONE),
+    'isNotable': lambda table, position: bool(table.node_flags[position] & FLAG_NOTABLE),
+    'isMastery': lambda table, position: bool(table.node_flags[position] & FLAG_MASTERY),
+    'isJewelSocket': lambda table, position: bool(table.node_flags[position] & FLAG_JEWEL_SOCKET),
+    'icon': lambda table, position: table.icons[position],
+    'flavourText': lambda table, position: table.flavour_texts[
+        table.flavour_offsets[position]:table.flavour_offsets[position + 1]
+    ],
+    'out': lambda table, position: table.out_targets[
+        table.out_offsets[position]:table.out_offsets[position + 1]
+    ].tolist(),
+    'ascendancyName': lambda table, position: table.ascendancies[position] or None,
+}
+
+
+# ===== 依天賦樹版本共用 =====
+
+_TABLE_CACHE: Dict[str, PassiveNodeTable] = {}
+_TABLE_LOCK = threading.Lock()
+
+
+def node_table_for(snapshot: PassiveTreeSnapshot) -> PassiveNodeTable:
+    """
+    取得天賦樹快照對應的節點表（同一版本只建立一次，並共用鄰接與分類索引）
+
+    Args:
+        snapshot: 已解碼的天賦樹快照
+
+    Returns:
+        節點表
+    """
+    table = _TABLE_CACHE.get(snapshot.version)
+    if table is None or table.source_digest != snapshot.source_digest:
+        with _TABLE_LOCK:
+            table = _TABLE_CACHE.get(snapshot.version)
+            if table is None or table.source_digest != snapshot.source_digest:
+                table = _TABLE_CACHE[snapshot.version] = PassiveNodeTable(
+                    snapshot,
+                    index=get_tree_index(snapshot),
+                    classes=node_class_index_for(snapshot)
+                )
+    return table
+
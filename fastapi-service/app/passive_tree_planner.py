@@ -0,0 +1,420 @@
+"""
+天賦樹配置規劃
+一次規劃到達多個目標節點的連通配置（近似最小 Steiner 樹），
+共用的過路節點只計算一次；以及在點數預算內挑選價值最高的連通配置
+"""
+import heapq
+from typing import Dict, Iterable, List, Mapping, NamedTuple, Optional, Set, Tuple
+import logging
+
+from app.passive_tree_field_cache import get_field_cache
+from app.passive_tree_index import PassiveTreeIndex
+
+logger = logging.getLogger(__name__)
+
+
+class AllocationPlan(NamedTuple):
+    """配置規劃結果"""
+    order: List[int]            # 新增節點 ID（依可配置順序，每個節點都與先前節點相連）
+    targets: List[int]          # 依到達順序排列的目標節點 ID
+    unreachable: List[int]      # 無法到達（或不在天賦樹中）的目標節點 ID
+    total_cost: int             # 新增點數
+    independent_cost: int       # 逐一計算各目標成本的總和（共用節點重複計算）
+
+    @property
+    def found(self) -> bool:
+        """是否找到配置：至少到達一個目標，或沒有無法到達的目標（目標皆已配置）"""
+        return bool(self.targets) or not self.unreachable
+
+
+class BudgetPlan(NamedTuple):
+    """預算內配置最佳化結果"""
+    order: List[int]            # 選取的節點 ID（依可配置順序）
+    value: float                # 選取節點的價值總和
+    total_cost: int             # 使用點數
+    budget: int                 # 可用點數
+    skipped: List[int]          # 可連通但因預算未選取的候選節點 ID
+    unreachable: List[int]      # 無法只經由候選節點連回已配置節點的候選節點 ID
+
+
+def plan_steiner_allocation(
+    index: PassiveTreeIndex,
+    allocated_nodes: Iterable[int],
+    target_nodes: Iterable[int]
+) -> AllocationPlan:
+    """
+    規劃由已配置節點到達所有目標的近似最小連通配置
+
+    以最短路徑合併法（Takahashi-Matsuyama）逐步擴張：
+    每輪由目前的整棵配置同時 BFS，接上最近的目標（同距離時選擇沿途順帶經過
+    最多其他目標的路徑），直到所有可到達目標都已連通；
+    接著逐一拆下只為單一目標服務的分支，若重新接回更短則替換；
+    最後在配置的生成樹上反覆移除非目標的葉節點。
+
+    Args:
+        index: 天賦樹鄰接索引
+        allocated_nodes: 已配置節點 ID
+        target_nodes: 目標節點 ID
+
+    Returns:
+        配置規劃結果
+    """
+    allocated = {node_id for node_id in allocated_nodes if node_id in index}
+    targets = list(dict.fromkeys(target_nodes))
+
+    # 一次距離場即可分出無法到達的目標與逐一計算的成本（依配置快取）
+    field = get_field_cache(index).get(allocated)
+    unreachable = []
+    remaining: Set[int] = set()
+    independent_cost = 0
+    for target in targets:
+        cost = field.cost(target)
+        if cost is None:
+            unreachable.append(target)
+        elif cost > 0:
+            remaining.add(target)
+            independent_cost += cost
+
+    target_set = set(remaining)
+    tree = set(allocated)
+    added: Dict[int, int] = {}  # 新增節點 ID -> 加入順序
+
+    # 每輪的 BFS 起點：新增的職業起始節點（其他職業的起點作為目標時）只能是葉節點，
+    # 與 _spanning_tree 相同不可再往外延伸，因此不作為起點
+    index_of = index.index_of
+    traversable = index.traversable
+    sources = set(allocated)
+
+    while remaining:
+        field = index.distance_field(sources, targets=remaining, nearest_only=True)
+        best_path = None
+        best_key = None
+        for target in remaining:
+            cost = field.cost(target)
+            if cost is None:
+                continue
+            path = field.path(target)
+            key = (cost, -sum(1 for node_id in path if node_id in remaining), target)
+            if best_key is None or key < best_key:
+                best_key, best_path = key, path
+
+        if best_path is None:
+            # 已配置節點不連通時，剩餘目標可能無法由目前配置到達
+            unreachable.extend(sorted(remaining))
+            break
+
+        for node_id in best_path:
+            if node_id not in tree:
+                tree.add(node_id)
+                added[node_id] = len(added)
+                if traversable[index_of[node_id]]:
+                    sources.add(node_id)
+            remaining.discard(node_id)
+
+    _refine_branches(index, allocated, added, target_set)
+    order = _prune_and_order(index, allocated, added, target_set)
+    reached = [node_id for node_id in order if node_id in target_set]
+
+    # 每個待配置目標都必須已到達或列為無法到達；修剪若遺漏目標則歸入無法到達，
+    # 避免回應靜默少掉目標
+    reached_set = set(reached)
+    unreachable_set = set(unreachable)
+    missed = [
+        target for target in targets
+        if target in target_set and target not in reached_set and target not in unreachable_set
+    ]
+    if missed:
+        logger.warning(f"配置規劃遺漏 {len(missed)} 個目標，改列為無法到達: {missed}")
+        unreachable.extend(missed)
+
+    return AllocationPlan(
+        order=order,
+        targets=reached,
+        unreachable=unreachable,
+        total_cost=len(order),
+        independent_cost=independent_cost
+    )
+
+
+def _spanning_tree(
+    index: PassiveTreeIndex,
+    allocated: Set[int],
+    members: Set[int],
+    values: Optional[Mapping[int, float]] = None
+) -> Tuple[Dict[int, int], Dict[int, List[int]]]:
+    """
+    由已配置節點 BFS 建立配置的生成樹（索引表示，只走 members 內的節點）
+
+    與距離場相同，職業起始節點只有作為起點時才能延伸。
+    提供 values（索引 -> 價值）時，同距離的多個父節點中選擇
+    沿途價值總和最高者。
+
+    Returns:
+        (父節點, 子節點列表)；根節點（已配置節點）沒有父節點
+    """
+    offsets = index.offsets
+    neighbors = index.neighbors
+    traversable = index.traversable
+
+    parents: Dict[int, int] = {}
+    frontier = index.to_indices(allocated)
+    gains = {position: 0.0 for position in frontier}
+    while frontier:
+        next_frontier: List[int] = []
+        discovered = set()
+        for current in frontier:
+            if current in parents and not traversable[current]:
+                continue
+            for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                if neighbor not in members:
+                    continue
+                gain = gains[current] + (values.get(neighbor, 0) if values else 0)
+                if neighbor not in gains:
+                    next_frontier.append(neighbor)
+                    discovered.add(neighbor)
+                elif neighbor not in discovered or gain <= gains[neighbor]:
+                    continue
+                parents[neighbor] = current
+                gains[neighbor] = gain
+        frontier = next_frontier
+
+    children: Dict[int, List[int]] = {}
+    for position, parent in parents.items():
+        children.setdefault(parent, []).append(position)
+    return parents, children
+
+
+def _refine_branches(
+    index: PassiveTreeIndex,
+    allocated: Set[int],
+    added: Dict[int, int],
+    targets: Set[int],
+    max_rounds: int = 3
+):
+    """
+    分支交換：拆下只通往單一目標的分支，改由其餘配置重新接回（較短時才替換）
+
+    直接修改 added；每輪依加入順序處理所有葉目標，沒有改善時停止。
+    """
+    index_of = index.index_of
+    node_ids = index.node_ids
+    traversable = index.traversable
+    next_rank = len(added)
+
+    for _ in range(max_rounds):
+        improved = False
+        spanning = None
+        for target in sorted(targets & added.keys(), key=added.get):
+            # 生成樹只在分支替換後重建
+            if spanning is None:
+                members = {index_of[node_id] for node_id in allocated}
+                members.update(index_of[node_id] for node_id in added)
+                spanning = _spanning_tree(index, allocated, members)
+            parents, children = spanning
+
+            position = index_of[target]
+            if children.get(position) or position not in parents:
+                continue
+
+            # 往上收集只為此目標存在的節點
+            branch = [target]
+            parent = parents[position]
+            while (
+                parent in parents
+                and len(children[parent]) == 1
+                and node_ids[parent] not in targets
+            ):
+                branch.append(node_ids[parent])
+                parent = parents[parent]
+
+            # 由目標反向 BFS（只搜尋比原分支短的範圍），碰到其餘配置即停止；
+            # 新增的職業起始節點不能作為中繼，不可作為接回點
+            rest = {
+                node_id for node_id in (allocated | set(added)).difference(branch)
+                if node_id in allocated or traversable[index_of[node_id]]
+            }
+            field = index.distance_field(
+                (target,),
+                targets=rest,
+                max_distance=len(branch) - 1,
+                nearest_only=True
+            )
+            anchor = min(
+                (node_id for node_id in rest if field.cost(node_id) is not None),
+                key=field.cost,
+                default=None
+            )
+            if anchor is None:
+                continue
+            path = field.path(anchor)[::-1]
+
+            for node_id in branch:
+                del added[node_id]
+            for node_id in path[1:]:
+                if node_id not in added:
+                    added[node_id] = next_rank
+                    next_rank += 1
+            spanning = None
+            improved = True
+
+        if not improved:
+            break
+
+
+def _prune_and_order(
+    index: PassiveTreeIndex,
+    allocated: Set[int],
+    added: Dict[int, int],
+    targets: Set[int]
+) -> List[int]:
+    """
+    在配置的生成樹上移除多餘節點，並排出可配置順序
+
+    生成樹由已配置節點開始 BFS，只走已配置與新增節點；
+    非目標的新增節點若成為葉節點即移除。
+    配置順序依加入順序優先展開，每個節點的父節點都排在它之前。
+    """
+    if not added:
+        return []
+
+    index_of = index.index_of
+    node_ids = index.node_ids
+    members = {index_of[node_id] for node_id in allocated} | {index_of[node_id] for node_id in added}
+    parents, children = _spanning_tree(index, allocated, members)
+
+    # 反覆移除非目標的新增葉節點
+    kept = set(parents)
+    leaves = [
+        position for position in kept
+        if not children.get(position) and node_ids[position] not in targets
+    ]
+    while leaves:
+        position = leaves.pop()
+        kept.discard(position)
+        parent = parents[position]
+        siblings = children[parent]
+        siblings.remove(position)
+        if parent in kept and not siblings and node_ids[parent] not in targets:
+            leaves.append(parent)
+
+    pruned = len(added) - len(kept)
+    if pruned:
+        logger.debug(f"配置規劃移除 {pruned} 個多餘節點")
+
+    # 依加入順序展開
+    heap = [
+        (added[node_ids[child]], child)
+        for root in allocated
+        for child in children.get(index_of[root], ())
+        if child in kept
+    ]
+    heapq.heapify(heap)
+    order = []
+    while heap:
+        _, position = heapq.heappop(heap)
+        order.append(node_ids[position])
+        for child in children.get(position, ()):
+            if child in kept:
+                heapq.heappush(heap, (added[node_ids[child]], child))
+    return order
+
+
+def plan_budget_allocation(
+    index: PassiveTreeIndex,
+    allocated_nodes: Iterable[int],
+    candidate_nodes: Iterable[int],
+    node_values: Mapping[int, float],
+    budget: int
+) -> BudgetPlan:
+    """
+    在點數預算內，從候選節點中挑選價值總和最高且與已配置節點連通的子集
+
+    候選節點（通常為目標流派有、玩家缺少的節點）與已配置節點構成的子圖，
+    先由已配置節點 BFS 取生成樹，再以樹狀背包動態規劃求解：
+    依前序排列後，每個節點只有「選取（花 1 點，可繼續選子孫）」或
+    「略過整棵子樹」兩種選擇，複雜度 O(候選數 × 預算)。
+    子圖有環時結果取決於生成樹（最短連線，同距離時偏好沿途價值高的路線），為近似解。
+
+    Args:
+        index: 天賦樹鄰接索引
+        allocated_nodes: 已配置節點 ID
+        candidate_nodes: 可選取的節點 ID
+        node_values: 節點 ID -> 價值（未列出的節點價值為 0）
+        budget: 可用點數
+
+    Returns:
+        最佳化結果
+    """
+    allocated = {node_id for node_id in allocated_nodes if node_id in index}
+    candidates = [
+        node_id for node_id in dict.fromkeys(candidate_nodes)
+        if node_id not in allocated
+    ]
+    budget = max(0, budget)
+
+    index_of = index.index_of
+    node_ids = index.node_ids
+    members = {index_of[node_id] for node_id in allocated}
+    members.update(index_of[node_id] for node_id in candidates if node_id in index_of)
+    position_values = {
+        index_of[node_id]: value for node_id, value in node_values.items() if node_id in index_of
+    }
+    parents, children = _spanning_tree(index, allocated, members, position_values)
+
+    # 生成樹前序排列（虛擬根節點為所有已配置節點）
+    preorder: List[int] = []
+    stack = [
+        child
+        for root in index.to_indices(allocated)
+        for child in children.get(root, ())
+    ][::-1]
+    while stack:
+        position = stack.pop()
+        preorder.append(position)
+        stack.extend(reversed(children.get(position, ())))
+
+    count = len(preorder)
+    subtree_end = [0] * count
+    slot_of = {position: slot for slot, position in enumerate(preorder)}
+    for slot in range(count - 1, -1, -1):
+        end = slot + 1
+        for child in children.get(preorder[slot], ()):
+            end = max(end, subtree_end[slot_of[child]])
+        subtree_end[slot] = end
+    values = [float(node_values.get(node_ids[position], 0)) for position in preorder]
+
+    # best[slot][b]：由前序位置 slot 起、最多花 b 點可得的最高價值
+    capacity = min(budget, count)
+    best = [[0.0] * (capacity + 1) for _ in range(count + 1)]
+    for slot in range(count - 1, -1, -1):
+        skip_row = best[subtree_end[slot]]
+        take_row = best[slot + 1]
+        row = best[slot]
+        value = values[slot]
+        row[0] = skip_row[0]
+        for points in range(1, capacity + 1):
+            take = value + take_row[points - 1]
+            skip = skip_row[points]
+            row[points] = take if take > skip else skip
+
+    # 回溯（價值相同時略過，以節省點數）
+    selected: List[int] = []
+    slot, points = 0, capacity
+    while slot < count:
+        if points > 0 and values[slot] + best[slot + 1][points - 1] > best[subtree_end[slot]][points]:
+            selected.append(node_ids[preorder[slot]])
+            slot += 1
+            points -= 1
+        else:
+            slot = subtree_end[slot]
+
+    chosen = set(selected)
+    reached = {node_ids[position] for position in preorder}
+    return BudgetPlan(
+        order=selected,
+        value=sum(node_values.get(node_id, 0) for node_id in selected),
+        total_cost=len(selected),
+        budget=budget,
+        skipped=[node_id for node_id in candidates if node_id in reached and node_id not in chosen],
+        unreachable=[node_id for node_id in candidates if node_id not in reached]
+    )
@@ -0,0 +1,291 @@
+"""
+天賦樹加權路徑搜尋
+以節點價值調整通行成本（高價值節點較便宜、無效果的過路節點最貴），
+並以地標距離（ALT）作為 A* 啟發函數，每次查詢只需展開天賦樹的一小部分
+"""
+import heapq
+import math
+import threading
+from array import array
+from typing import Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+import logging
+
+from app.passive_tree_index import PassiveTreeIndex
+from app.passive_tree_snapshot import FLAG_CLASS_START
+
+logger = logging.getLogger(__name__)
+
+
+# 地標數量（職業起始節點優先，其餘以最遠點選取）
+DEFAULT_LANDMARK_COUNT = 16
+
+# 節點價值達到此值時通行成本減半
+VALUE_SCALE = 50.0
+
+_INF = math.inf
+
+
+class WeightedPath(NamedTuple):
+    """加權路徑搜尋結果"""
+    path: List[int]         # 含起點與目標的節點 ID
+    weighted_cost: float    # 加權成本
+    value: float            # 路徑上新增節點的價值總和
+    explored: int           # 展開的節點數
+
+
+def node_costs_from_values(values: Sequence[float]) -> array:
+    """
+    由節點價值計算通行成本
+
+    成本 = 1 / (1 + 價值 / VALUE_SCALE)：價值 0 的過路節點為 1，
+    顯著天賦約 0.5，基石約 0.33。
+
+    Args:
+        values: 依索引排列的節點價值
+
+    Returns:
+        array('d') 通行成本
+    """
+    return array("d", (1.0 / (1.0 + max(value, 0.0) / VALUE_SCALE) for value in values))
+
+
+class WeightedRouter:
+    """
+    加權 A* 路徑搜尋器（ALT 啟發函數）
+
+    邊 (u, v) 的成本為兩端節點成本的平均，使距離對稱，
+    地標距離的三角不等式因此成立，啟發函數可採納且一致。
+    地標距離在不限制職業起始節點的圖上計算，只會更小，仍為下界。
+    """
+
+    def __init__(
+        self,
+        index: PassiveTreeIndex,
+        node_costs: array,
+        node_values: Sequence[float],
+        landmark_count: int = DEFAULT_LANDMARK_COUNT
+    ):
+        """
+        初始化並預先計算地標距離
+
+        Args:
+            index: 天賦樹鄰接索引
+            node_costs: 依索引排列的通行成本
+            node_values: 依索引排列的節點價值
+            landmark_count: 地標數量
+        """
+        self.index = index
+        self.node_costs = node_costs
+        self.node_values = node_values
+        self.landmarks: List[int] = []
+        self.landmark_distances: List[array] = []
+        self._select_landmarks(landmark_count)
+
+        logger.info(
+            f"加權路徑地標建立完成：{len(self.landmarks)} 個地標（天賦樹 {index.version}）"
+        )
+
+    # ===== 地標 =====
+
+    def _dijkstra(self, sources: Iterable[int]) -> array:
+        """由來源索引計算到所有節點的加權距離（不限制職業起始節點）"""
+        offsets = self.index.offsets
+        neighbors = self.index.neighbors
+        costs = self.node_costs
+
+        distances = array("d", [_INF]) * len(costs)
+        heap = []
+        for source in sources:
+            distances[source] = 0.0
+            heap.append((0.0, source))
+        heapq.heapify(heap)
+
+        while heap:
+            distance, current = heapq.heappop(heap)
+            if distance > distances[current]:
+                continue
+            half_cost = costs[current] * 0.5
+            for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                candidate = distance + half_cost + costs[neighbor] * 0.5
+                if candidate < distances[neighbor]:
+                    distances[neighbor] = candidate
+                    heapq.heappush(heap, (candidate, neighbor))
+
+        return distances
+
+    def _select_landmarks(self, landmark_count: int):
+        """選取地標：職業起始節點，再以最遠點補足"""
+        count = len(self.index)
+        if count == 0 or landmark_count <= 0:
+            return
+
+        candidates = [
+            position for position, flags in enumerate(self.index.flags)
+            if flags & FLAG_CLASS_START
+        ][:landmark_count]
+        if not candidates:
+            # 沒有職業起始節點時以連線最多的節點作為第一個地標
+            offsets = self.index.offsets
+            candidates = [max(range(count), key=lambda i: offsets[i + 1] - offsets[i])]
+
+        nearest = array("d", [_INF]) * count
+        for landmark in candidates:
+            self._add_landmark(landmark, nearest)
+
+        while len(self.landmarks) < landmark_count:
+            # 已到達節點中距離現有地標最遠者
+            farthest, farthest_distance = -1, 0.0
+            for position, distance in enumerate(nearest):
+                if distance != _INF and distance > farthest_distance:
+                    farthest, farthest_distance = position, distance
+            if farthest < 0:
+                break
+            self._add_landmark(farthest, nearest)
+
+    def _add_landmark(self, landmark: int, nearest: array):
+        """加入地標並更新各節點到最近地標的距離"""
+        distances = self._dijkstra((landmark,))
+        self.landmarks.append(landmark)
+        self.landmark_distances.append(distances)
+        for position, distance in enumerate(distances):
+            if distance < nearest[position]:
+                nearest[position] = distance
+
+    def _heuristic_table(self, target: int) -> List[Tuple[array, float]]:
+        """目標可由哪些地標估計（地標與目標須連通）"""
+        return [
+            (distances, distances[target])
+            for distances in self.landmark_distances
+            if distances[target] != _INF
+        ]
+
+    # ===== 搜尋 =====
+
+    def find_path(self, start_nodes: Iterable[int], target_node: int) -> Optional[WeightedPath]:
+        """
+        由任一起點到目標的最低加權成本路徑
+
+        Args:
+            start_nodes: 起點節點 ID（通常為已配置節點）
+            target_node: 目標節點 ID
+
+        Returns:
+            搜尋結果；無法到達時為 None
+        """
+        index = self.index
+        target = index.index_of.get(target_node)
+        if target is None:
+            return None
+
+        offsets = index.offsets
+        neighbors = index.neighbors
+        traversable = index.traversable
+        costs = self.node_costs
+        table = self._heuristic_table(target)
+
+        def heuristic(position: int) -> float:
+            estimate = 0.0
+            for distances, target_distance in table:
+                distance = distances[position]
+                if distance != _INF:
+                    gap = target_distance - distance
+                    if gap < 0:
+                        gap = -gap
+                    if gap > estimate:
+                        estimate = gap
+            return estimate
+
+        best: Dict[int, float] = {}
+        parents: Dict[int, int] = {}
+        sources = set(index.to_indices(start_nodes))
+        heap = []
+        for source in sources:
+            best[source] = 0.0
+            parents[source] = -1
+            heap.append((heuristic(source), 0.0, source))
+        heapq.heapify(heap)
+
+        closed = set()
+        while heap:
+            _, distance, current = heapq.heappop(heap)
+            if current in closed:
+                continue
+            closed.add(current)
+
+            if current == target:
+                return self._build_result(current, parents, sources, distance, len(closed))
+
+            # 非起點的職業起始節點不可作為中繼
+            if current not in sources and not traversable[current]:
+                continue
+
+            half_cost = costs[current] * 0.5
+            for neighbor in neighbors[offsets[current]:offsets[current + 1]]:
+                if neighbor in closed:
+                    continue
+                candidate = distance + half_cost + costs[neighbor] * 0.5
+                if candidate < best.get(neighbor, _INF):
+                    best[neighbor] = candidate
+                    parents[neighbor] = current
+                    heapq.heappush(heap, (candidate + heuristic(neighbor), candidate, neighbor))
+
+        return None
+
+    def _build_result(
+        self,
+        target: int,
+        parents: Dict[int, int],
+        sources: set,
+        distance: float,
+        explored: int
+    ) -> WeightedPath:
+        """由父節點指標重建路徑"""
+        path = []
+        position = target
+        while position != -1:
+            path.append(position)
+            position = parents[position]
+        path.reverse()
+
+        value = sum(self.node_values[p] for p in path if p not in sources)
+        return WeightedPath(
+            path=self.index.to_node_ids(path),
+            weighted_cost=distance,
+            value=value,
+            explored=explored
+        )
+
+
+# ===== 依天賦樹版本共用 =====
+
+_ROUTER_CACHE: Dict[Tuple[int, str], WeightedRouter] = {}
+_ROUTER_LOCK = threading.Lock()
+
+
+def get_weighted_router(
+    index: PassiveTreeIndex,
+    value_factory: Callable[[], Sequence[float]],
+    profile: str = "default"
+) -> WeightedRouter:
+    """
+    取得鄰接索引對應的加權路徑搜尋器（同一索引與價值設定只計算一次地標）
+
+    Args:
+        index: 天賦樹鄰接索引
+        value_factory: 產生依索引排列之節點價值的函式（只在首次建立時呼叫，
+            快取命中時不需任何逐節點計算）
+        profile: 價值設定名稱
+
+    Returns:
+        加權路徑搜尋器
+    """
+    key = (id(index), profile)
+    router = _ROUTER_CACHE.get(key)
+    if router is None or router.index is not index:
+        with _ROUTER_LOCK:
+            router = _ROUTER_CACHE.get(key)
+            if router is None or router.index is not index:
+                node_values = value_factory()
+                router = WeightedRouter(index, node_costs_from_values(node_values), node_values)
+                _ROUTER_CACHE[key] = router
+    return router
@@ -0,0 +1,312 @@
+"""
+天賦節點搜尋索引
+以節點名稱與能力描述建立詞彙倒排索引與三字元組（trigram）索引，
+每個天賦樹版本建立一次，支援前綴比對、拼字容錯、類型篩選與排序
+"""
+import re
+import threading
+from array import array
+from bisect import bisect_left
+from typing import Dict, Iterable, List, NamedTuple, Optional, Set, Tuple
+import logging
+
+from app.passive_tree_classes import (
+    CLASS_KEYSTONE,
+    CLASS_NOTABLE,
+    CLASS_START,
+    NODE_CLASSES
+)
+from app.passive_tree_nodes import PassiveNodeTable
+
+logger = logging.getLogger(__name__)
+
+
+# 比對來源的權重（名稱命中比能力描述重要）
+NAME_WEIGHT = 3.0
+STAT_WEIGHT = 1.0
+
+# 比對方式的係數
+EXACT_FACTOR = 1.0
+PREFIX_FACTOR = 0.7
+FUZZY_FACTORS = {1: 0.5, 2: 0.35}
+
+# 查詢完整出現在名稱中的額外分數
+PHRASE_BONUS = 2.0
+
+# 類型加權（同分時基石、顯著天賦優先）
+_CLASS_BONUS = {CLASS_KEYSTONE: 0.2, CLASS_NOTABLE: 0.1}
+
+# 前綴比對的最短長度與最多展開的詞彙數
+MIN_PREFIX_LENGTH = 2
+MAX_PREFIX_EXPANSIONS = 200
+
+# 拼字容錯的最短詞彙長度
+MIN_FUZZY_LENGTH = 4
+
+_TOKEN_PATTERN = re.compile(r"[^\W_]+")
+
+
+def tokenize(text: str) -> List[str]:
+    """將文字切為小寫詞彙（字母與數字）"""
+    return _TOKEN_PATTERN.findall(text.lower())
+
+
+def _trigrams(token: str) -> Set[str]:
+    """詞彙的三字元組（前後補空白，短詞也至少有一組）"""
+    padded = f" {token} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+def _edit_distance(a: str, b: str, limit: int) -> int:
+    """
+    計算編輯距離（超過 limit 時提前結束並返回 limit + 1）
+
+    Args:
+        a: 字串
+        b: 字串
+        limit: 距離上限
+    """
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    previous = list(range(len(b) + 1))
+    for i, char_a in enumerate(a, 1):
+        current = [i]
+        for j, char_b in enumerate(b, 1):
+            current.append(min(
+                previous[j] + 1,
+                current[j - 1] + 1,
+                previous[j - 1] + (char_a != char_b)
+            ))
+        if min(current) > limit:
+            return limit + 1
+        previous = current
+    return previous[-1]
+
+
+class SearchHit(NamedTuple):
+    """搜尋結果"""
+    node_id: int
+    score: float
+    node_class: str     # NODE_CLASSES 中的類型名稱
+    matched: List[str]  # 實際命中的詞彙
+
+
+class PassiveTreeSearchIndex:
+    """
+    天賦節點搜尋索引（不可變）
+
+    詞彙 -> 節點位置的倒排表分為名稱與能力描述兩份；
+    詞彙表排序後以二分搜尋做前綴展開，三字元組 -> 詞彙的倒排表用於拼字容錯。
+    """
+
+    def __init__(self, table: PassiveNodeTable):
+        """
+        由共用節點表建立索引
+
+        Args:
+            table: 天賦樹節點表
+        """
+        self.version = table.version
+        self.source_digest = table.source_digest
+        self.table = table
+
+        name_postings: Dict[str, array] = {}
+        stat_postings: Dict[str, array] = {}
+        names_lower: List[str] = []
+        for position in range(len(table)):
+            name = table.names[position]
+            names_lower.append(name.lower())
+            for token in dict.fromkeys(tokenize(name)):
+                name_postings.setdefault(token, array("I")).append(position)
+            stat_tokens = dict.fromkeys(
+                token for stat in table.stats_at(position) for token in tokenize(stat)
+            )
+            for token in stat_tokens:
+                stat_postings.setdefault(token, array("I")).append(position)
+
+        self.name_postings = name_postings
+        self.stat_postings = stat_postings
+        self.names_lower: Tuple[str, ...] = tuple(names_lower)
+        self.vocabulary: List[str] = sorted(name_postings.keys() | stat_postings.keys())
+
+        trigram_postings: Dict[str, array] = {}
+        for token_id, token in enumerate(self.vocabulary):
+            for trigram in _trigrams(token):
+                trigram_postings.setdefault(trigram, array("I")).append(token_id)
+        self.trigram_postings = trigram_postings
+
+        logger.info(
+            f"天賦節點搜尋索引建立完成：{len(table)} 個節點、{len(self.vocabulary)} 個詞彙"
+        )
+
+    # ===== 詞彙展開 =====
+
+    def _expand(self, term: str, prefix: bool, fuzzy: bool) -> List[Tuple[str, float]]:
+        """
+        將查詢詞展開為索引中的詞彙與比對係數
+
+        完全相同 > 前綴 > 拼字容錯；前兩者都沒有結果時才嘗試拼字容錯。
+        """
+        vocabulary = self.vocabulary
+        expansions: Dict[str, float] = {}
+
+        start = bisect_left(vocabulary, term)
+        if start < len(vocabulary) and vocabulary[start] == term:
+            expansions[term] = EXACT_FACTOR
+            start += 1
+
+        if prefix and len(term) >= MIN_PREFIX_LENGTH:
+            end = min(start + MAX_PREFIX_EXPANSIONS, len(vocabulary))
+            for position in range(start, end):
+                token = vocabulary[position]
+                if not token.startswith(term):
+                    break
+                expansions[token] = PREFIX_FACTOR
+
+        if not expansions and fuzzy and len(term) >= MIN_FUZZY_LENGTH:
+            expansions.update(self._fuzzy_matches(term))
+
+        return list(expansions.items())
+
+    def _fuzzy_matches(self, term: str) -> Dict[str, float]:
+        """以三字元組找出候選詞彙，再以編輯距離確認"""
+        limit = 1 if len(term) <= 5 else 2
+        term_trigrams = _trigrams(term)
+
+        shared: Dict[int, int] = {}
+        for trigram in term_trigrams:
+            for token_id in self.trigram_postings.get(trigram, ()):
+                shared[token_id] = shared.get(token_id, 0) + 1
+
+        # 每一次編輯最多破壞 3 個三字元組
+        required = max(1, len(term_trigrams) - 3 * limit)
+        matches = {}
+        for token_id, count in shared.items():
+            if count < required:
+                continue
+            token = self.vocabulary[token_id]
+            distance = _edit_distance(term, token, limit)
+            if 0 < distance <= limit:
+                matches[token] = FUZZY_FACTORS[distance]
+        return matches
+
+    # ===== 查詢 =====
+
+    def search(
+        self,
+        query: str,
+        node_classes: Optional[Iterable[str]] = None,
+        limit: int = 20,
+        prefix: bool = True,
+        fuzzy: bool = True
+    ) -> List[SearchHit]:
+        """
+        搜尋節點（所有查詢詞都必須命中名稱或能力描述）
+
+        Args:
+            query: 查詢文字
+            node_classes: 只保留這些類型（NODE_CLASSES 中的名稱）；None 表示不限
+            limit: 最多返回筆數
+            prefix: 是否允許前綴比對
+            fuzzy: 是否允許拼字容錯
+
+        Returns:
+            依分數排序的搜尋結果
+
+        Raises:
+            ValueError: 未知的節點類型
+        """
+        terms = list(dict.fromkeys(tokenize(query)))
+        if not terms or limit <= 0:
+            return []
+
+        allowed_codes = None
+        if node_classes is not None:
+            allowed_codes = set()
+            for node_class in node_classes:
+                if node_class not in NODE_CLASSES:
+                    raise ValueError(f"未知的節點類型: {node_class}")
+                allowed_codes.add(NODE_CLASSES.index(node_class))
+        codes = self.table.classes.codes
+
+        # 每個查詢詞取各節點的最佳命中分數，再取所有查詢詞的交集
+        scores: Optional[Dict[int, float]] = None
+        matched: Dict[int, List[str]] = {}
+        for term in sorted(terms, key=len, reverse=True):
+            term_scores: Dict[int, float] = {}
+            term_tokens: Dict[int, str] = {}
+            for token, factor in self._expand(term, prefix, fuzzy):
+                for postings, weight in (
+                    (self.name_postings, NAME_WEIGHT),
+                    (self.stat_postings, STAT_WEIGHT)
+                ):
+                    score = factor * weight
+                    for position in postings.get(token, ()):
+                        if scores is not None and position not in scores:
+                            continue
+                        if score > term_scores.get(position, 0.0):
+                            term_scores[position] = score
+                            term_tokens[position] = token
+
+            if scores is None:
+                scores = term_scores
+            else:
+                scores = {
+                    position: scores[position] + score
+                    for position, score in term_scores.items()
+                }
+            for position, token in term_tokens.items():
+                matched.setdefault(position, []).append(token)
+            if not scores:
+                return []
+
+        phrase = " ".join(terms)
+        node_ids = self.table.node_ids
+        names_lower = self.names_lower
+        hits = []
+        for position, score in scores.items():
+            code = codes[position]
+            if code == CLASS_START:
+                continue
+            if allowed_codes is not None and code not in allowed_codes:
+                continue
+            if phrase in names_lower[position]:
+                score += PHRASE_BONUS
+            score += _CLASS_BONUS.get(code, 0.0)
+            hits.append((position, score))
+
+        hits.sort(key=lambda hit: (-hit[1], len(names_lower[hit[0]]), node_ids[hit[0]]))
+        return [
+            SearchHit(
+                node_id=node_ids[position],
+                score=round(score, 3),
+                node_class=NODE_CLASSES[codes[position]],
+                matched=matched[position]
+            )
+            for position, score in hits[:limit]
+        ]
+
+
+# ===== 依天賦樹版本共用 =====
+
+_SEARCH_INDEX_CACHE: Dict[str, PassiveTreeSearchIndex] = {}
+_SEARCH_INDEX_LOCK = threading.Lock()
+
+
+def search_index_for(table: PassiveNodeTable) -> PassiveTreeSearchIndex:
+    """
+    取得節點表對應的搜尋索引（同一版本只建立一次，首次搜尋時建立）
+
+    Args:
+        table: 天賦樹節點表
+
+    Returns:
+        搜尋索引
+    """
+    index = _SEARCH_INDEX_CACHE.get(table.version)
+    if index is None or index.table is not table:
+        with _SEARCH_INDEX_LOCK:
+            index = _SEARCH_INDEX_CACHE.get(table.version)
+            if index is None or index.table is not table:
+                index = _SEARCH_INDEX_CACHE[table.version] = PassiveTreeSearchIndex(table)
+    return index
@@ -1,84 +1,98 @@
+import hashlib
+import os
+import threading
 import requests
-from functools import lru_cache
-from typing import Dict, List, Optional
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
 import logging
-from collections import deque
+
+from app.passive_tree_analyzer import PATH_VALUE_PROFILE, PassiveNode, path_values
+from app.passive_tree_field_cache import get_field_cache
+from app.passive_tree_bitset import allocation_space_for, rank_by_similarity
+from app.passive_tree_index import PassiveTreeIndex
+from app.passive_tree_nodes import NODE_FIELDS, PassiveNodeTable, node_table_for
+from app.passive_tree_planner import plan_budget_allocation, plan_steiner_allocation
+from app.passive_tree_routing import WeightedRouter, get_weighted_router
+from app.passive_tree_search import search_index_for
+from app.passive_tree_snapshot import (
+    DEFAULT_TREE_VERSION,
+    TREE_DATA_DIR,
+    PassiveTreeSnapshot,
+    compile_tree_data,
+    compile_tree_file,
+    decode_tree_snapshot,
+    raw_data_path,
+    read_tree_snapshot,
+    snapshot_path,
+    write_tree_snapshot
+)
 
 logger = logging.getLogger(__name__)
 
+# POE 官方天賦樹匯出（固定於與版本相符的標籤，下載內容可重現）
+TREE_DATA_URL_TEMPLATE = "https://raw.githubusercontent.com/grindinggear/skilltree-export/{ref}/data.json"
+
+# 匯出的標籤或 commit；未設定時由版本推導（3_25 -> 3.25.0）
+TREE_EXPORT_REF = os.getenv("PASSIVE_TREE_EXPORT_REF", "")
+
+# 本機沒有快照與原始資料時是否允許連線下載（預設關閉，快照應於部署時建立）
+ALLOW_TREE_DOWNLOAD = os.getenv("PASSIVE_TREE_ALLOW_DOWNLOAD", "0") in ("1", "true", "yes")
+
+
+def tree_data_url(version: str) -> str:
+    """取得指定版本的官方匯出網址（固定標籤，不使用 master）"""
+    ref = TREE_EXPORT_REF or f"{version.replace('_', '.')}.0"
+    return TREE_DATA_URL_TEMPLATE.format(ref=ref)
+
 class PassiveTreeService:
-    def __init__(self):
-        self.tree_data = None
-        self.node_map = {}
+    def __init__(self, version: str = DEFAULT_TREE_VERSION, data_dir: Optional[Path] = None):
+        self.version = version
+        self.data_dir = Path(data_dir) if data_dir else TREE_DATA_DIR
+        self.snapshot: Optional[PassiveTreeSnapshot] = None
+        self.source: Optional[str] = None  # snapshot / raw / download
+        self.nodes: Optional[PassiveNodeTable] = None
+        self.tree_index: Optional[PassiveTreeIndex] = None
         self.loaded = False
+        self._load_lock = threading.Lock()
         
-    @lru_cache(maxsize=1)
     def load_tree_data(self) -> bool:
-        """載入 POE 官方天賦樹資料（只載入一次，快取結果）"""
-        if self.loaded and self.node_map:
-            logger.info("天賦樹資料已載入，使用快取")
+        """
+        載入 POE 官方天賦樹資料（只載入一次，快取結果）
+        
+        依序嘗試：本機快照 -> 本機原始 data.json（編譯並寫入快照）
+        -> 官方 GitHub 固定標籤下載（需設定 PASSIVE_TREE_ALLOW_DOWNLOAD=1）。
+        同時呼叫時只有一個執行緒實際載入，其餘等待其結果；失敗不快取，可再次重試。
+        """
+        if self.loaded and self.nodes:
             return True
-            
-        try:
-            # POE 官方 GitHub repository (永遠最新版本)
-            url = "https://raw.githubusercontent.com/grindinggear/skilltree-export/master/data.json"
-            logger.info(f"正在載入天賦樹資料: {url}")
-            
-            response = requests.get(url, timeout=30)
-            response.raise_for_status()
-            
-            self.tree_data = response.json()
-            logger.info(f"成功取得天賦樹 JSON，大小: {len(response.content)} bytes")
-            
-            # 建立節點 ID -> 節點資訊的映射
-            if 'nodes' in self.tree_data:
-                for node_id_str, node_info in self.tree_data['nodes'].items():
-                    try:
-                        node_id = int(node_id_str)
-                        
-                        # 判斷節點類型（支援新舊兩種欄位名稱）
-                        is_keystone = node_info.get('ks', node_info.get('isKeystone', False))
-                        is_notable = node_info.get('not', node_info.get('isNotable', False))
-                        is_mastery = node_info.get('m', node_info.get('isMastery', False))
-                        is_jewel = node_info.get('isJewelSocket', False)
-                        
-                        node_type = 'normal'
-                        if is_keystone:
-                            node_type = 'keystone'
-                        elif is_notable:
-                            node_type = 'notable'
-                        elif is_mastery:
-                            node_type = 'mastery'
-                        elif is_jewel:
-                            node_type = 'jewel_socket'
-                        
-                        # 取得節點名稱和效果（支援新舊兩種欄位名稱）
-                        name = node_info.get('name', node_info.get('dn', f'Node {node_id}'))
-                        stats = node_info.get('sd', node_info.get('stats', []))
-                        
-                        self.node_map[node_id] = {
-                            'id': node_id,
-                            'name': name,
-                            'stats': stats,
-                            'type': node_type,
-                            'isKeystone': is_keystone,
-                            'isNotable': is_notable,
-                            'isMastery': is_mastery,
-                            'isJewelSocket': is_jewel,
-                            'icon': node_info.get('icon', ''),
-                            'flavourText': node_info.get('flavourText', []),
-                            'out': node_info.get('out', [])  # 連接的節點
-                        }
-                    except (ValueError, KeyError) as e:
-                        logger.warning(f"無法處理節點 {node_id_str}: {str(e)}")
-                        continue
-                
-                self.loaded = True
-                logger.info(f"✅ 成功載入 {len(self.node_map)} 個天賦節點資料")
+        
+        with self._load_lock:
+            if self.loaded and self.nodes:
+                logger.info("天賦樹資料已載入，使用快取")
                 return True
-            else:
-                logger.error("天賦樹資料格式錯誤：找不到 'nodes' 欄位")
+            return self._load_tree_data_locked()
+    
+    def _load_tree_data_locked(self) -> bool:
+        """實際載入天賦樹資料（呼叫端須持有 _load_lock）"""
+        try:
+            snapshot = self._load_snapshot()
+            if snapshot is None:
+                logger.error(
+                    f"找不到天賦樹資料 {self.version}（快照、原始檔與下載皆不可用），"
+                    f"請以 python -m app.passive_tree_snapshot 建立 "
+                    f"{snapshot_path(self.version, self.data_dir)}"
+                )
                 return False
+            
+            self.snapshot = snapshot
+            self.nodes = node_table_for(snapshot)
+            self.tree_index = self.nodes.index
+            self.loaded = True
+            logger.info(
+                f"✅ 成功載入 {len(self.nodes)} 個天賦節點資料"
+                f"（版本 {snapshot.version}，來源 {self.source}）"
+            )
+            return True
                 
         except requests.exceptions.Timeout:
             logger.error("載入天賦樹資料超時")
@@ -90,12 +104,62 @@ class PassiveTreeService:
             logger.error(f"載入天賦樹資料失敗: {str(e)}")
             return False
     
-    def get_node_info(self, node_id: int) -> Dict:
-        """取得單一節點資訊"""
+    def _load_snapshot(self) -> Optional[PassiveTreeSnapshot]:
+        """依快照 -> 原始檔 -> 下載的順序取得天賦樹快照"""
+        snapshot_file = snapshot_path(self.version, self.data_dir)
+        if snapshot_file.exists():
+            try:
+                snapshot = read_tree_snapshot(snapshot_file)
+                self.source = "snapshot"
+                return snapshot
+            except ValueError as e:
+                logger.warning(f"天賦樹快照無法使用，改為重新編譯: {str(e)}")
+        
+        raw_file = raw_data_path(self.version, self.data_dir)
+        if raw_file.exists():
+            logger.info(f"正在編譯天賦樹資料: {raw_file}")
+            data = compile_tree_file(raw_file, self.version)
+            self.source = "raw"
+        elif ALLOW_TREE_DOWNLOAD:
+            url = tree_data_url(self.version)
+            logger.info(f"正在載入天賦樹資料: {url}")
+            response = requests.get(url, timeout=30)
+            response.raise_for_status()
+            logger.info(f"成功取得天賦樹 JSON，大小: {len(response.content)} bytes")
+            data = compile_tree_data(
+                response.json(),
+                self.version,
+                hashlib.sha256(response.content).digest()
+            )
+            self.source = "download"
+        else:
+            return None
+        
+        # 保存快照，下次啟動直接讀取
+        try:
+            write_tree_snapshot(snapshot_file, data)
+            logger.info(f"已寫入天賦樹快照: {snapshot_file}（{len(data)} bytes）")
+        except OSError as e:
+            logger.warning(f"無法寫入天賦樹快照: {str(e)}")
+        
+        return decode_tree_snapshot(data)
+    
+    def get_node_info(self, node_id: int, fields: Tuple[str, ...] = NODE_FIELDS) -> Dict:
+        """
+        取得單一節點資訊
+        
+        Args:
+            node_id: 節點 ID
+            fields: 要輸出的欄位（resolve_fields 正規化後）；預設為全部欄位
+        """
         if not self.loaded:
             self.load_tree_data()
         
-        return self.node_map.get(node_id, {
+        node_info = self.nodes.project(node_id, fields) if self.nodes is not None else None
+        if node_info is not None:
+            return node_info
+        
+        unknown = {
             'id': node_id,
             'name': f'Unknown Node {node_id}',
             'stats': [],
@@ -106,98 +170,355 @@ class PassiveTreeService:
             'isJewelSocket': False,
             'icon': '',
             'flavourText': [],
-            'out': []
-        })
+            'out': [],
+            'ascendancyName': None
+        }
+        if fields == NODE_FIELDS:
+            return unknown
+        return {field: unknown[field] for field in fields}
     
-    def get_nodes_info(self, node_ids: List[int]) -> Dict[int, Dict]:
+    def get_nodes_info(
+        self,
+        node_ids: List[int],
+        fields: Tuple[str, ...] = NODE_FIELDS
+    ) -> Dict[int, Dict]:
         """批次取得多個節點資訊"""
         if not self.loaded:
             self.load_tree_data()
         
         result = {}
         for node_id in node_ids:
-            result[node_id] = self.get_node_info(node_id)
+            result[node_id] = self.get_node_info(node_id, fields)
         
         return result
     
+    def get_nodes_columns(
+        self,
+        node_ids: Optional[List[int]] = None,
+        fields: Tuple[str, ...] = NODE_FIELDS
+    ) -> Dict[str, List[Any]]:
+        """
+        以欄式格式取得多個節點資訊（每個欄位一個與節點順序對齊的陣列）
+        
+        重複的欄位名稱只出現一次，大量節點時回應比逐筆物件小得多。
+        
+        Args:
+            node_ids: 節點 ID；None 表示整棵天賦樹（依節點表順序）
+            fields: 要輸出的欄位（resolve_fields 正規化後）
+            
+        Returns:
+            欄位 -> 值陣列
+        """
+        if not self.loaded:
+            self.load_tree_data()
+        
+        if node_ids is None:
+            node_ids = list(self.nodes.node_ids) if self.nodes is not None else []
+        
+        columns: Dict[str, List[Any]] = {field: [] for field in fields}
+        appends = [(field, columns[field].append) for field in fields]
+        for node_id in dict.fromkeys(node_ids):
+            info = self.get_node_info(node_id, fields)
+            for field, append in appends:
+                append(info[field])
+        return columns
+    
     def get_node_name(self, node_id: int) -> str:
         """快速取得節點名稱"""
         info = self.get_node_info(node_id)
         return info.get('name', f'Node {node_id}')
     
+    def search_nodes(
+        self,
+        query: str,
+        node_types: Optional[List[str]] = None,
+        limit: int = 20,
+        fuzzy: bool = True,
+        include_nodes_info: bool = False
+    ) -> List[Dict]:
+        """
+        依名稱與能力描述搜尋節點（前綴比對、拼字容錯，依相關度排序）
+        
+        Args:
+            query: 查詢文字
+            node_types: 只保留這些節點類型（keystone / notable / mastery 等）；None 表示不限
+            limit: 最多返回筆數
+            fuzzy: 是否允許拼字容錯
+            include_nodes_info: 是否附上完整節點資訊
+            
+        Returns:
+            搜尋結果列表
+            
+        Raises:
+            ValueError: 未知的節點類型
+        """
+        if not self.loaded:
+            self.load_tree_data()
+        
+        if self.nodes is None:
+            return []
+        
+        hits = search_index_for(self.nodes).search(query, node_types, limit, fuzzy=fuzzy)
+        results = []
+        for hit in hits:
+            result = {
+                'id': hit.node_id,
+                'name': self.nodes.name(hit.node_id),
+                'type': hit.node_class,
+                'score': hit.score,
+                'matched': hit.matched
+            }
+            if include_nodes_info:
+                result['node_info'] = self.get_node_info(hit.node_id)
+            results.append(result)
+        return results
+    
+    def rank_similar_allocations(
+        self,
+        reference_nodes: List[int],
+        builds: List[List[int]],
+        limit: Optional[int] = None
+    ) -> List[Dict]:
+        """
+        依 Jaccard 相似度排序多個配置（位元集合運算）
+        
+        Args:
+            reference_nodes: 參考配置的節點
+            builds: 各候選配置的節點
+            limit: 最多返回筆數；None 表示全部
+            
+        Returns:
+            排序後的結果（候選索引、相似度、共同 / 缺少 / 多出的節點數）
+        """
+        if not self.loaded:
+            self.load_tree_data()
+        
+        space = allocation_space_for(self.nodes.classes if self.nodes is not None else None)
+        ranking = rank_by_similarity(
+            space.encode(reference_nodes),
+            [space.encode(nodes) for nodes in builds],
+            limit
+        )
+        return [
+            {
+                'index': index,
+                'similarity': round(similarity, 4),
+                'shared': shared,
+                'missing': missing,
+                'extra': extra
+            }
+            for index, similarity, shared, missing, extra in ranking
+        ]
+    
     def is_loaded(self) -> bool:
         """檢查資料是否已載入"""
-        return self.loaded and len(self.node_map) > 0
+        return self.loaded and self.node_count() > 0
+    
+    def node_count(self) -> int:
+        """已載入的節點數"""
+        return len(self.nodes) if self.nodes is not None else 0
+    
+    def calculate_path(self, start_nodes: List[int], target_node: int) -> Dict:
+        """計算從已點節點到目標節點的最短路徑"""
+        return self.calculate_paths(start_nodes, [target_node])[target_node]
     
-    def _build_node_graph(self) -> Dict[int, List[int]]:
-        """建立節點連接圖"""
-        graph = {}
+    def calculate_paths(
+        self,
+        start_nodes: List[int],
+        target_nodes: List[int],
+        include_nodes_info: bool = True
+    ) -> Dict[int, Dict]:
+        """
+        一次計算從已點節點到多個目標節點的最短路徑
         
-        for node_id, node_info in self.node_map.items():
-            # 獲取連接的節點
-            connected = node_info.get('out', [])
-            graph[node_id] = connected
+        由所有已點節點同時 BFS 建立距離場，所有目標共用同一次走訪；
+        距離場依配置快取，配置只差幾個節點時以增量更新取得。
         
-        return graph
-    
-    def _bfs_shortest_path(self, graph: Dict[int, List[int]], start: int, target: int) -> Optional[List[int]]:
-        """使用 BFS 找最短路徑"""
-        if start == target:
-            return [start]
+        Args:
+            start_nodes: 已點節點
+            target_nodes: 目標節點
+            include_nodes_info: 是否附上路徑上的節點資訊
+            
+        Returns:
+            目標節點 ID -> 路徑結果
+        """
+        if not self.loaded:
+            self.load_tree_data()
         
-        queue = deque([(start, [start])])
-        visited = {start}
+        field = None
+        if self.tree_index is not None:
+            field = get_field_cache(self.tree_index).get(start_nodes)
         
-        while queue:
-            current, path = queue.popleft()
+        results = {}
+        for target_node in target_nodes:
+            shortest_path = field.path(target_node) if field is not None else None
+            if not shortest_path:
+                results[target_node] = {
+                    'found': False,
+                    'message': '找不到路徑'
+                }
+                continue
             
-            # 檢查當前節點的所有鄰居
-            for neighbor in graph.get(current, []):
-                if neighbor == target:
-                    return path + [neighbor]
-                
-                if neighbor not in visited:
-                    visited.add(neighbor)
-                    queue.append((neighbor, path + [neighbor]))
+            # 移除起點（已經點了）
+            path_nodes = shortest_path[1:]
+            result = {
+                'found': True,
+                'path': path_nodes,
+                'cost': len(path_nodes)
+            }
+            if include_nodes_info:
+                result['nodes_info'] = [self.get_node_info(nid) for nid in path_nodes]
+            results[target_node] = result
         
-        return None  # 找不到路徑
+        return results
     
-    def calculate_path(self, start_nodes: List[int], target_node: int) -> Dict:
-        """計算從已點節點到目標節點的最短路徑"""
+    def plan_allocation(
+        self,
+        allocated_nodes: List[int],
+        target_nodes: List[int],
+        include_nodes_info: bool = True
+    ) -> Dict:
+        """
+        規劃一次到達所有目標節點的連通配置（共用的過路節點只計算一次）
+        
+        Args:
+            allocated_nodes: 已點節點
+            target_nodes: 目標節點
+            include_nodes_info: 是否附上新增節點的資訊
+            
+        Returns:
+            規劃結果（總點數、配置順序、無法到達的目標，以及逐一計算的總點數）
+        """
+        if not self.loaded:
+            self.load_tree_data()
+        
+        if self.tree_index is None:
+            return {
+                'found': False,
+                'message': '天賦樹資料尚未載入'
+            }
+        
+        plan = plan_steiner_allocation(self.tree_index, allocated_nodes, target_nodes)
+        result = {
+            'found': plan.found,
+            'order': plan.order,
+            'cost': plan.total_cost,
+            'independent_cost': plan.independent_cost,
+            'saved_points': plan.independent_cost - plan.total_cost,
+            'targets': plan.targets,
+            'unreachable': plan.unreachable
+        }
+        if include_nodes_info:
+            result['nodes_info'] = [self.get_node_info(nid) for nid in plan.order]
+        return result
+    
+    def optimize_allocation(
+        self,
+        allocated_nodes: List[int],
+        candidate_nodes: List[int],
+        budget: int,
+        include_nodes_info: bool = True
+    ) -> Dict:
+        """
+        在點數預算內挑選價值最高、且與已點節點連通的候選節點
+        
+        Args:
+            allocated_nodes: 已點節點
+            candidate_nodes: 可選取的節點（通常為目標流派的節點）
+            budget: 可用天賦點數
+            include_nodes_info: 是否附上選取節點的資訊
+            
+        Returns:
+            最佳化結果（選取順序、價值總和、使用點數、未選取與無法連通的節點）
+        """
         if not self.loaded:
             self.load_tree_data()
         
-        # 建立節點連接圖
-        graph = self._build_node_graph()
+        if self.tree_index is None:
+            return {
+                'found': False,
+                'message': '天賦樹資料尚未載入'
+            }
         
-        # 使用 BFS 找最短路徑
-        shortest_path = None
-        min_distance = float('inf')
+        values = {node_id: self._node_value(node_id) for node_id in candidate_nodes}
+        plan = plan_budget_allocation(self.tree_index, allocated_nodes, candidate_nodes, values, budget)
+        result = {
+            'found': bool(plan.order),
+            'order': plan.order,
+            'value': plan.value,
+            'cost': plan.total_cost,
+            'budget': plan.budget,
+            'skipped': plan.skipped,
+            'unreachable': plan.unreachable
+        }
+        if include_nodes_info:
+            result['nodes_info'] = [self.get_node_info(nid) for nid in plan.order]
+        return result
+    
+    def calculate_weighted_path(self, start_nodes: List[int], target_node: int) -> Dict:
+        """
+        計算加權成本最低的路徑（經過高價值節點較便宜）
         
-        for start_node in start_nodes:
-            path = self._bfs_shortest_path(graph, start_node, target_node)
-            if path and len(path) < min_distance:
-                shortest_path = path
-                min_distance = len(path)
+        Args:
+            start_nodes: 已點節點
+            target_node: 目標節點
+            
+        Returns:
+            路徑結果（含加權成本、路徑價值、效益比與展開節點數）
+        """
+        if not self.loaded:
+            self.load_tree_data()
         
-        if not shortest_path:
+        router = self._weighted_router()
+        result = router.find_path(start_nodes, target_node) if router is not None else None
+        if result is None:
             return {
                 'found': False,
                 'message': '找不到路徑'
             }
         
         # 移除起點（已經點了）
-        path_nodes = shortest_path[1:] if len(shortest_path) > 1 else []
-        
+        path_nodes = result.path[1:]
+        cost = len(path_nodes)
         return {
             'found': True,
             'path': path_nodes,
-            'cost': len(path_nodes),
+            'cost': cost,
+            'weighted_cost': round(result.weighted_cost, 3),
+            'value': result.value,
+            'efficiency': result.value / cost if cost > 0 else 0,
+            'explored_nodes': result.explored,
             'nodes_info': [self.get_node_info(nid) for nid in path_nodes]
         }
     
-    def suggest_optimal_paths(self, allocated_nodes: List[int], missing_nodes: List[int], max_suggestions: int = 5) -> List[Dict]:
-        """建議最佳天賦路徑"""
+    def _weighted_router(self) -> Optional[WeightedRouter]:
+        """取得目前天賦樹版本的加權路徑搜尋器（首次使用時計算地標）"""
+        nodes = self.nodes
+        if nodes is None:
+            return None
+        return get_weighted_router(self.tree_index, lambda: path_values(nodes), PATH_VALUE_PROFILE)
+    
+    def _node_value(self, node_id: int) -> float:
+        """節點的路徑價值（與分析器相同的 PassiveNode.path_value；未知節點為 0）"""
+        position = self.nodes.position(node_id) if self.nodes is not None else None
+        return 0 if position is None else PassiveNode(self.nodes, position).path_value
+    
+    def suggest_optimal_paths(
+        self,
+        allocated_nodes: List[int],
+        missing_nodes: List[int],
+        max_suggestions: int = 5,
+        weighted: bool = False
+    ) -> List[Dict]:
+        """
+        建議最佳天賦路徑
+        
+        Args:
+            allocated_nodes: 已點節點
+            missing_nodes: 缺少的節點
+            max_suggestions: 最大建議數量
+            weighted: 是否以加權成本搜尋並排序（偏好沿途價值高的路線）
+        """
         if not self.loaded:
             self.load_tree_data()
         
@@ -206,34 +527,53 @@ class PassiveTreeService:
         # 只處理關鍵節點（基石和顯著天賦）
         priority_nodes = []
         for node_id in missing_nodes:
-            node_info = self.get_node_info(node_id)
-            if node_info.get('isKeystone') or node_info.get('isNotable'):
+            position = self.nodes.position(node_id) if self.nodes is not None else None
+            if position is None:
+                continue
+            node_type = self.nodes.type_at(position)
+            if node_type in ('keystone', 'notable'):
                 priority_nodes.append({
                     'id': node_id,
-                    'info': node_info,
-                    'priority': 10 if node_info.get('isKeystone') else 5
+                    'priority': 10 if node_type == 'keystone' else 5
                 })
         
         # 按優先級排序
         priority_nodes.sort(key=lambda x: x['priority'], reverse=True)
+        priority_nodes = priority_nodes[:max_suggestions]
         
-        # 計算每個關鍵節點的路徑
-        for node_data in priority_nodes[:max_suggestions]:
+        if weighted:
+            path_results = {
+                node_data['id']: self.calculate_weighted_path(allocated_nodes, node_data['id'])
+                for node_data in priority_nodes
+            }
+        else:
+            # 所有關鍵節點共用一次距離場計算
+            path_results = self.calculate_paths(
+                allocated_nodes,
+                [node_data['id'] for node_data in priority_nodes]
+            )
+        
+        for node_data in priority_nodes:
             node_id = node_data['id']
-            path_result = self.calculate_path(allocated_nodes, node_id)
+            path_result = path_results[node_id]
             
             if path_result['found']:
-                suggestions.append({
+                suggestion = {
                     'target_node': node_id,
-                    'target_info': node_data['info'],
+                    'target_info': self.get_node_info(node_id),
                     'path': path_result['path'],
                     'cost': path_result['cost'],
                     'priority': node_data['priority'],
                     'nodes_on_path': path_result['nodes_info']
-                })
+                }
+                if weighted:
+                    suggestion['weighted_cost'] = path_result['weighted_cost']
+                    suggestion['efficiency'] = path_result['efficiency']
+                suggestions.append(suggestion)
         
-        # 按成本排序（成本低的優先）
-        suggestions.sort(key=lambda x: (x['cost'], -x['priority']))
+        # 按成本排序（成本低的優先；加權模式依加權成本）
+        cost_key = 'weighted_cost' if weighted else 'cost'
+        suggestions.sort(key=lambda x: (x[cost_key], -x['priority']))
         
         return suggestions
 
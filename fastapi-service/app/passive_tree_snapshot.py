@@ -0,0 +1,412 @@
+"""
+天賦樹離線快照
+將官方 data.json 預先編譯為版本化的二進位格式（節點表、鄰接表、字串池），
+啟動時直接讀取本機檔案，不需重新解析原始 JSON 或連線下載
+"""
+import hashlib
+import json
+import os
+import struct
+import sys
+import time
+from array import array
+from pathlib import Path
+from typing import Any, Dict, List, Optional, Tuple
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 格式識別與版本（欄位結構改變時遞增）
+TREE_SNAPSHOT_MAGIC = b"PTS"
+TREE_SNAPSHOT_FORMAT = 3
+
+# 預設天賦樹版本與資料目錄（每個版本一組 <版本>.json / <版本>.bin）
+DEFAULT_TREE_VERSION = os.getenv("PASSIVE_TREE_VERSION", "3_25")
+TREE_DATA_DIR = Path(
+    os.getenv("PASSIVE_TREE_DATA_DIR", "")
+    or Path(__file__).parent.parent / "data" / "passive_tree"
+)
+
+# 節點類型（索引即快照中的類型代碼，新增項目只能附加在尾端）
+NODE_TYPES: Tuple[str, ...] = ("normal", "keystone", "notable", "mastery", "jewel_socket")
+
+# 節點旗標
+FLAG_KEYSTONE = 0x01
+FLAG_NOTABLE = 0x02
+FLAG_MASTERY = 0x04
+FLAG_JEWEL_SOCKET = 0x08
+FLAG_ASCENDANCY_START = 0x10
+FLAG_PROXY = 0x20
+FLAG_CLASS_START = 0x40
+
+# 星團珠寶插槽大小（expansionJewel.size + 1；0 表示一般插槽或非插槽）
+JEWEL_SIZE_NONE = 0
+JEWEL_SIZE_SMALL = 1
+JEWEL_SIZE_MEDIUM = 2
+JEWEL_SIZE_LARGE = 3
+
+_HEADER = struct.Struct("<3sBI16s")  # magic, 格式版本, 節點數, 原始資料摘要
+_LENGTH = struct.Struct("<I")
+_NEEDS_BYTESWAP = sys.byteorder != "little"
+
+
+def snapshot_path(version: str = DEFAULT_TREE_VERSION, data_dir: Optional[Path] = None) -> Path:
+    """取得指定版本的快照檔路徑"""
+    return Path(data_dir or TREE_DATA_DIR) / f"{version}.bin"
+
+
+def raw_data_path(version: str = DEFAULT_TREE_VERSION, data_dir: Optional[Path] = None) -> Path:
+    """取得指定版本的原始 data.json 路徑"""
+    return Path(data_dir or TREE_DATA_DIR) / f"{version}.json"
+
+
+# ===== 快照內容 =====
+
+class PassiveTreeSnapshot:
+    """
+    已解碼的天賦樹快照（欄式儲存）
+
+    第 i 個節點的資料分散在各欄的第 i 個位置；
+    能力描述、風味文字與連出節點以 offsets / values 的 CSR 形式保存。
+    """
+
+    def __init__(
+        self,
+        version: str,
+        source_digest: bytes,
+        node_ids: array,
+        node_types: array,
+        node_flags: array,
+        jewel_sizes: array,
+        names: List[str],
+        icons: List[str],
+        ascendancies: List[str],
+        stat_offsets: array,
+        stats: List[str],
+        flavour_offsets: array,
+        flavour_texts: List[str],
+        out_offsets: array,
+        out_targets: array
+    ):
+        self.version = version
+        self.source_digest = source_digest
+        self.node_ids = node_ids
+        self.node_types = node_types
+        self.node_flags = node_flags
+        self.jewel_sizes = jewel_sizes
+        self.names = names
+        self.icons = icons
+        self.ascendancies = ascendancies
+        self.stat_offsets = stat_offsets
+        self.stats = stats
+        self.flavour_offsets = flavour_offsets
+        self.flavour_texts = flavour_texts
+        self.out_offsets = out_offsets
+        self.out_targets = out_targets
+
+    def __len__(self) -> int:
+        return len(self.node_ids)
+
+
+# ===== 編譯 =====
+
+def _node_flags(node_info: Dict[str, Any]) -> int:
+    """判斷節點旗標（支援新舊兩種欄位名稱）"""
+    flags = 0
+    if node_info.get('ks', node_info.get('isKeystone', False)):
+        flags |= FLAG_KEYSTONE
+    if node_info.get('not', node_info.get('isNotable', False)):
+        flags |= FLAG_NOTABLE
+    if node_info.get('m', node_info.get('isMastery', False)):
+        flags |= FLAG_MASTERY
+    if node_info.get('isJewelSocket', False):
+        flags |= FLAG_JEWEL_SOCKET
+    if node_info.get('isAscendancyStart', False):
+        flags |= FLAG_ASCENDANCY_START
+    if node_info.get('isProxy', False):
+        flags |= FLAG_PROXY
+    if node_info.get('classStartIndex') is not None:
+        flags |= FLAG_CLASS_START
+    return flags
+
+
+def _jewel_size(node_info: Dict[str, Any]) -> int:
+    """星團珠寶插槽大小代碼（expansionJewel.size 為 0 / 1 / 2）"""
+    expansion_jewel = node_info.get('expansionJewel')
+    if not isinstance(expansion_jewel, dict):
+        return JEWEL_SIZE_NONE
+    try:
+        size = int(expansion_jewel.get('size', 0))
+    except (TypeError, ValueError):
+        return JEWEL_SIZE_NONE
+    return min(max(size, 0), 2) + 1
+
+
+def _node_type(flags: int) -> int:
+    """由旗標決定節點類型代碼（基石 > 顯著 > 專精 > 珠寶插槽）"""
+    if flags & FLAG_KEYSTONE:
+        return NODE_TYPES.index('keystone')
+    if flags & FLAG_NOTABLE:
+        return NODE_TYPES.index('notable')
+    if flags & FLAG_MASTERY:
+        return NODE_TYPES.index('mastery')
+    if flags & FLAG_JEWEL_SOCKET:
+        return NODE_TYPES.index('jewel_socket')
+    return NODE_TYPES.index('normal')
+
+
+def compile_tree_data(
+    tree_data: Dict[str, Any],
+    version: str = DEFAULT_TREE_VERSION,
+    source_digest: bytes = b""
+) -> bytes:
+    """
+    將官方 data.json 內容編譯為快照
+
+    Args:
+        tree_data: 已解析的 data.json
+        version: 天賦樹版本
+        source_digest: 原始檔案摘要（用於追溯快照來源）
+
+    Returns:
+        快照位元組
+
+    Raises:
+        ValueError: 找不到 nodes 欄位
+    """
+    if 'nodes' not in tree_data:
+        raise ValueError("天賦樹資料格式錯誤：找不到 'nodes' 欄位")
+
+    strings: Dict[str, int] = {"": 0}
+
+    def intern(text: Any) -> int:
+        text = str(text).replace("\0", "")
+        index = strings.get(text)
+        if index is None:
+            index = strings[text] = len(strings)
+        return index
+
+    node_ids = array("I")
+    node_types = array("B")
+    node_flags = array("B")
+    jewel_sizes = array("B")
+    names = array("I")
+    icons = array("I")
+    ascendancies = array("I")
+    stat_offsets = array("I", [0])
+    stats = array("I")
+    flavour_offsets = array("I", [0])
+    flavour_texts = array("I")
+    out_offsets = array("I", [0])
+    out_targets = array("I")
+
+    for node_id_str, node_info in tree_data['nodes'].items():
+        try:
+            node_id = int(node_id_str)
+        except (TypeError, ValueError):
+            # 例如 "root" 等非數字節點
+            continue
+
+        flags = _node_flags(node_info)
+        node_ids.append(node_id)
+        node_flags.append(flags)
+        node_types.append(_node_type(flags))
+        jewel_sizes.append(_jewel_size(node_info))
+        names.append(intern(node_info.get('name', node_info.get('dn', f'Node {node_id}'))))
+        icons.append(intern(node_info.get('icon', '')))
+        ascendancies.append(intern(node_info.get('ascendancyName', '') or ''))
+
+        stats.extend(intern(stat) for stat in node_info.get('sd', node_info.get('stats', [])) or [])
+        stat_offsets.append(len(stats))
+
+        flavour_texts.extend(intern(text) for text in node_info.get('flavourText', []) or [])
+        flavour_offsets.append(len(flavour_texts))
+
+        # 新版 data.json 的連接節點為字串，統一轉為整數
+        for target in node_info.get('out', []) or []:
+            try:
+                out_targets.append(int(target))
+            except (TypeError, ValueError):
+                continue
+        out_offsets.append(len(out_targets))
+
+    buffer = bytearray(_HEADER.pack(
+        TREE_SNAPSHOT_MAGIC,
+        TREE_SNAPSHOT_FORMAT,
+        len(node_ids),
+        source_digest[:16].ljust(16, b"\0")
+    ))
+    _write_bytes(buffer, version.encode("utf-8"))
+
+    for column in (
+        node_ids, node_types, node_flags, jewel_sizes, names, icons, ascendancies,
+        stat_offsets, stats, flavour_offsets, flavour_texts, out_offsets, out_targets
+    ):
+        _write_array(buffer, column)
+
+    _write_bytes(buffer, "\0".join(strings).encode("utf-8"))
+    return bytes(buffer)
+
+
+def compile_tree_file(
+    source: Path,
+    version: str = DEFAULT_TREE_VERSION
+) -> bytes:
+    """
+    讀取原始 data.json 並編譯為快照
+
+    Args:
+        source: data.json 路徑
+        version: 天賦樹版本
+
+    Returns:
+        快照位元組
+    """
+    raw = Path(source).read_bytes()
+    return compile_tree_data(json.loads(raw), version, hashlib.sha256(raw).digest())
+
+
+def _write_bytes(buffer: bytearray, data: bytes):
+    """寫入帶長度前綴的位元組"""
+    buffer += _LENGTH.pack(len(data))
+    buffer += data
+
+
+def _write_array(buffer: bytearray, values: array):
+    """寫入帶長度前綴的陣列（little-endian）"""
+    buffer += _LENGTH.pack(len(values))
+    if _NEEDS_BYTESWAP and values.itemsize > 1:
+        values = array(values.typecode, values)
+        values.byteswap()
+    buffer += values.tobytes()
+
+
+# ===== 解碼 =====
+
+class _SnapshotReader:
+    """依序讀取快照區塊"""
+
+    def __init__(self, data: bytes, offset: int):
+        self.data = memoryview(data)
+        self.pos = offset
+
+    def bytes(self) -> bytes:
+        (length,) = _LENGTH.unpack_from(self.data, self.pos)
+        start = self.pos + _LENGTH.size
+        self.pos = start + length
+        if self.pos > len(self.data):
+            raise ValueError("天賦樹快照資料截斷")
+        return self.data[start:self.pos].tobytes()
+
+    def array(self, typecode: str) -> array:
+        (count,) = _LENGTH.unpack_from(self.data, self.pos)
+        values = array(typecode)
+        start = self.pos + _LENGTH.size
+        self.pos = start + count * values.itemsize
+        if self.pos > len(self.data):
+            raise ValueError("天賦樹快照資料截斷")
+        values.frombytes(self.data[start:self.pos])
+        if _NEEDS_BYTESWAP and values.itemsize > 1:
+            values.byteswap()
+        return values
+
+
+def decode_tree_snapshot(data: bytes) -> PassiveTreeSnapshot:
+    """
+    解碼天賦樹快照
+
+    Args:
+        data: compile_tree_data 產生的位元組
+
+    Returns:
+        已解碼的快照
+
+    Raises:
+        ValueError: 格式、版本不符或資料損壞
+    """
+    if len(data) < _HEADER.size:
+        raise ValueError("天賦樹快照資料過短")
+
+    magic, format_version, node_count, source_digest = _HEADER.unpack_from(data, 0)
+    if magic != TREE_SNAPSHOT_MAGIC:
+        raise ValueError("不是天賦樹快照格式")
+    if format_version != TREE_SNAPSHOT_FORMAT:
+        raise ValueError(
+            f"不支援的天賦樹快照格式: {format_version}（目前為 {TREE_SNAPSHOT_FORMAT}）"
+        )
+
+    try:
+        reader = _SnapshotReader(data, _HEADER.size)
+        version = reader.bytes().decode("utf-8")
+        (node_ids, node_types, node_flags, jewel_sizes, name_ids, icon_ids, ascendancy_ids,
+         stat_offsets, stat_ids, flavour_offsets, flavour_ids, out_offsets, out_targets) = (
+            reader.array(typecode)
+            for typecode in ("I", "B", "B", "B", "I", "I", "I", "I", "I", "I", "I", "I", "I")
+        )
+        strings = reader.bytes().decode("utf-8").split("\0")
+
+        if not (len(node_ids) == len(node_types) == len(node_flags) == len(jewel_sizes) == node_count
+                and len(stat_offsets) == len(flavour_offsets) == len(out_offsets) == node_count + 1):
+            raise ValueError("欄位長度不一致")
+
+        return PassiveTreeSnapshot(
+            version=version,
+            source_digest=source_digest,
+            node_ids=node_ids,
+            node_types=node_types,
+            node_flags=node_flags,
+            jewel_sizes=jewel_sizes,
+            names=[strings[i] for i in name_ids],
+            icons=[strings[i] for i in icon_ids],
+            ascendancies=[strings[i] for i in ascendancy_ids],
+            stat_offsets=stat_offsets,
+            stats=[strings[i] for i in stat_ids],
+            flavour_offsets=flavour_offsets,
+            flavour_texts=[strings[i] for i in flavour_ids],
+            out_offsets=out_offsets,
+            out_targets=out_targets
+        )
+    except (struct.error, IndexError, UnicodeDecodeError, ValueError) as e:
+        raise ValueError(f"天賦樹快照資料損壞: {str(e)}")
+
+
+# ===== 檔案存取 =====
+
+def read_tree_snapshot(path: Path) -> PassiveTreeSnapshot:
+    """讀取並解碼快照檔"""
+    return decode_tree_snapshot(Path(path).read_bytes())
+
+
+def write_tree_snapshot(path: Path, data: bytes):
+    """寫入快照檔（先寫暫存檔再取代，避免其他行程讀到一半的檔案）"""
+    path = Path(path)
+    path.parent.mkdir(parents=True, exist_ok=True)
+    temp_path = path.with_name(f"{path.name}.{os.getpid()}.tmp")
+    temp_path.write_bytes(data)
+    os.replace(temp_path, path)
+
+
+if __name__ == "__main__":
+    # 用法：python -m app.passive_tree_snapshot <data.json> [版本] [輸出路徑]
+    if len(sys.argv) < 2:
+        print("用法: python -m app.passive_tree_snapshot <data.json> [版本] [輸出路徑]")
+        sys.exit(1)
+
+    source_path = Path(sys.argv[1])
+    tree_version = sys.argv[2] if len(sys.argv) > 2 else DEFAULT_TREE_VERSION
+    output_path = Path(sys.argv[3]) if len(sys.argv) > 3 else snapshot_path(tree_version)
+
+    start = time.perf_counter()
+    snapshot_bytes = compile_tree_file(source_path, tree_version)
+    compile_ms = (time.perf_counter() - start) * 1000
+    write_tree_snapshot(output_path, snapshot_bytes)
+
+    start = time.perf_counter()
+    loaded = decode_tree_snapshot(snapshot_bytes)
+    load_ms = (time.perf_counter() - start) * 1000
+
+    print(
+        f"{output_path}: {len(loaded):,d} 個節點  {len(snapshot_bytes):,d} bytes  "
+        f"compile {compile_ms:.1f} ms  load {load_ms:.1f} ms"
+    )
@@ -0,0 +1,175 @@
+"""
+PoB PlayerStat 數值向量
+將 <Build> 下的 PlayerStat 轉為固定索引的數值陣列，並提供整批差異計算
+"""
+import heapq
+import math
+from typing import Dict, Iterable, List, Optional, Tuple
+
+
+# 共用的能力值名稱表（索引固定，所有角色共用；新增項目只能附加在尾端）
+PLAYER_STAT_NAMES: Tuple[str, ...] = (
+    # 防禦
+    "Life",
+    "EnergyShield",
+    "Mana",
+    "Ward",
+    "Armour",
+    "Evasion",
+    "TotalEHP",
+    "FireResist",
+    "ColdResist",
+    "LightningResist",
+    "ChaosResist",
+    "BlockChance",
+    "SpellBlockChance",
+    "SpellSuppressionChance",
+    "LifeRegenRecovery",
+    "EnergyShieldRegenRecovery",
+    # 輸出
+    "TotalDPS",
+    "CombinedDPS",
+    "FullDPS",
+    "AverageHit",
+    "Speed",
+    "CritChance",
+    "CritMultiplier",
+    "HitChance",
+    # 屬性
+    "Str",
+    "Dex",
+    "Int",
+    # 其他
+    "EffectiveMovementSpeedMod",
+)
+
+# 能力值名稱 -> 索引
+PLAYER_STAT_INDEX: Dict[str, int] = {name: index for index, name in enumerate(PLAYER_STAT_NAMES)}
+
+# 能力值顯示名稱
+PLAYER_STAT_LABELS: Dict[str, str] = {
+    "Life": "生命",
+    "EnergyShield": "能量護盾",
+    "Mana": "魔力",
+    "Ward": "結界",
+    "Armour": "護甲",
+    "Evasion": "閃避",
+    "TotalEHP": "有效生命池",
+    "FireResist": "火焰抗性",
+    "ColdResist": "冰冷抗性",
+    "LightningResist": "閃電抗性",
+    "ChaosResist": "混沌抗性",
+    "BlockChance": "攻擊格擋",
+    "SpellBlockChance": "法術格擋",
+    "SpellSuppressionChance": "法術壓制",
+    "LifeRegenRecovery": "生命回復",
+    "EnergyShieldRegenRecovery": "能量護盾回復",
+    "TotalDPS": "DPS",
+    "CombinedDPS": "綜合 DPS",
+    "FullDPS": "完整 DPS",
+    "AverageHit": "平均擊中傷害",
+    "Speed": "攻擊 / 施法速度",
+    "CritChance": "暴擊率",
+    "CritMultiplier": "暴擊傷害",
+    "HitChance": "命中率",
+    "Str": "力量",
+    "Dex": "敏捷",
+    "Int": "智慧",
+    "EffectiveMovementSpeedMod": "移動速度",
+}
+
+
+def build_player_stat_vector(stat_pairs: Iterable[Tuple[str, str]]) -> List[Optional[float]]:
+    """
+    將 PlayerStat (stat, value) 轉為固定索引向量
+
+    未列入名稱表的能力值會被忽略；缺少或無法解析（含 inf / nan）的項目為 None，
+    讓向量可直接輸出為 JSON。同名能力值以第一次出現為準。
+
+    Args:
+        stat_pairs: PlayerStat 的 (stat, value) 字串
+
+    Returns:
+        與 PLAYER_STAT_NAMES 對齊的數值列表
+    """
+    vector: List[Optional[float]] = [None] * len(PLAYER_STAT_NAMES)
+    index_of = PLAYER_STAT_INDEX.get
+
+    for stat, value in stat_pairs:
+        index = index_of(stat)
+        if index is None or vector[index] is not None:
+            continue
+        try:
+            number = float(value)
+        except (TypeError, ValueError):
+            continue
+        if math.isfinite(number):
+            vector[index] = number
+
+    return vector
+
+
+def format_stat_value(value: float) -> str:
+    """格式化能力值（大數值加千分位、不顯示小數）"""
+    return f"{value:,.0f}" if abs(value) >= 1000 else f"{value:g}"
+
+
+def diff_player_stats(
+    player_vector: List[Optional[float]],
+    target_vector: List[Optional[float]]
+) -> List[Tuple[int, float, float, float]]:
+    """
+    逐項計算兩個能力值向量的相對差距（單次掃描兩個列表，不另外複製）
+
+    相對差距 = (目標 - 玩家) / max(|目標|, |玩家|, 1)，正值表示目標較高；
+    任一方缺值（None）或長度不足的項目略過。
+
+    Args:
+        player_vector: 玩家能力值向量
+        target_vector: 目標能力值向量
+
+    Returns:
+        [(索引, 玩家值, 目標值, 相對差距)]
+    """
+    return [
+        (index, p, t, (t - p) / max(abs(t), abs(p), 1.0))
+        for index, (p, t) in enumerate(zip(player_vector, target_vector))
+        if p is not None and t is not None and p != t
+    ]
+
+
+def top_player_stat_gaps(
+    player_vector: List[Optional[float]],
+    target_vector: List[Optional[float]],
+    limit: int = 5,
+    min_relative_gap: float = 0.1
+) -> List[Dict[str, object]]:
+    """
+    找出目標領先幅度最大的能力值
+
+    Args:
+        player_vector: 玩家能力值向量
+        target_vector: 目標能力值向量
+        limit: 最多返回幾項
+        min_relative_gap: 最小相對差距門檻
+
+    Returns:
+        依相對差距由大到小排序的差距資訊
+    """
+    gaps = [
+        gap for gap in diff_player_stats(player_vector, target_vector)
+        if gap[3] >= min_relative_gap
+    ]
+
+    return [
+        {
+            "stat": PLAYER_STAT_NAMES[index],
+            "label": PLAYER_STAT_LABELS.get(PLAYER_STAT_NAMES[index], PLAYER_STAT_NAMES[index]),
+            "player_value": player_value,
+            "target_value": target_value,
+            "relative_gap": relative_gap
+        }
+        for index, player_value, target_value, relative_gap in heapq.nlargest(
+            limit, gaps, key=lambda gap: gap[3]
+        )
+    ]
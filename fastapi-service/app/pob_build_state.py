@@ -0,0 +1,183 @@
+"""
+PoB 解析狀態
+保留 XML 掃描後的原始屬性與文字，讓角色各區段在首次存取時才組裝
+"""
+from typing import Dict, List, Optional, Tuple, Any
+
+from app.passive_tree_codec import DecodedAllocation, decode_spec_allocation
+
+
+# 記錄格式（以 tuple 保存以降低常駐記憶體）
+# Spec：(Spec 屬性, 節點 ID 列表, 天賦樹 URL)
+SpecRecord = Tuple[Dict[str, str], List[int], Optional[str]]
+# Skill：(Skill 屬性, Gem 屬性列表)
+SkillRecord = Tuple[Dict[str, str], List[Dict[str, str]]]
+# SkillSet：(SkillSet 屬性, Skill 列表)
+SkillSetRecord = Tuple[Dict[str, str], List[SkillRecord]]
+# ItemSet：(ItemSet 屬性, Slot 名稱 -> Item ID)
+ItemSetRecord = Tuple[Dict[str, str], Dict[str, str]]
+
+
+class PobBuildState:
+    """
+    PoB 解析狀態
+
+    由 PobXmlMapper（DOM）或 StreamingPobXmlMapper（串流）填入，
+    只包含 XML 屬性、節點 ID 與物品文字，不含任何已組裝的模型。
+    所有 ItemSet、SkillSet 與天賦樹 Spec 都會保留，可依 ID 取用。
+    """
+
+    def __init__(self):
+        """初始化空狀態"""
+        self.version = "official"
+        self.build_attrs: Optional[Dict[str, str]] = None
+        self.player_stats: List[Tuple[str, str]] = []
+        self.sections: set = set()
+        self.top_level_tags: set = set()
+
+        # Tree
+        self.active_spec_id = 1
+        self.specs: List[SpecRecord] = []
+        # Spec 序號 -> 解碼結果（核心資訊與天賦配置共用同一次解碼）
+        self._decoded_specs: Dict[int, DecodedAllocation] = {}
+
+        # Skills
+        self.active_skill_set_id = "1"
+        self.skill_sets: List[SkillSetRecord] = []
+
+        # Items
+        self.active_item_set_id = "1"
+        self.item_texts: Dict[str, str] = {}
+        self.item_sets: List[ItemSetRecord] = []
+
+    # ===== 區段查詢 =====
+
+    def get_spec(self, spec_id: Optional[int] = None) -> Optional[SpecRecord]:
+        """
+        取得天賦樹 Spec
+
+        Args:
+            spec_id: Spec 序號（1 起算）；None 表示使用 activeSpec，找不到時退回第一個
+
+        Returns:
+            Spec 記錄，沒有任何 Spec 時為 None
+
+        Raises:
+            ValueError: 指定的 Spec 不存在
+        """
+        index = self._spec_index(spec_id)
+        return None if index is None else self.specs[index - 1]
+
+    def decode_spec(self, spec_id: Optional[int] = None) -> Optional[DecodedAllocation]:
+        """
+        取得 Spec 的天賦配置解碼結果（每個 Spec 只解碼一次）
+
+        Args:
+            spec_id: Spec 序號（1 起算）；None 表示使用 activeSpec
+
+        Returns:
+            解碼結果，沒有任何 Spec 時為 None
+
+        Raises:
+            ValueError: 指定的 Spec 不存在
+        """
+        index = self._spec_index(spec_id)
+        if index is None:
+            return None
+
+        decoded = self._decoded_specs.get(index)
+        if decoded is None:
+            spec_attrs, node_ids, tree_url = self.specs[index - 1]
+            decoded = decode_spec_allocation(spec_attrs, node_ids, tree_url)
+            self._decoded_specs[index] = decoded
+        return decoded
+
+    def _spec_index(self, spec_id: Optional[int]) -> Optional[int]:
+        """解析 Spec 序號（1 起算）"""
+        if spec_id is None:
+            if 1 <= self.active_spec_id <= len(self.specs):
+                return self.active_spec_id
+            return 1 if self.specs else None
+
+        if not 1 <= spec_id <= len(self.specs):
+            raise ValueError(f"找不到天賦樹 Spec {spec_id}")
+        return spec_id
+
+    def get_skill_set(self, skill_set_id: Optional[str] = None) -> Optional[SkillSetRecord]:
+        """
+        取得 SkillSet
+
+        Args:
+            skill_set_id: SkillSet ID；None 表示使用 activeSkillSet，找不到時退回第一個
+
+        Returns:
+            SkillSet 記錄，沒有任何 SkillSet 時為 None
+
+        Raises:
+            ValueError: 指定的 SkillSet 不存在
+        """
+        return self._find_set(self.skill_sets, skill_set_id, self.active_skill_set_id, "SkillSet")
+
+    def get_item_set(self, item_set_id: Optional[str] = None) -> Optional[ItemSetRecord]:
+        """
+        取得 ItemSet
+
+        Args:
+            item_set_id: ItemSet ID；None 表示使用 activeItemSet，找不到時退回第一個
+
+        Returns:
+            ItemSet 記錄，沒有任何 ItemSet 時為 None
+
+        Raises:
+            ValueError: 指定的 ItemSet 不存在
+        """
+        return self._find_set(self.item_sets, item_set_id, self.active_item_set_id, "ItemSet")
+
+    def _find_set(self, records: List[Tuple], set_id: Optional[str], active_id: str, kind: str):
+        """依 id 屬性查詢 SkillSet / ItemSet"""
+        lookup_id = active_id if set_id is None else str(set_id)
+        for record in records:
+            if record[0].get("id", "") == lookup_id:
+                return record
+
+        if set_id is not None:
+            raise ValueError(f"找不到 {kind} {set_id}")
+        return records[0] if records else None
+
+    def list_sets(self) -> Dict[str, List[Dict[str, Any]]]:
+        """
+        列出可取用的天賦樹 Spec、SkillSet 與 ItemSet
+
+        Returns:
+            各類別的 ID、標題與是否為目前啟用的設定
+        """
+        active_spec = self.get_spec()
+        active_skill_set = self.get_skill_set()
+        active_item_set = self.get_item_set()
+
+        return {
+            "tree_specs": [
+                {
+                    "id": index,
+                    "title": spec[0].get("title", f"Spec {index}"),
+                    "active": spec is active_spec
+                }
+                for index, spec in enumerate(self.specs, 1)
+            ],
+            "skill_sets": [
+                {
+                    "id": skill_set[0].get("id", ""),
+                    "title": skill_set[0].get("title", ""),
+                    "active": skill_set is active_skill_set
+                }
+                for skill_set in self.skill_sets
+            ],
+            "item_sets": [
+                {
+                    "id": item_set[0].get("id", ""),
+                    "title": item_set[0].get("title", ""),
+                    "active": item_set is active_item_set
+                }
+                for item_set in self.item_sets
+            ]
+        }
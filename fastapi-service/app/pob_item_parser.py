@@ -0,0 +1,251 @@
+"""
+PoB 物品文字解析器
+單次掃描 PoB 物品文字，填入 EquipmentItem 的所有欄位
+"""
+import re
+from functools import lru_cache
+from typing import Dict, List, Optional, Tuple
+import logging
+
+from app.character_models import (
+    EquipmentItem,
+    ItemModifier,
+    ItemRarity,
+    SocketColor,
+    SocketGroup
+)
+
+logger = logging.getLogger(__name__)
+
+
+# 物品文字快取容量（相同的傳奇與工藝基底在大量 Build 中重複出現）
+ITEM_PARSE_CACHE_SIZE = 4096
+
+# 影響力 / 特殊標記行 -> EquipmentItem 欄位
+_FLAG_LINES = {
+    "corrupted": "is_corrupted",
+    "mirrored": "is_mirrored",
+    "synthesised item": "is_synthesised",
+    "shaper item": "is_shaper",
+    "elder item": "is_elder",
+    "crusader item": "is_crusader",
+    "hunter item": "is_hunter",
+    "redeemer item": "is_redeemer",
+    "warlord item": "is_warlord",
+}
+
+# 插槽顏色（深淵插槽等非寶石插槽不列入）
+_SOCKET_COLORS = {
+    "R": SocketColor.RED,
+    "G": SocketColor.GREEN,
+    "B": SocketColor.BLUE,
+    "W": SocketColor.WHITE,
+}
+
+_DIGITS_PATTERN = re.compile(r"-?\d+")
+
+
+def parse_equipment_item(item_text: str, slot: str) -> EquipmentItem:
+    """
+    解析 PoB 物品文字為裝備資訊
+
+    解析結果依物品文字快取；每次返回深層複製，修改返回的物品不會影響
+    其他共用相同物品文字的 Build。
+
+    Args:
+        item_text: PoB 物品文字（Item 節點內容）
+        slot: 裝備部位
+
+    Returns:
+        裝備物品資訊
+    """
+    template = _parse_item_text(item_text)
+    return template.model_copy(update={"slot": slot}, deep=True)
+
+
+def item_parse_cache_info():
+    """取得物品文字快取統計"""
+    return _parse_item_text.cache_info()
+
+
+@lru_cache(maxsize=ITEM_PARSE_CACHE_SIZE)
+def _parse_item_text(item_text: str) -> EquipmentItem:
+    """
+    單次掃描物品文字（結果不含部位）
+
+    PoB 物品文字格式：
+      Rarity: RARE
+      <名稱>
+      <基底類型>          （僅 UNIQUE / RARE）
+      <標頭行>            （Item Level:、Quality:、Sockets:、影響力標記...）
+      Implicits: N
+      <N 行固有詞綴>
+      <明文詞綴>          （可帶 {crafted}、{fractured}、{enchant} 等前綴）
+      Corrupted / Mirrored
+    """
+    rarity = ItemRarity.NORMAL
+    item_level = 0
+    quality = 0
+    sockets: List[SocketGroup] = []
+    selected_variant: Optional[str] = None
+    flags: Dict[str, bool] = {}
+    mods: Dict[str, List[ItemModifier]] = {
+        "implicit_mods": [],
+        "explicit_mods": [],
+        "crafted_mods": [],
+        "fractured_mods": [],
+        "enchant_mods": [],
+    }
+
+    names: List[str] = []
+    implicits_remaining: Optional[int] = None
+
+    for raw_line in item_text.splitlines():
+        line = raw_line.strip()
+        if not line:
+            continue
+
+        lower = line.lower()
+
+        if lower.startswith("rarity:"):
+            rarity_str = line.split(":", 1)[1].strip().upper()
+            rarity = ItemRarity[rarity_str] if rarity_str in ItemRarity.__members__ else ItemRarity.NORMAL
+            continue
+
+        # 前兩個內容行為名稱 / 基底類型候選
+        if len(names) < 2 and implicits_remaining is None and (
+            not names or not _is_header_line(lower)
+        ):
+            names.append(line)
+            continue
+
+        flag_field = _FLAG_LINES.get(lower)
+        if flag_field:
+            flags[flag_field] = True
+            continue
+
+        if implicits_remaining is None:
+            # 標頭區
+            key, _, value = line.partition(":")
+            key = key.strip().lower()
+            if key == "item level":
+                item_level = _parse_int(value, item_level)
+            elif key == "quality":
+                quality = _parse_int(value, quality)
+            elif key == "sockets":
+                sockets = _parse_sockets(value)
+            elif key == "selected variant":
+                selected_variant = value.strip()
+            elif key == "implicits":
+                implicits_remaining = max(_parse_int(value, 0), 0)
+            continue
+
+        # 詞綴區
+        text, tokens, value_ranges = _parse_mod_line(line, selected_variant)
+        if text is None:
+            if implicits_remaining > 0:
+                implicits_remaining -= 1
+            continue
+
+        if implicits_remaining > 0:
+            implicits_remaining -= 1
+            bucket = "enchant_mods" if "enchant" in tokens else "implicit_mods"
+        elif "enchant" in tokens:
+            bucket = "enchant_mods"
+        elif "crafted" in tokens:
+            bucket = "crafted_mods"
+        elif "fractured" in tokens:
+            bucket = "fractured_mods"
+        else:
+            bucket = "explicit_mods"
+
+        mods[bucket].append(ItemModifier(
+            text=text,
+            mod_type=bucket[:-len("_mods")],
+            value_ranges=value_ranges
+        ))
+
+    # 名稱 = 第一個內容行；UNIQUE/RARE 的基底類型為第二行，其餘為名稱本身
+    name = names[0] if names else ""
+    if rarity in (ItemRarity.UNIQUE, ItemRarity.RARE) and len(names) > 1:
+        base_type = names[1]
+    else:
+        base_type = name
+
+    return EquipmentItem(
+        slot="",
+        name=name,
+        base_type=base_type,
+        rarity=rarity,
+        item_level=item_level,
+        quality=quality,
+        sockets=sockets,
+        **mods,
+        **flags
+    )
+
+
+def _is_header_line(lower: str) -> bool:
+    """判斷是否為標頭行（鍵值或特殊標記），用於區分基底類型行"""
+    return ":" in lower or lower in _FLAG_LINES
+
+
+def _parse_int(value: str, default: int) -> int:
+    """從標頭值中取出整數（支援 +20% 等格式）"""
+    match = _DIGITS_PATTERN.search(value)
+    return int(match.group()) if match else default
+
+
+def _parse_sockets(value: str) -> List[SocketGroup]:
+    """
+    解析插槽字串
+
+    例如 "B-B-B-B-B G" -> 兩組：5 連結藍色插槽與 1 個綠色插槽
+    """
+    groups = []
+    for group_text in value.split():
+        colors = [
+            _SOCKET_COLORS[c]
+            for c in group_text.upper().split("-")
+            if c in _SOCKET_COLORS
+        ]
+        if colors:
+            groups.append(SocketGroup(colors=colors, linked=len(colors) > 1))
+    return groups
+
+
+def _parse_mod_line(
+    line: str,
+    selected_variant: Optional[str]
+) -> Tuple[Optional[str], set, Optional[Dict[str, float]]]:
+    """
+    解析詞綴行的 {token} 前綴
+
+    Returns:
+        (詞綴文字, 前綴標記集合, 數值範圍)；不屬於目前變體的詞綴文字為 None
+    """
+    tokens = set()
+    value_ranges = None
+
+    while line.startswith("{"):
+        close = line.find("}")
+        if close < 0:
+            break
+        token = line[1:close]
+        line = line[close + 1:]
+
+        key, _, value = token.partition(":")
+        key = key.strip().lower()
+        tokens.add(key)
+
+        if key == "range":
+            try:
+                value_ranges = {"range": float(value)}
+            except ValueError:
+                pass
+        elif key == "variant" and selected_variant is not None:
+            if selected_variant not in [v.strip() for v in value.split(",")]:
+                return None, tokens, None
+
+    text = line.strip()
+    return (text or None), tokens, value_ranges
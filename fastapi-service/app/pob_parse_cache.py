@@ -0,0 +1,160 @@
+"""
+PoB 解析結果快取
+以正規化 PoB 內容的雜湊為鍵，快取已標準化的角色物件
+"""
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Dict, Any, Optional, Tuple
+import logging
+
+from app.character_models import StandardizedCharacter
+
+logger = logging.getLogger(__name__)
+
+
+# 預設快取容量上限（以解壓後 XML 位元組數估算）
+DEFAULT_MAX_CACHE_BYTES = 64 * 1024 * 1024
+
+# 正規化對照表：移除空白字元，並將 URL-safe 字母表統一為標準 base64
+POB_CODE_NORMALIZE_TABLE = str.maketrans("-_", "+/", " \t\r\n")
+
+
+def normalize_pob_code(pob_code: str) -> str:
+    """
+    正規化 PoB 代碼
+
+    移除空白與換行、統一 base64 字母表並去除結尾 padding，
+    讓同一份 Build 的不同貼上形式得到相同結果。
+
+    Args:
+        pob_code: 原始 PoB 代碼
+
+    Returns:
+        正規化後的代碼
+    """
+    return pob_code.translate(POB_CODE_NORMALIZE_TABLE).rstrip("=")
+
+
+def pob_cache_key(pob_code: str, lazy_load: bool = True) -> str:
+    """
+    計算 PoB 代碼的內容雜湊鍵
+
+    惰性與完整組裝的角色物件分開快取，要求完整組裝的呼叫端
+    不會拿到其他請求快取的惰性物件。
+
+    Args:
+        pob_code: 原始 PoB 代碼
+        lazy_load: 是否惰性載入
+
+    Returns:
+        正規化內容的 BLAKE2b 十六進位摘要（附加載入模式）
+    """
+    normalized = normalize_pob_code(pob_code)
+    digest = hashlib.blake2b(
+        normalized.encode("utf-8", errors="surrogatepass"),
+        digest_size=16
+    ).hexdigest()
+    return f"{digest}-{'lazy' if lazy_load else 'eager'}"
+
+
+class PobParseCache:
+    """
+    PoB 解析快取（依大小淘汰的 LRU）
+
+    每筆項目以解壓後 XML 大小作為成本估算，總成本超過上限時
+    從最久未使用的項目開始淘汰。快取中的角色物件會被多個請求共用，
+    呼叫端必須視為唯讀。
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_CACHE_BYTES):
+        """
+        初始化快取
+
+        Args:
+            max_bytes: 快取總成本上限（位元組）
+        """
+        self.max_bytes = max_bytes
+        self._entries: "OrderedDict[str, Tuple[StandardizedCharacter, int]]" = OrderedDict()
+        self._current_bytes = 0
+        self._lock = threading.Lock()
+
+        # 統計計數
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[StandardizedCharacter]:
+        """
+        查詢快取
+
+        Args:
+            key: 內容雜湊鍵
+
+        Returns:
+            快取的角色物件，未命中時為 None
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self.misses += 1
+                return None
+
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return entry[0]
+
+    def put(self, key: str, character: StandardizedCharacter, size: int):
+        """
+        寫入快取
+
+        Args:
+            key: 內容雜湊鍵
+            character: 標準化角色物件
+            size: 成本估算（位元組）
+        """
+        size = max(int(size), 1)
+        if size > self.max_bytes:
+            logger.info(f"解析結果過大（{size} bytes），不寫入快取")
+            return
+
+        with self._lock:
+            previous = self._entries.pop(key, None)
+            if previous is not None:
+                self._current_bytes -= previous[1]
+
+            self._entries[key] = (character, size)
+            self._current_bytes += size
+
+            # 依 LRU 順序淘汰直到低於上限
+            while self._current_bytes > self.max_bytes and self._entries:
+                _, (_, evicted_size) = self._entries.popitem(last=False)
+                self._current_bytes -= evicted_size
+                self.evictions += 1
+
+    def clear(self):
+        """清空快取與統計"""
+        with self._lock:
+            self._entries.clear()
+            self._current_bytes = 0
+            self.hits = 0
+            self.misses = 0
+            self.evictions = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """取得快取統計資訊"""
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "current_bytes": self._current_bytes,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": self.hits / lookups if lookups else 0.0
+            }
+
+
+# 全域單例
+pob_parse_cache = PobParseCache()
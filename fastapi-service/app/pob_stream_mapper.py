@@ -0,0 +1,301 @@
+"""
+PoB XML 串流映射器
+以單次前向事件流建立標準化角色資料，不建立 ElementTree，
+大型 Build 也能維持平坦的記憶體用量
+"""
+import xml.etree.ElementTree as ET
+from typing import Dict, List, Optional, Iterable, Union, IO
+import logging
+
+from app.character_models import StandardizedCharacter
+from app.pob_build_state import PobBuildState, SkillRecord
+from app.pob_xml_mapper import (
+    PobXmlMapper,
+    get_pob_mapper,
+    detect_pob_version_from_sections
+)
+
+logger = logging.getLogger(__name__)
+
+
+# 檔案串流讀取區塊大小
+_READ_CHUNK_SIZE = 64 * 1024
+
+
+class StreamingPobXmlMapper(PobXmlMapper):
+    """
+    單次掃描的 PoB XML 映射器
+
+    與 PobXmlMapper 產出相同的 StandardizedCharacter，但不建立完整的
+    ElementTree：以 XMLParser 的 target 回呼（iterparse 底層的同一組事件）
+    在一次前向掃描中填入 PobBuildState，元素不會被具現化，只保留組裝所需的
+    屬性與文字；各區段由 PobXmlMapper 的同一組組裝邏輯（可惰性）建立。
+    """
+
+    def __init__(self):
+        """初始化映射器"""
+        super().__init__()
+        self._reset_stream_state()
+
+    def _reset_stream_state(self):
+        """重設單次解析的串流狀態"""
+        self._depth = 0
+        self._section: Optional[str] = None
+        self._text_parts: Optional[List[str]] = None
+        self._state = PobBuildState()
+
+        # Skills
+        self._current_skills: Optional[List[SkillRecord]] = None
+        self._current_gems: Optional[List[Dict[str, str]]] = None
+
+        # Tree
+        self._current_node_ids: Optional[List[int]] = None
+        self._current_spec_attrs: Optional[Dict[str, str]] = None
+        self._current_url: Optional[str] = None
+        self._url_seen = False
+
+        # Items
+        self._current_item_id: Optional[str] = None
+        self._current_slots: Optional[Dict[str, str]] = None
+        self._current_item_set_attrs: Optional[Dict[str, str]] = None
+
+    # ===== 公開介面 =====
+
+    def extract_from_bytes(
+        self,
+        xml_bytes: bytes,
+        lazy_load: bool = True
+    ) -> StandardizedCharacter:
+        """
+        從完整的 XML 位元組提取標準化角色資料
+
+        Args:
+            xml_bytes: PoB XML 位元組
+            lazy_load: 是否使用惰性載入
+
+        Returns:
+            標準化角色物件
+        """
+        return self.extract_from_chunks((xml_bytes,), lazy_load)
+
+    def extract_from_chunks(
+        self,
+        chunks: Iterable[bytes],
+        lazy_load: bool = True
+    ) -> StandardizedCharacter:
+        """
+        從逐段送入的 XML 位元組提取標準化角色資料
+
+        Args:
+            chunks: XML 位元組片段（例如解壓縮串流）
+            lazy_load: 是否使用惰性載入
+
+        Returns:
+            標準化角色物件
+
+        Raises:
+            ET.ParseError: XML 格式錯誤
+            ValueError: 缺少必要節點
+        """
+        state = self.collect_state_from_chunks(chunks)
+
+        # 依頂層節點檢測的版本交給已註冊的映射器組裝
+        mapper = get_pob_mapper(state.version)
+        self.version_detected = state.version
+        return mapper.character_from_state(state, lazy_load)
+
+    def extract_from_file(
+        self,
+        source: Union[str, IO[bytes]],
+        lazy_load: bool = True
+    ) -> StandardizedCharacter:
+        """
+        從檔案路徑或二進位檔案物件串流提取標準化角色資料
+
+        Args:
+            source: 檔案路徑或二進位檔案物件
+            lazy_load: 是否使用惰性載入
+
+        Returns:
+            標準化角色物件
+        """
+        if isinstance(source, str):
+            with open(source, "rb") as f:
+                return self.extract_from_file(f, lazy_load)
+
+        return self.extract_from_chunks(
+            iter(lambda: source.read(_READ_CHUNK_SIZE), b""),
+            lazy_load
+        )
+
+    def collect_state_from_chunks(self, chunks: Iterable[bytes]) -> PobBuildState:
+        """
+        單次掃描 XML 位元組片段，只收集解析狀態
+
+        Args:
+            chunks: XML 位元組片段
+
+        Returns:
+            解析狀態
+        """
+        self._reset_stream_state()
+        parser = ET.XMLParser(target=self)
+
+        for chunk in chunks:
+            parser.feed(chunk)
+        parser.close()
+
+        state = self._state
+        state.version = detect_pob_version_from_sections(state.top_level_tags)
+        return state
+
+    # ===== XMLParser target 回呼 =====
+
+    def start(self, tag: str, attrib: Dict[str, str]):
+        """元素開始事件"""
+        depth = self._depth
+        self._depth = depth + 1
+        section = self._section
+
+        if depth == 1:
+            self._start_section(tag, attrib)
+        elif section is None:
+            return
+        elif section == "Build":
+            if depth == 2 and tag == "PlayerStat":
+                self._state.player_stats.append(
+                    (attrib.get("stat", ""), attrib.get("value", ""))
+                )
+        elif section == "Skills":
+            if depth == 2:
+                if tag == "SkillSet":
+                    self._current_skills = []
+                    self._state.skill_sets.append((attrib, self._current_skills))
+            elif depth == 3 and tag == "Skill" and self._current_skills is not None:
+                self._current_gems = []
+                self._current_skills.append((attrib, self._current_gems))
+            elif depth == 4 and tag == "Gem" and self._current_gems is not None:
+                self._current_gems.append(attrib)
+        elif section == "Tree":
+            if depth == 2 and tag == "Spec":
+                self._current_spec_attrs = attrib
+                self._current_node_ids = []
+                self._current_url = None
+                self._url_seen = False
+            elif depth == 3 and self._current_node_ids is not None:
+                # 有 nodes 屬性時由解碼器一次解析，不再逐一收集 Node
+                if tag == "Node" and "nodes" not in self._current_spec_attrs:
+                    self._current_node_ids.append(int(attrib.get("nodeId", 0)))
+                elif tag == "URL" and not self._url_seen:
+                    self._text_parts = []
+        elif section == "Items":
+            if depth == 2:
+                if tag == "Item":
+                    self._current_item_id = attrib.get("id", "")
+                    self._text_parts = []
+                elif tag == "ItemSet":
+                    self._current_item_set_attrs = attrib
+                    self._current_slots = {}
+            elif depth == 3:
+                if self._current_item_id is not None:
+                    # 與 Element.text 相同：僅取第一個子元素（如 ModRange）之前的文字
+                    self._store_item_text()
+                elif tag == "Slot" and self._current_slots is not None:
+                    slot_name = attrib.get("name")
+                    if slot_name and slot_name not in self._current_slots:
+                        self._current_slots[slot_name] = attrib.get("itemId", "")
+
+    def data(self, text: str):
+        """文字內容事件（僅在擷取 Item / URL 文字時記錄）"""
+        if self._text_parts is not None:
+            self._text_parts.append(text)
+
+    def end(self, tag: str):
+        """元素結束事件"""
+        depth = self._depth - 1
+        self._depth = depth
+        section = self._section
+
+        if section is None:
+            return
+
+        if depth == 1:
+            self._section = None
+        elif section == "Skills":
+            if depth == 3:
+                self._current_gems = None
+            elif depth == 2:
+                self._current_skills = None
+        elif section == "Tree":
+            if depth == 3 and self._text_parts is not None:
+                self._url_seen = True
+                self._current_url = "".join(self._text_parts) or None
+                self._text_parts = None
+            elif depth == 2 and tag == "Spec":
+                self._state.specs.append(
+                    (self._current_spec_attrs, self._current_node_ids, self._current_url)
+                )
+                self._current_spec_attrs = None
+                self._current_node_ids = None
+        elif section == "Items" and depth == 2:
+            if tag == "Item":
+                if self._current_item_id is not None:
+                    self._store_item_text()
+            elif tag == "ItemSet":
+                self._state.item_sets.append(
+                    (self._current_item_set_attrs, self._current_slots)
+                )
+                self._current_item_set_attrs = None
+                self._current_slots = None
+
+    def close(self):
+        """解析結束回呼"""
+        return None
+
+    def _store_item_text(self):
+        """保存目前 Item 的物品文字並停止擷取"""
+        if self._current_item_id:
+            self._state.item_texts[self._current_item_id] = "".join(self._text_parts)
+        self._current_item_id = None
+        self._text_parts = None
+
+    def _start_section(self, tag: str, attrib: Dict[str, str]):
+        """頂層區段開始（每種區段僅處理第一次出現）"""
+        state = self._state
+        state.top_level_tags.add(tag)
+        if tag in state.sections or (tag == "Build" and state.build_attrs is not None):
+            return
+
+        if tag == "Build":
+            state.build_attrs = attrib
+            self._section = tag
+        elif tag == "Tree":
+            state.sections.add(tag)
+            state.active_spec_id = int(attrib.get("activeSpec", 1))
+            self._section = tag
+        elif tag == "Skills":
+            state.sections.add(tag)
+            state.active_skill_set_id = attrib.get("activeSkillSet", "1")
+            self._section = tag
+        elif tag == "Items":
+            state.sections.add(tag)
+            state.active_item_set_id = attrib.get("activeItemSet", "1")
+            self._section = tag
+
+
+# 導出便捷函數
+def parse_pob_bytes_to_standard_character(
+    pob_xml: bytes,
+    lazy_load: bool = True
+) -> StandardizedCharacter:
+    """
+    以串流映射器將 PoB XML 位元組轉換為標準化角色物件
+
+    Args:
+        pob_xml: PoB XML 位元組
+        lazy_load: 是否使用惰性載入
+
+    Returns:
+        標準化角色物件
+    """
+    return StreamingPobXmlMapper().extract_from_bytes(pob_xml, lazy_load)
@@ -3,12 +3,13 @@ PoB XML 結構化提取器
 將 PoB 的 XML 結構轉換為標準化內部格式
 """
 import xml.etree.ElementTree as ET
-from typing import Dict, List, Optional, Any, Tuple
+from typing import Dict, List, Optional, Any, Tuple, Type, FrozenSet, Iterable
 import logging
 from datetime import datetime
 
 from app.character_models import (
     StandardizedCharacter,
+    LazyStandardizedCharacter,
     CharacterCore,
     PassiveAllocation,
     SkillSetup,
@@ -16,21 +17,33 @@ from app.character_models import (
     SkillGroup,
     GemInfo,
     EquipmentItem,
-    ItemModifier,
-    SocketGroup,
     JewelSocketInfo,
     AscendancyStatus,
-    GemQualityType,
-    ItemRarity,
-    SocketColor
+    GemQualityType
 )
-from app.gem_service import get_gem_service
+from app.gem_service import get_gem_registry
+from app.pob_item_parser import parse_equipment_item
+from app.pob_build_state import PobBuildState
+from app.player_stats import build_player_stat_vector
+from app.passive_tree_classes import NodeClassIndex, get_node_class_index
+from app.passive_tree_codec import DecodedAllocation, CLUSTER_NODE_OFFSET
 
 logger = logging.getLogger(__name__)
 
 
 class PobXmlMapper:
-    """PoB XML 節點映射器"""
+    """
+    PoB XML 節點映射器（官方版本，同時作為其他變體的基底）
+    
+    各 PoB 變體以 register_pob_mapper 註冊子類別，並以 DETECTION_SECTIONS
+    宣告識別用的頂層節點。
+    """
+    
+    # 變體名稱（由 register_pob_mapper 設定）
+    VERSION = "official"
+    
+    # 識別此變體所需的頂層節點（全部存在才視為此變體；空集合表示預設變體）
+    DETECTION_SECTIONS: FrozenSet[str] = frozenset()
     
     # 支援的 PoB 版本
     SUPPORTED_VERSIONS = {
@@ -38,6 +51,33 @@ class PobXmlMapper:
         "community": "2.0"  # 社群 Fork 版本
     }
     
+    # 裝備部位映射（PoB Slot 名稱 -> EquipmentSnapshot 欄位）
+    SLOT_MAPPING = {
+        "Weapon 1": "weapon_main_hand",
+        "Weapon 2": "weapon_off_hand",
+        "Helmet": "helmet",
+        "Body Armour": "body_armour",
+        "Gloves": "gloves",
+        "Boots": "boots",
+        "Amulet": "amulet",
+        "Ring 1": "ring_1",
+        "Ring 2": "ring_2",
+        "Belt": "belt",
+        "Flask 1": "flask_1",
+        "Flask 2": "flask_2",
+        "Flask 3": "flask_3",
+        "Flask 4": "flask_4",
+        "Flask 5": "flask_5"
+    }
+    
+    # 品質類型映射（PoB qualityId -> GemQualityType）
+    QUALITY_TYPE_MAPPING = {
+        "Default": GemQualityType.DEFAULT,
+        "Anomalous": GemQualityType.ANOMALOUS,
+        "Divergent": GemQualityType.DIVERGENT,
+        "Phantasmal": GemQualityType.PHANTASMAL
+    }
+    
     def __init__(self):
         """初始化映射器"""
         self.version_detected = None
@@ -45,68 +85,155 @@ class PobXmlMapper:
     
     def detect_pob_version(self, root: ET.Element) -> str:
         """
-        檢測 PoB 版本
+        檢測 PoB 版本（只讀取根節點的直接子節點，不做全文件掃描）
         
         Args:
             root: XML 根節點
             
         Returns:
-            版本類型: 'official' 或 'community'
+            版本類型: 'official' 或 'community'（或其他已註冊的變體）
         """
-        # 檢查是否存在社群版本特有的節點
-        calcs = root.find(".//Calcs")
-        if calcs is not None:
-            logger.info("檢測到社群 Fork 版本（存在 Calcs 節點）")
-            return "community"
-        
-        # 預設為官方版本
-        logger.info("檢測為官方版本")
-        return "official"
+        return detect_pob_version_from_sections({child.tag for child in root})
     
     def extract_standardized_character(
         self,
         root: ET.Element,
         lazy_load: bool = True
-    ) -> StandardizedCharacter:
+    ) -> LazyStandardizedCharacter:
         """
         從 XML 提取標準化角色資料
         
+        依檢測到的版本選用已註冊的映射器處理。
+        
         Args:
             root: XML 根節點
-            lazy_load: 是否使用惰性載入（優先載入核心資料）
+            lazy_load: 是否使用惰性載入（天賦、技能、裝備於首次存取時才組裝）
             
         Returns:
             標準化角色物件
         """
-        # 檢測版本
-        self.version_detected = self.detect_pob_version(root)
+        version = self.detect_pob_version(root)
+        self.version_detected = version
+        mapper = get_pob_mapper(version)
+        return mapper.character_from_state(mapper.collect_build_state(root, version), lazy_load)
+    
+    def collect_build_state(
+        self,
+        root: ET.Element,
+        version: Optional[str] = None
+    ) -> PobBuildState:
+        """
+        掃描 XML 並保留組裝所需的原始資料
         
-        # 提取核心資料（第一優先級）
-        character_core = self._extract_character_core(root)
+        Args:
+            root: XML 根節點
+            version: 已檢測的版本（None 時重新檢測）
+            
+        Returns:
+            解析狀態
+        """
+        state = PobBuildState()
+        state.version = version or self.detect_pob_version(root)
         
-        if lazy_load:
-            logger.info("使用惰性載入模式，優先載入核心資料")
+        build_elem = root.find("Build")
+        if build_elem is None:
+            raise ValueError("找不到 Build 節點，PoB 資料可能損壞")
+        state.build_attrs = build_elem.attrib
+        state.player_stats = [
+            (stat_elem.get("stat", ""), stat_elem.get("value", ""))
+            for stat_elem in build_elem.findall("PlayerStat")
+        ]
         
-        # 提取天賦樹（第一優先級）
-        passive_allocation = self._extract_passive_allocation(root)
+        # 天賦樹（保留所有 Spec）
+        tree_elem = root.find("Tree")
+        if tree_elem is not None:
+            state.sections.add("Tree")
+            state.active_spec_id = int(tree_elem.get("activeSpec", 1))
+            for spec_elem in tree_elem.findall("Spec"):
+                url_elem = spec_elem.find("URL")
+                # 有 nodes 屬性時由解碼器一次解析，不再逐一收集 Node
+                if "nodes" in spec_elem.attrib:
+                    node_ids = []
+                else:
+                    node_ids = [int(node_elem.get("nodeId", 0)) for node_elem in spec_elem.findall("Node")]
+                state.specs.append((
+                    spec_elem.attrib,
+                    node_ids,
+                    url_elem.text if url_elem is not None else None
+                ))
+        
+        # 技能（保留所有 SkillSet）
+        skills_elem = root.find("Skills")
+        if skills_elem is not None:
+            state.sections.add("Skills")
+            state.active_skill_set_id = skills_elem.get("activeSkillSet", "1")
+            for skill_set in skills_elem.findall("SkillSet"):
+                state.skill_sets.append((
+                    skill_set.attrib,
+                    [
+                        (skill.attrib, [gem_elem.attrib for gem_elem in skill.findall("Gem")])
+                        for skill in skill_set.findall("Skill")
+                    ]
+                ))
+        
+        # 裝備（保留所有 ItemSet）
+        # PoB XML 結構：<Item id="N"> 與 <ItemSet> 是兄弟節點
+        # <Slot> 用 itemId 屬性引用 <Item>，不是嵌套關係
+        items_elem = root.find("Items")
+        if items_elem is not None:
+            state.sections.add("Items")
+            state.active_item_set_id = items_elem.get("activeItemSet", "1")
+            for item_elem in items_elem.findall("Item"):
+                item_id = item_elem.get("id", "")
+                if item_id:
+                    state.item_texts[item_id] = item_elem.text if item_elem.text else ""
+            for item_set in items_elem.findall("ItemSet"):
+                slots = {}
+                for slot_elem in item_set.findall("Slot"):
+                    slot_name = slot_elem.get("name")
+                    if slot_name and slot_name not in slots:
+                        slots[slot_name] = slot_elem.get("itemId", "")
+                state.item_sets.append((item_set.attrib, slots))
+        
+        return state
+    
+    def character_from_state(
+        self,
+        state: PobBuildState,
+        lazy_load: bool = True
+    ) -> LazyStandardizedCharacter:
+        """
+        由解析狀態建立標準化角色物件
         
-        # 提取技能配置（第一優先級）
-        skill_setup = self._extract_skill_setup(root)
+        核心資訊立即建立；其餘區段在 lazy_load 時延後到首次存取才組裝。
         
-        # 提取裝備（第二優先級）
-        equipment_snapshot = self._extract_equipment_snapshot(root)
+        Args:
+            state: 解析狀態
+            lazy_load: 是否使用惰性載入
+            
+        Returns:
+            標準化角色物件
+        """
+        self.version_detected = state.version
         
-        # 組裝標準化物件
-        character = StandardizedCharacter(
-            character_core=character_core,
-            passive_allocation=passive_allocation,
-            skill_setup=skill_setup,
-            equipment_snapshot=equipment_snapshot,
+        # 提取核心資料（第一優先級）
+        character_core = self._character_core_from_state(state)
+        
+        character = LazyStandardizedCharacter.from_state(
+            self,
+            state,
+            character_core,
+            player_stats=build_player_stat_vector(state.player_stats),
             source="pob_import",
-            pob_version=self.version_detected,
+            pob_version=state.version,
             import_timestamp=datetime.utcnow().isoformat()
         )
         
+        if lazy_load:
+            logger.info("使用惰性載入模式，天賦、技能與裝備於首次存取時組裝")
+        else:
+            character.materialize()
+        
         logger.info(
             f"成功提取角色資料: {character_core.character_class} "
             f"Lv{character_core.level}"
@@ -114,24 +241,68 @@ class PobXmlMapper:
         
         return character
     
-    def _extract_character_core(self, root: ET.Element) -> CharacterCore:
-        """提取角色核心資訊"""
-        build_elem = root.find("Build")
+    def build_section(
+        self,
+        state: PobBuildState,
+        section: str,
+        set_id: Any = None
+    ) -> Any:
+        """
+        組裝角色的單一區段
         
-        if not build_elem:
+        Args:
+            state: 解析狀態
+            section: passive_allocation / skill_setup / equipment_snapshot
+            set_id: Spec 序號、SkillSet ID 或 ItemSet ID；None 為啟用中的設定
+            
+        Returns:
+            組裝完成的區段模型
+        """
+        if section == "passive_allocation":
+            return self._passive_allocation_from_state(state, set_id)
+        if section == "skill_setup":
+            return self._skill_setup_from_state(state, set_id)
+        if section == "equipment_snapshot":
+            return self._equipment_snapshot_from_state(state, set_id)
+        raise ValueError(f"未知的角色區段: {section}")
+    
+    def _character_core_from_state(self, state: PobBuildState) -> CharacterCore:
+        """提取角色核心資訊"""
+        if state.build_attrs is None:
             raise ValueError("找不到 Build 節點，PoB 資料可能損壞")
         
-        # 基礎資訊
-        level = int(build_elem.get("level", 1))
-        character_class = build_elem.get("className", "Unknown")
-        ascendancy = build_elem.get("ascendClassName", None)
-        league = build_elem.get("league", "Standard")
-        
-        # 計算昇華狀態
-        ascendancy_status, ascendancy_points = self._calculate_ascendancy_status(
-            root,
-            ascendancy
+        # 計算昇華狀態（依啟用中的 Spec）
+        ascendancy = state.build_attrs.get("ascendClassName", None)
+        if not ascendancy:
+            ascendancy_status, ascendancy_points = AscendancyStatus.NONE, 0
+        else:
+            decoded = state.decode_spec()
+            if decoded is None:
+                ascendancy_status, ascendancy_points = AscendancyStatus.PARTIAL, 0
+            else:
+                ascendancy_status, ascendancy_points = self._ascendancy_status_from_nodes(
+                    decoded.nodes,
+                    self._class_index(state)
+                )
+        
+        return self._build_character_core(
+            state.build_attrs,
+            ascendancy_status,
+            ascendancy_points
         )
+    
+    def _build_character_core(
+        self,
+        build_attrs: Dict[str, str],
+        ascendancy_status: AscendancyStatus,
+        ascendancy_points: int
+    ) -> CharacterCore:
+        """由 Build 節點屬性組裝角色核心資訊"""
+        # 基礎資訊
+        level = int(build_attrs.get("level", 1))
+        character_class = build_attrs.get("className", "Unknown")
+        ascendancy = build_attrs.get("ascendClassName", None)
+        league = build_attrs.get("league", "Standard")
         
         return CharacterCore(
             level=level,
@@ -142,37 +313,30 @@ class PobXmlMapper:
             league=league
         )
     
-    def _calculate_ascendancy_status(
+    def _class_index(
         self,
-        root: ET.Element,
-        ascendancy_name: Optional[str]
+        state: PobBuildState,
+        spec_id: Optional[int] = None
+    ) -> Optional[NodeClassIndex]:
+        """取得 Spec 天賦樹版本（treeVersion）對應的節點分類索引"""
+        spec = state.get_spec(spec_id)
+        tree_version = spec[0].get("treeVersion") if spec else None
+        class_index = get_node_class_index(tree_version)
+        if class_index is None:
+            logger.warning("找不到天賦樹資料，無法分類天賦節點")
+        return class_index
+    
+    def _ascendancy_status_from_nodes(
+        self,
+        node_ids: Iterable[int],
+        class_index: Optional[NodeClassIndex]
     ) -> Tuple[AscendancyStatus, int]:
-        """
-        計算昇華完成度
-        
-        Returns:
-            (昇華狀態, 已配置點數)
-        """
-        if not ascendancy_name:
-            return AscendancyStatus.NONE, 0
-        
-        # 從天賦樹中計算昇華點數
-        tree_elem = root.find("Tree")
-        if not tree_elem:
-            return AscendancyStatus.PARTIAL, 0
-        
-        spec_elem = tree_elem.find("Spec")
-        if not spec_elem:
-            return AscendancyStatus.PARTIAL, 0
-        
-        # 統計昇華節點
-        ascendancy_nodes = 0
-        for node_elem in spec_elem.findall("Node"):
-            node_id = int(node_elem.get("nodeId", 0))
-            # 昇華節點 ID 通常在特定範圍內（需要根據實際資料調整）
-            # 這裡使用簡化邏輯，實際應查詢天賦樹資料庫
-            if self._is_ascendancy_node(node_id):
-                ascendancy_nodes += 1
+        """由已配置節點統計昇華完成度"""
+        # 統計昇華節點（依天賦樹資料的 ascendancyName）
+        if class_index is not None:
+            ascendancy_nodes = sum(1 for node_id in node_ids if class_index.is_ascendancy(node_id))
+        else:
+            ascendancy_nodes = sum(1 for node_id in node_ids if self._is_ascendancy_node(node_id))
         
         # 判斷完成度
         if ascendancy_nodes == 0:
@@ -186,112 +350,156 @@ class PobXmlMapper:
     
     def _is_ascendancy_node(self, node_id: int) -> bool:
         """
-        判斷是否為昇華節點
-        （簡化實作，實際應查詢天賦樹資料庫）
+        判斷是否為昇華節點（沒有天賦樹資料時的退路）
         """
-        # 昇華節點通常在 60000+ 範圍
-        return node_id >= 60000
+        # 昇華節點通常在 60000+ 範圍（星團珠寶節點另有偏移，不列入）
+        return 60000 <= node_id < CLUSTER_NODE_OFFSET
     
-    def _extract_passive_allocation(self, root: ET.Element) -> PassiveAllocation:
+    def _passive_allocation_from_state(
+        self,
+        state: PobBuildState,
+        spec_id: Optional[int] = None
+    ) -> PassiveAllocation:
         """提取天賦樹配置"""
-        tree_elem = root.find("Tree")
-        
-        if not tree_elem:
+        if "Tree" not in state.sections:
             logger.warning("找不到 Tree 節點，返回空天賦配置")
             return PassiveAllocation()
         
-        spec_elem = tree_elem.find("Spec")
-        if not spec_elem:
+        spec = state.get_spec(spec_id)
+        if spec is None:
             logger.warning("找不到 Spec 節點，返回空天賦配置")
             return PassiveAllocation()
         
-        # 提取已配置節點
-        allocated_nodes = []
-        for node_elem in spec_elem.findall("Node"):
-            node_id = int(node_elem.get("nodeId", 0))
-            if node_id > 0:
-                allocated_nodes.append(node_id)
-        
-        # 提取天賦樹 URL
-        url_elem = spec_elem.find("URL")
-        tree_url = url_elem.text if url_elem is not None else None
-        
-        # 職業起始節點
-        class_start = spec_elem.get("classId", None)
-        class_start_node = int(class_start) if class_start else None
+        return self._build_passive_allocation(
+            state.decode_spec(spec_id),
+            spec[2],
+            self._class_index(state, spec_id)
+        )
+    
+    def _build_passive_allocation(
+        self,
+        decoded: DecodedAllocation,
+        tree_url: Optional[str],
+        class_index: Optional[NodeClassIndex] = None
+    ) -> PassiveAllocation:
+        """由 Spec 解碼結果組裝天賦樹配置"""
+        # 已配置節點（nodes 屬性、Node 子節點或 URL 其中之一）
+        allocated_nodes = decoded.nodes.tolist()
+        
+        # 一次走訪分類所有已配置節點
+        keystone_nodes: List[int] = []
+        notable_nodes: List[int] = []
+        jewel_sockets: List[JewelSocketInfo] = []
+        cluster_jewel_sockets: List[JewelSocketInfo] = []
+        if class_index is not None:
+            classified = class_index.classify(allocated_nodes)
+            keystone_nodes = classified.keystones
+            notable_nodes = classified.notables
+            for node_id, socket_type in classified.jewel_sockets:
+                socket = JewelSocketInfo(
+                    node_id=node_id,
+                    socket_type=socket_type,
+                    is_allocated=True
+                )
+                if socket_type == "regular":
+                    jewel_sockets.append(socket)
+                else:
+                    cluster_jewel_sockets.append(socket)
         
-        # 這裡需要整合天賦樹服務來分類節點
-        # 暫時返回基礎資料
         return PassiveAllocation(
             allocated_nodes=allocated_nodes,
             total_points_used=len(allocated_nodes),
+            keystone_nodes=keystone_nodes,
+            notable_nodes=notable_nodes,
+            jewel_sockets=jewel_sockets,
+            cluster_jewel_sockets=cluster_jewel_sockets,
             tree_url=tree_url,
-            class_start_node=class_start_node
+            class_start_node=decoded.class_id,
+            ascendancy_class_id=decoded.ascendancy_id,
+            mastery_effects=decoded.mastery_effects
         )
     
-    def _extract_skill_setup(self, root: ET.Element) -> SkillSetup:
+    def _skill_setup_from_state(
+        self,
+        state: PobBuildState,
+        skill_set_id: Optional[str] = None
+    ) -> SkillSetup:
         """提取技能配置"""
-        skills_elem = root.find("Skills")
-        
-        if not skills_elem:
+        if "Skills" not in state.sections:
             logger.warning("找不到 Skills 節點，返回空技能配置")
             return SkillSetup()
         
+        skill_set = state.get_skill_set(skill_set_id)
+        if skill_set is None:
+            return SkillSetup()
+        
         skill_groups = []
+        for skill_attrs, gem_attrs in skill_set[1]:
+            # 提取寶石
+            gems = [self._extract_gem_info(attrs) for attrs in gem_attrs]
+            skill_groups.append(
+                self._build_skill_group(skill_attrs, gems, len(skill_groups) + 1)
+            )
+        
+        # 主技能組 ID 只對應啟用中的 SkillSet，其他設定自動識別
+        if skill_set is state.get_skill_set():
+            main_socket_group = int(state.build_attrs.get("mainSocketGroup", 1))
+        else:
+            main_socket_group = 0
+        
+        return self._build_skill_setup(skill_groups, main_socket_group)
+    
+    def _build_skill_group(
+        self,
+        skill_attrs: Dict[str, str],
+        gems: List[GemInfo],
+        group_id: int
+    ) -> SkillGroup:
+        """由 Skill 屬性與寶石列表組裝技能組"""
+        enabled = skill_attrs.get("enabled", "true") == "true"
+        label = skill_attrs.get("label", f"Group {group_id}")
+        slot = skill_attrs.get("slot", "Unknown")
+        
+        # 計算連結數
+        link_count = len([g for g in gems if g.enabled])
+        
+        # 識別主動技能
+        main_skill = None
+        support_gems = []
+        
+        for gem in gems:
+            if not gem.enabled:
+                continue
+            
+            if gem.is_support:
+                support_gems.append(gem.name)
+            else:
+                main_skill = gem.name
+        
+        # 建立技能組
+        return SkillGroup(
+            label=label,
+            slot=slot,
+            enabled=enabled,
+            gems=gems,
+            link_count=link_count,
+            main_skill=main_skill,
+            support_gems=support_gems
+        )
+    
+    def _build_skill_setup(
+        self,
+        skill_groups: List[SkillGroup],
+        main_socket_group: int
+    ) -> SkillSetup:
+        """組裝技能配置並識別主技能組"""
         main_skill_group = None
         
-        # 獲取主技能組 ID
-        build_elem = root.find("Build")
-        main_socket_group = int(build_elem.get("mainSocketGroup", 1)) if build_elem else 1
-        
-        current_group_id = 1
-        
-        for skill_set in skills_elem.findall("SkillSet"):
-            for skill in skill_set.findall("Skill"):
-                enabled = skill.get("enabled", "true") == "true"
-                label = skill.get("label", f"Group {current_group_id}")
-                slot = skill.get("slot", "Unknown")
-                
-                # 提取寶石
-                gems = []
-                for gem_elem in skill.findall("Gem"):
-                    gem_info = self._extract_gem_info(gem_elem)
-                    gems.append(gem_info)
-                
-                # 計算連結數
-                link_count = len([g for g in gems if g.enabled])
-                
-                # 識別主動技能
-                main_skill = None
-                support_gems = []
-                
-                for gem in gems:
-                    if not gem.enabled:
-                        continue
-                    
-                    if gem.is_support:
-                        support_gems.append(gem.name)
-                    else:
-                        main_skill = gem.name
-                
-                # 建立技能組
-                skill_group = SkillGroup(
-                    label=label,
-                    slot=slot,
-                    enabled=enabled,
-                    gems=gems,
-                    link_count=link_count,
-                    main_skill=main_skill,
-                    support_gems=support_gems
-                )
-                
-                skill_groups.append(skill_group)
-                
-                # 判斷是否為主技能組
-                if current_group_id == main_socket_group and enabled:
-                    main_skill_group = skill_group
-                
-                current_group_id += 1
+        # 判斷是否為主技能組（mainSocketGroup 為 1 起算的技能組序號）
+        if 1 <= main_socket_group <= len(skill_groups):
+            candidate = skill_groups[main_socket_group - 1]
+            if candidate.enabled:
+                main_skill_group = candidate
         
         # 自動識別主技能組（如果未明確指定）
         if not main_skill_group and skill_groups:
@@ -307,23 +515,21 @@ class PobXmlMapper:
             main_skill_group=main_skill_group
         )
     
-    def _extract_gem_info(self, gem_elem: ET.Element) -> GemInfo:
-        """提取單個寶石資訊"""
-        name = gem_elem.get("nameSpec", "Unknown")
-        level = int(gem_elem.get("level", 1))
-        quality = int(gem_elem.get("quality", 0))
-        enabled = gem_elem.get("enabled", "true") == "true"
+    def _extract_gem_info(self, gem_attrs: Dict[str, str]) -> GemInfo:
+        """提取單個寶石資訊（Gem 節點屬性）"""
+        name = gem_attrs.get("nameSpec", "Unknown")
+        level = int(gem_attrs.get("level", 1))
+        quality = int(gem_attrs.get("quality", 0))
+        enabled = gem_attrs.get("enabled", "true") == "true"
 
         # 提取 gemId（PoB 內部識別碼）
-        gem_id = gem_elem.get("gemId", "")
+        gem_id = gem_attrs.get("gemId", "")
 
-        # 判斷寶石類型（優先使用 gemId）
-        is_support = self._is_support_gem(name, gem_id)
-        is_awakened = "Awakened" in name
-        is_vaal = "Vaal" in name
+        # 判斷寶石類型（預建註冊表，一次查詢取得所有分類）
+        record = get_gem_registry().lookup(gem_id, name)
 
         # 品質類型
-        quality_id = gem_elem.get("qualityId", "Default")
+        quality_id = gem_attrs.get("qualityId", "Default")
         quality_type = self._parse_quality_type(quality_id)
 
         return GemInfo(
@@ -331,9 +537,9 @@ class PobXmlMapper:
             level=level,
             quality=quality,
             quality_type=quality_type,
-            is_support=is_support,
-            is_awakened=is_awakened,
-            is_vaal=is_vaal,
+            is_support=record.is_support,
+            is_awakened=record.is_awakened,
+            is_vaal=record.is_vaal,
             enabled=enabled
         )
     
@@ -348,170 +554,119 @@ class PobXmlMapper:
         Returns:
             是否為輔助寶石
         """
-        # 優先使用 RePoE 資料判斷（最可靠）
-        gem_service = get_gem_service()
-        if gem_service.is_support_gem(gem_name):
-            return True
-
-        # 備用：使用 gemId 判斷
-        if gem_id and "SupportGem" in gem_id:
-            return True
-
-        # 最後備用：關鍵字比對（向後兼容）
-        support_keywords = [
-            "Support", "support",
-            "Awakened", "awakened",
-        ]
-        return any(keyword in gem_name for keyword in support_keywords)
+        return get_gem_registry().lookup(gem_id, gem_name).is_support
     
     def _parse_quality_type(self, quality_id: str) -> GemQualityType:
         """解析品質類型"""
-        quality_map = {
-            "Default": GemQualityType.DEFAULT,
-            "Anomalous": GemQualityType.ANOMALOUS,
-            "Divergent": GemQualityType.DIVERGENT,
-            "Phantasmal": GemQualityType.PHANTASMAL
-        }
-        return quality_map.get(quality_id, GemQualityType.DEFAULT)
-    
-    def _extract_equipment_snapshot(self, root: ET.Element) -> EquipmentSnapshot:
-        """提取裝備快照"""
-        items_elem = root.find("Items")
-
-        if not items_elem:
+        return self.QUALITY_TYPE_MAPPING.get(quality_id, GemQualityType.DEFAULT)
+    
+    def _equipment_snapshot_from_state(
+        self,
+        state: PobBuildState,
+        item_set_id: Optional[str] = None
+    ) -> EquipmentSnapshot:
+        """提取裝備快照（預設使用 activeItemSet 指定的 ItemSet，找不到時用第一個）"""
+        if "Items" not in state.sections:
             logger.warning("找不到 Items 節點，返回空裝備配置")
             return EquipmentSnapshot()
 
-        # PoB XML 結構：<Item id="N"> 與 <ItemSet> 是兄弟節點
-        # <Slot> 用 itemId 屬性引用 <Item>，不是嵌套關係
-        item_map = {}
-        for item_elem in items_elem.findall("Item"):
-            item_id = item_elem.get("id", "")
-            if item_id:
-                item_map[item_id] = item_elem
+        item_set = state.get_item_set(item_set_id)
+        if item_set is None:
+            return EquipmentSnapshot()
 
+        slots = item_set[1]
         equipment = {}
+        for slot_name, attr_name in self.SLOT_MAPPING.items():
+            item_id = slots.get(slot_name, "")
+            if item_id and item_id in state.item_texts:
+                equipment[attr_name] = self._build_equipment_item(
+                    state.item_texts[item_id],
+                    slot_name
+                )
 
-        # 裝備部位映射
-        slot_mapping = {
-            "Weapon 1": "weapon_main_hand",
-            "Weapon 2": "weapon_off_hand",
-            "Helmet": "helmet",
-            "Body Armour": "body_armour",
-            "Gloves": "gloves",
-            "Boots": "boots",
-            "Amulet": "amulet",
-            "Ring 1": "ring_1",
-            "Ring 2": "ring_2",
-            "Belt": "belt",
-            "Flask 1": "flask_1",
-            "Flask 2": "flask_2",
-            "Flask 3": "flask_3",
-            "Flask 4": "flask_4",
-            "Flask 5": "flask_5"
-        }
+        return EquipmentSnapshot(**equipment)
 
-        # 使用 activeItemSet 指定的 ItemSet，預設第一個
-        active_set_id = items_elem.get("activeItemSet", "1")
-        target_item_set = None
-        for item_set in items_elem.findall("ItemSet"):
-            if item_set.get("id", "") == active_set_id:
-                target_item_set = item_set
-                break
-        if target_item_set is None:
-            target_item_set = items_elem.find("ItemSet")
-        if target_item_set is None:
-            return EquipmentSnapshot()
+    def _build_equipment_item(self, item_text: str, slot: str) -> EquipmentItem:
+        """由 PoB 物品文字組裝單件裝備資訊（單次掃描並依物品文字快取）"""
+        return parse_equipment_item(item_text, slot)
 
-        for slot_name, attr_name in slot_mapping.items():
-            slot_elem = target_item_set.find(f"Slot[@name='{slot_name}']")
-            if slot_elem is not None:
-                item_id = slot_elem.get("itemId", "")
-                if item_id and item_id in item_map:
-                    equipment[attr_name] = self._extract_equipment_item(
-                        item_map[item_id],
-                        slot_name
-                    )
 
-        return EquipmentSnapshot(**equipment)
+# ===== 版本映射器註冊表 =====
 
-    def _extract_equipment_item(
-        self,
-        item_elem: ET.Element,
-        slot: str
-    ) -> EquipmentItem:
-        """提取單件裝備資訊（從 PoB 物品文字解析，非 XML 屬性）"""
-        item_text = item_elem.text if item_elem.text else ""
-        name, rarity, item_level = self._parse_item_text_header(item_text)
-        base_type = self._extract_base_type(item_text, name, rarity)
+# 預設變體（無任何識別節點時使用）
+DEFAULT_POB_VERSION = "official"
 
-        return EquipmentItem(
-            slot=slot,
-            name=name,
-            base_type=base_type,
-            rarity=rarity,
-            item_level=item_level
-        )
+# 變體名稱 -> 映射器類別（依註冊順序檢測）
+_POB_MAPPERS: Dict[str, Type[PobXmlMapper]] = {}
 
-    def _parse_item_text_header(self, item_text: str):
-        """從 PoB 物品文字解析名稱、稀有度、物品等級"""
-        lines = [ln.strip() for ln in item_text.strip().splitlines() if ln.strip()]
-        rarity = ItemRarity.NORMAL
-        item_level = 0
+# 變體名稱 -> 共用映射器實例（映射器不保留單次解析狀態，可重複使用）
+_POB_MAPPER_INSTANCES: Dict[str, PobXmlMapper] = {}
 
-        for line in lines:
-            if line.lower().startswith("rarity:"):
-                rarity_str = line.split(":", 1)[1].strip().upper()
-                rarity = ItemRarity[rarity_str] if rarity_str in ItemRarity.__members__ else ItemRarity.NORMAL
-            elif line.lower().startswith("item level:"):
-                try:
-                    item_level = int(line.split(":", 1)[1].strip())
-                except (ValueError, IndexError):
-                    pass
 
-        # 名稱 = 過濾 "Rarity:" 後的第一行
-        filtered = [ln for ln in lines if not ln.lower().startswith("rarity:")]
-        name = filtered[0] if filtered else ""
+def register_pob_mapper(version: str):
+    """
+    註冊 PoB 變體映射器（類別裝飾器）
+    
+    Args:
+        version: 變體名稱
+    """
+    def decorator(mapper_cls: Type[PobXmlMapper]) -> Type[PobXmlMapper]:
+        mapper_cls.VERSION = version
+        _POB_MAPPERS[version] = mapper_cls
+        _POB_MAPPER_INSTANCES.pop(version, None)
+        return mapper_cls
+    return decorator
 
-        return name, rarity, item_level
 
-    def _extract_base_type(self, item_text: str, name: str, rarity: "ItemRarity") -> str:
-        """
-        從 PoB 物品文字中解析基底類型。
+def get_pob_mapper(version: str) -> PobXmlMapper:
+    """
+    取得變體對應的映射器（未註冊的變體使用預設映射器）
+    
+    Args:
+        version: 變體名稱
+        
+    Returns:
+        映射器實例
+    """
+    mapper = _POB_MAPPER_INSTANCES.get(version)
+    if mapper is None:
+        mapper_cls = _POB_MAPPERS.get(version) or _POB_MAPPERS[DEFAULT_POB_VERSION]
+        mapper = mapper_cls()
+        mapper.version_detected = version
+        _POB_MAPPER_INSTANCES[version] = mapper
+    return mapper
 
-        PoB item text 格式（clipboard copy 格式）：
-          UNIQUE/RARE: 第一行=物品唯一名稱，第二行=基底類型
-          NORMAL/MAGIC: 第一行=基底類型（名稱即基底）
 
-        由於 name 已從 XML 屬性取得，文字第一行通常是 name 本身或基底類型。
-        """
-        if not item_text:
-            return ""
+def detect_pob_version_from_sections(top_level_tags: Iterable[str]) -> str:
+    """
+    由頂層節點名稱檢測 PoB 變體
+    
+    Args:
+        top_level_tags: 根節點的直接子節點名稱
+        
+    Returns:
+        變體名稱
+    """
+    tags = top_level_tags if isinstance(top_level_tags, (set, frozenset)) else set(top_level_tags)
+    
+    for version, mapper_cls in _POB_MAPPERS.items():
+        markers = mapper_cls.DETECTION_SECTIONS
+        if markers and markers <= tags:
+            logger.info(f"檢測到 {version} 版本（存在 {', '.join(sorted(markers))} 節點）")
+            return version
+    
+    logger.info("檢測為官方版本")
+    return DEFAULT_POB_VERSION
 
-        lines = [ln.strip() for ln in item_text.strip().splitlines() if ln.strip()]
-        if not lines:
-            return ""
 
-        # 過濾掉 "Rarity: ..." 開頭的行
-        filtered = [ln for ln in lines if not ln.lower().startswith("rarity:")]
-        if not filtered:
-            return ""
+register_pob_mapper(DEFAULT_POB_VERSION)(PobXmlMapper)
 
-        is_named = rarity in (ItemRarity.UNIQUE, ItemRarity.RARE)
 
-        if is_named and name:
-            # UNIQUE/RARE：第一行是物品名（與 name 屬性相同），第二行是基底類型
-            if filtered[0] == name and len(filtered) > 1:
-                return filtered[1]
-            # 若第一行不是 name，嘗試找 name 後的行
-            for i, ln in enumerate(filtered):
-                if ln == name and i + 1 < len(filtered):
-                    return filtered[i + 1]
-            # 找不到對應則回傳第一行
-            return filtered[0]
-        else:
-            # NORMAL/MAGIC：第一行即基底類型
-            return filtered[0]
+@register_pob_mapper("community")
+class CommunityPobXmlMapper(PobXmlMapper):
+    """社群 Fork 版本映射器（以頂層 Calcs 節點識別）"""
+    
+    DETECTION_SECTIONS = frozenset({"Calcs"})
 
 
 # 導出便捷函數
@@ -530,5 +685,4 @@ def parse_pob_to_standard_character(
         標準化角色物件
     """
     root = ET.fromstring(pob_xml)
-    mapper = PobXmlMapper()
-    return mapper.extract_standardized_character(root, lazy_load)
\ No newline at end of file
+    return PobXmlMapper().extract_standardized_character(root, lazy_load)
\ No newline at end of file
@@ -2,11 +2,14 @@
 角色比對優先級引擎
 實作三層優先級比對邏輯
 """
-from typing import List, Dict, Any, Optional
+from typing import List, Dict, Any, Optional, Tuple
 from enum import Enum
 import logging
 
 from app.character_models import StandardizedCharacter, AscendancyStatus
+from app.passive_tree_bitset import AllocationBits, AllocationSpace, allocation_space_for
+from app.passive_tree_classes import get_node_class_index
+from app.player_stats import top_player_stat_gaps, format_stat_value
 
 logger = logging.getLogger(__name__)
 
@@ -35,6 +38,7 @@ class DifferenceCategory(str, Enum):
     EQUIPMENT_MODS = "equipment_mods"
     SLOT_SKILL_MISMATCH = "slot_skill_mismatch"  # 裝備部位技能不匹配
     SLOT_LINK_COUNT = "slot_link_count"  # 裝備部位連結數差異
+    PLAYER_STATS = "player_stats"  # PoB 計算能力值差距
 
 
 class ComparisonDifference(dict):
@@ -95,10 +99,16 @@ class SlotGemDifference(dict):
 class PriorityComparisonEngine:
     """優先級比對引擎"""
 
+    # 能力值差距：最多回報項數與最小相對差距
+    PLAYER_STAT_GAP_LIMIT = 5
+    PLAYER_STAT_MIN_GAP = 0.1
+
     def __init__(self):
         """初始化比對引擎"""
         self.differences: List[ComparisonDifference] = []
         self.gem_differences_by_slot: List[SlotGemDifference] = []
+        self.allocation_space: Optional[AllocationSpace] = None
+        self._allocation_bits_cache: Dict[int, Tuple[StandardizedCharacter, AllocationBits]] = {}
 
     def compare_characters(
         self,
@@ -117,6 +127,8 @@ class PriorityComparisonEngine:
         """
         self.differences = []
         self.gem_differences_by_slot = []
+        self.allocation_space = None
+        self._allocation_bits_cache = {}
 
         logger.info("開始執行三層優先級比對分析")
 
@@ -129,6 +141,7 @@ class PriorityComparisonEngine:
         self._check_keystone_passives(player_character, target_character)
         self._check_main_gem_level_quality(player_character, target_character)
         self._check_core_equipment(player_character, target_character)
+        self._check_player_stats(player_character, target_character)
 
         # 第三優先級：優化空間
         self._check_general_passives(player_character, target_character)
@@ -149,6 +162,24 @@ class PriorityComparisonEngine:
     def get_gem_differences_by_slot(self) -> List[SlotGemDifference]:
         """取得按裝備部位分組的寶石差異"""
         return self.gem_differences_by_slot
+
+    def _resolve_allocation_space(self) -> AllocationSpace:
+        """取得天賦配置位元集合的座標系（沒有天賦樹資料時為空座標系）"""
+        return allocation_space_for(get_node_class_index())
+
+    def _get_allocation_space(self) -> AllocationSpace:
+        """本次比對使用的座標系（首次使用時取得）"""
+        if self.allocation_space is None:
+            self.allocation_space = self._resolve_allocation_space()
+        return self.allocation_space
+
+    def _allocation_bits(self, character: StandardizedCharacter) -> AllocationBits:
+        """角色已配置天賦的位元集合（同一次比對只轉換一次）"""
+        entry = self._allocation_bits_cache.get(id(character))
+        if entry is None or entry[0] is not character:
+            bits = self._get_allocation_space().encode(character.passive_allocation.allocated_nodes)
+            entry = self._allocation_bits_cache[id(character)] = (character, bits)
+        return entry[1]
     
     # ===== 第一優先級：影響可玩性 =====
     
@@ -292,15 +323,16 @@ class PriorityComparisonEngine:
         target: StandardizedCharacter
     ):
         """檢查基石天賦配置"""
-        player_keystones = set(player.passive_allocation.keystone_nodes)
-        target_keystones = set(target.passive_allocation.keystone_nodes)
-        
-        missing_keystones = target_keystones - player_keystones
+        space = self._get_allocation_space()
+        missing_keystones = (
+            space.encode(target.passive_allocation.keystone_nodes)
+            - space.encode(player.passive_allocation.keystone_nodes)
+        )
         
         if missing_keystones:
             # 這裡需要查詢天賦樹資料庫獲取節點名稱
             # 暫時使用節點 ID
-            for keystone_id in missing_keystones:
+            for keystone_id in missing_keystones.node_ids():
                 self.differences.append(ComparisonDifference(
                     category=DifferenceCategory.PASSIVE_KEYSTONE,
                     priority=ComparisonPriority.HIGH,
@@ -443,6 +475,44 @@ class PriorityComparisonEngine:
                     slot=slot
                 ))
     
+    def _check_player_stats(
+        self,
+        player: StandardizedCharacter,
+        target: StandardizedCharacter
+    ):
+        """檢查 PoB 計算能力值（生命、護盾、抗性、DPS 等）的最大差距"""
+        if not player.player_stats or not target.player_stats:
+            return
+        
+        for gap in top_player_stat_gaps(
+            player.player_stats,
+            target.player_stats,
+            limit=self.PLAYER_STAT_GAP_LIMIT,
+            min_relative_gap=self.PLAYER_STAT_MIN_GAP
+        ):
+            relative_gap = gap["relative_gap"]
+            self.differences.append(ComparisonDifference(
+                category=DifferenceCategory.PLAYER_STATS,
+                priority=(
+                    ComparisonPriority.HIGH if relative_gap >= 0.5
+                    else ComparisonPriority.MEDIUM
+                ),
+                message=(
+                    f"{gap['label']}差距：目前 {format_stat_value(gap['player_value'])}，"
+                    f"目標 {format_stat_value(gap['target_value'])}（落後 {relative_gap:.0%}）"
+                ),
+                current_value=gap["player_value"],
+                target_value=gap["target_value"],
+                action=f"提升{gap['label']}",
+                pob_instruction=(
+                    f"在 PoB 的計算面板中比較 {gap['stat']} 的來源"
+                ),
+                stat=gap["stat"],
+                impact={
+                    "relative_gap": relative_gap
+                }
+            ))
+    
     # ===== 第三優先級：優化空間 =====
     
     def _check_general_passives(
@@ -451,14 +521,15 @@ class PriorityComparisonEngine:
         target: StandardizedCharacter
     ):
         """檢查一般天賦節點效率"""
-        player_nodes = set(player.passive_allocation.allocated_nodes)
-        target_nodes = set(target.passive_allocation.allocated_nodes)
+        player_nodes = self._allocation_bits(player)
+        target_nodes = self._allocation_bits(target)
         
         missing_nodes = target_nodes - player_nodes
-        extra_nodes = player_nodes - target_nodes
         
-        # 排除已在其他優先級處理的基石天賦
-        missing_general = missing_nodes - set(player.passive_allocation.keystone_nodes)
+        # 排除已在其他優先級處理的基石天賦（目標流派的基石）
+        missing_general = missing_nodes - self._get_allocation_space().encode(
+            target.passive_allocation.keystone_nodes
+        )
         
         if missing_general:
             node_count = len(missing_general)
@@ -473,7 +544,8 @@ class PriorityComparisonEngine:
                 pob_instruction=(
                     "在 PoB 的天賦樹面板中參考目標流派配置缺少的節點"
                 ),
-                missing_node_ids=list(missing_general)
+                missing_node_ids=missing_general.node_ids(),
+                similarity=round(player_nodes.jaccard(target_nodes), 3)
             ))
     
     def _check_support_gem_setup(
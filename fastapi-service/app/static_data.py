@@ -0,0 +1,241 @@
+"""
+靜態遊戲資料預熱
+在背景並行載入天賦樹與寶石資料，提供就緒狀態給健康檢查與相依端點
+"""
+import asyncio
+import os
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+import logging
+
+from fastapi import HTTPException
+
+from app.gem_service import get_gem_registry
+from app.passive_tree_service import passive_tree_service
+from app.worker_pool import worker_pool
+
+logger = logging.getLogger(__name__)
+
+
+# 資料尚未就緒時建議客戶端重試的秒數
+RETRY_AFTER_SECONDS = int(os.getenv("STATIC_DATA_RETRY_AFTER", "5"))
+
+# 資源狀態
+STATUS_PENDING = "pending"
+STATUS_LOADING = "loading"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+# 核心資源就緒、但其他資源失敗或載入中（服務可接收流量，相關端點個別返回 503）
+STATUS_DEGRADED = "degraded"
+
+# 就緒檢查依賴的核心資源：PoB 解析與比對只需要寶石資料，
+# 天賦樹不可用時映射器改以節點 ID 判斷，天賦樹端點個別返回 503
+CORE_RESOURCES = ("gems",)
+
+# 資源顯示名稱
+_RESOURCE_LABELS = {
+    "passive_tree": "天賦樹資料",
+    "gems": "寶石資料",
+}
+
+
+def _load_gems() -> bool:
+    """建立寶石註冊表（RePoE 資料缺少時以規則判斷，仍視為可用）"""
+    get_gem_registry()
+    return True
+
+
+class StaticDataWarmup:
+    """
+    靜態資料預熱器
+
+    每項資源同一時間只有一個載入任務（single-flight）；
+    載入失敗的資源在相依端點被呼叫時（require）重新載入，
+    兩次重試至少間隔 RETRY_AFTER_SECONDS 秒。
+    """
+
+    def __init__(
+        self,
+        loaders: Optional[Dict[str, Callable[[], bool]]] = None,
+        core: Optional[Tuple[str, ...]] = None
+    ):
+        """
+        初始化預熱器
+
+        Args:
+            loaders: 資源名稱 -> 同步載入函數（返回是否成功）
+            core: 決定服務是否就緒的核心資源（預設為 CORE_RESOURCES；
+                自訂 loaders 時預設為全部資源）
+        """
+        self._loaders = loaders or {
+            "passive_tree": passive_tree_service.load_tree_data,
+            "gems": _load_gems,
+        }
+        self._core = core or (CORE_RESOURCES if loaders is None else tuple(self._loaders))
+        self._status: Dict[str, str] = {name: STATUS_PENDING for name in self._loaders}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        self._durations: Dict[str, float] = {}
+        self._failed_at: Dict[str, float] = {}
+
+    def start(self) -> asyncio.Future:
+        """
+        在背景並行載入所有資源（不等待完成）
+
+        Returns:
+            所有載入任務的集合 Future
+        """
+        return asyncio.gather(*(self.ensure(name) for name in self._loaders))
+
+    def ensure(self, name: str) -> "asyncio.Task[bool]":
+        """
+        確保資源已載入或正在載入
+
+        Args:
+            name: 資源名稱
+
+        Returns:
+            載入任務（已就緒時為立即完成的任務）
+        """
+        task = self._tasks.get(name)
+        if task is None or (task.done() and self._status[name] != STATUS_READY):
+            task = asyncio.get_running_loop().create_task(self._load(name))
+            self._tasks[name] = task
+        return task
+
+    async def _load(self, name: str) -> bool:
+        """於執行緒池中執行同步載入函數（資料保留在本行程）"""
+        self._status[name] = STATUS_LOADING
+        start = time.perf_counter()
+        try:
+            success = bool(await worker_pool.run_local(self._loaders[name]))
+        except Exception as e:
+            logger.error(f"{_RESOURCE_LABELS.get(name, name)}載入失敗: {str(e)}")
+            success = False
+
+        self._durations[name] = (time.perf_counter() - start) * 1000
+        self._status[name] = STATUS_READY if success else STATUS_FAILED
+        if not success:
+            self._failed_at[name] = time.monotonic()
+        logger.info(
+            f"{_RESOURCE_LABELS.get(name, name)}預熱{'完成' if success else '失敗'}"
+            f"（{self._durations[name]:.0f} ms）"
+        )
+        return success
+
+    def retry_failed(self, *names: str) -> List[str]:
+        """
+        重新載入失敗的資源（距上次失敗未滿 RETRY_AFTER_SECONDS 秒者略過）
+
+        Args:
+            names: 資源名稱（未指定時為全部）
+
+        Returns:
+            已重新觸發載入的資源
+        """
+        now = time.monotonic()
+        retried = []
+        for name in names or self._loaders:
+            if self._status[name] != STATUS_FAILED:
+                continue
+            if now - self._failed_at.get(name, 0.0) < RETRY_AFTER_SECONDS:
+                continue
+            try:
+                self.ensure(name)
+            except RuntimeError:
+                # 沒有執行中的事件迴圈（同步呼叫端），留待下次重試
+                continue
+            # 任務開始執行前即視為載入中，避免重複觸發
+            self._status[name] = STATUS_LOADING
+            retried.append(name)
+        if retried:
+            logger.info(f"重新載入失敗的靜態資料: {', '.join(retried)}")
+        return retried
+
+    def is_ready(self, *names: str) -> bool:
+        """檢查指定資源（未指定時為全部）是否就緒"""
+        return all(self._status[name] == STATUS_READY for name in (names or self._loaders))
+
+    def overall_status(self, *names: str) -> str:
+        """
+        彙總狀態：全部就緒為 ready，任一失敗為 failed，其餘為 loading
+
+        Args:
+            names: 資源名稱（未指定時為全部）
+        """
+        statuses = [self._status[name] for name in (names or self._loaders)]
+        if all(status == STATUS_READY for status in statuses):
+            return STATUS_READY
+        if STATUS_FAILED in statuses:
+            return STATUS_FAILED
+        return STATUS_LOADING
+
+    def service_state(self) -> str:
+        """
+        服務狀態：核心資源未就緒時為其彙總狀態（failed / loading）；
+        核心資源就緒而其他資源未就緒時為 degraded
+        """
+        core_state = self.overall_status(*self._core)
+        if core_state != STATUS_READY:
+            return core_state
+        return STATUS_READY if self.is_ready() else STATUS_DEGRADED
+
+    def status(self) -> Dict[str, Any]:
+        """取得服務就緒狀態（依核心資源）與各資源狀態、載入耗時"""
+        return {
+            "ready": self.is_ready(*self._core),
+            "state": self.service_state(),
+            "core_resources": list(self._core),
+            "resources": {
+                name: {
+                    "status": status,
+                    "load_ms": round(self._durations[name], 1) if name in self._durations else None
+                }
+                for name, status in self._status.items()
+            }
+        }
+
+    def require(self, *names: str):
+        """
+        要求資源已就緒，否則立即返回 503
+
+        Args:
+            names: 資源名稱
+
+        載入失敗的資源會重新觸發載入；回應區分失敗（data_unavailable）
+        與載入中（data_not_ready）。
+
+        Raises:
+            HTTPException: 503，附 Retry-After 標頭
+        """
+        pending = [name for name in names if self._status[name] != STATUS_READY]
+        if not pending:
+            return
+
+        failed = [name for name in pending if self._status[name] == STATUS_FAILED]
+        retried = self.retry_failed(*failed) if failed else []
+        if failed:
+            failed_labels = "、".join(_RESOURCE_LABELS.get(name, name) for name in failed)
+            detail = {
+                "error_type": "data_unavailable",
+                "message": f"靜態資料載入失敗: {', '.join(f'{n}={STATUS_FAILED}' for n in failed)}"
+                           f"（{'已重新載入' if retried else '稍後重試'}）",
+                "user_message": f"{failed_labels}載入失敗，{'正在重新載入，' if retried else ''}請稍後再試",
+                "resources": {name: self._status[name] for name in pending}
+            }
+        else:
+            labels = "、".join(_RESOURCE_LABELS.get(name, name) for name in pending)
+            detail = {
+                "error_type": "data_not_ready",
+                "message": f"靜態資料尚未就緒: {', '.join(f'{n}={self._status[n]}' for n in pending)}",
+                "user_message": f"{labels}載入中，請稍後再試",
+                "resources": {name: self._status[name] for name in pending}
+            }
+        raise HTTPException(
+            status_code=503,
+            detail=detail,
+            headers={"Retry-After": str(RETRY_AFTER_SECONDS)}
+        )
+
+
+# 全域單例
+static_data = StaticDataWarmup()
@@ -0,0 +1,119 @@
+"""
+CPU 密集工作執行池
+將 PoB 解碼、映射、比對與天賦路徑搜尋移出事件迴圈
+"""
+import asyncio
+import os
+import threading
+from concurrent.futures import Executor, ThreadPoolExecutor, ProcessPoolExecutor
+from functools import partial
+from typing import Any, Callable, Optional
+import logging
+
+logger = logging.getLogger(__name__)
+
+
+# 執行模式：inline（直接在事件迴圈執行）、thread（執行緒池）、process（行程池）
+EXECUTOR_MODES = ("inline", "thread", "process")
+DEFAULT_EXECUTOR_MODE = os.getenv("POB_EXECUTOR_MODE", "thread").lower()
+
+# 工作者數量（0 表示使用 concurrent.futures 預設值）
+DEFAULT_EXECUTOR_WORKERS = int(os.getenv("POB_EXECUTOR_WORKERS", "0")) or None
+
+
+class WorkerPool:
+    """
+    CPU 密集工作執行池
+
+    run() 依設定的模式執行可序列化的工作（process 模式下於子行程執行）；
+    run_local() 用於依賴本行程狀態的工作（例如已載入的天賦樹），
+    除 inline 模式外一律在執行緒池中執行。
+    """
+
+    def __init__(
+        self,
+        mode: str = DEFAULT_EXECUTOR_MODE,
+        max_workers: Optional[int] = DEFAULT_EXECUTOR_WORKERS
+    ):
+        """
+        初始化執行池
+
+        Args:
+            mode: 執行模式（inline / thread / process）
+            max_workers: 工作者數量
+        """
+        if mode not in EXECUTOR_MODES:
+            logger.warning(f"未知的執行模式 {mode}，改用 thread")
+            mode = "thread"
+
+        self.mode = mode
+        self.max_workers = max_workers
+        self._executor: Optional[Executor] = None
+        self._local_executor: Optional[ThreadPoolExecutor] = None
+        self._lock = threading.Lock()
+
+    def _get_executor(self) -> Executor:
+        """取得（必要時建立）主要執行器"""
+        with self._lock:
+            if self._executor is None:
+                if self.mode == "process":
+                    self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+                else:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=self.max_workers,
+                        thread_name_prefix="pob-worker"
+                    )
+                logger.info(f"建立 {self.mode} 執行池（workers={self.max_workers or 'default'}）")
+            return self._executor
+
+    def _get_local_executor(self) -> Executor:
+        """取得（必要時建立）本行程執行緒池"""
+        if self.mode == "thread":
+            return self._get_executor()
+
+        with self._lock:
+            if self._local_executor is None:
+                self._local_executor = ThreadPoolExecutor(
+                    max_workers=self.max_workers,
+                    thread_name_prefix="pob-local"
+                )
+            return self._local_executor
+
+    async def run(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """
+        執行可序列化的 CPU 密集工作
+
+        process 模式下 func 與參數、返回值都必須可被 pickle。
+        """
+        if self.mode == "inline":
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_executor(),
+            partial(func, *args, **kwargs)
+        )
+
+    async def run_local(self, func: Callable[..., Any], *args: Any, **kwargs: Any) -> Any:
+        """執行依賴本行程狀態的 CPU 密集工作"""
+        if self.mode == "inline":
+            return func(*args, **kwargs)
+
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(
+            self._get_local_executor(),
+            partial(func, *args, **kwargs)
+        )
+
+    def shutdown(self):
+        """關閉執行池"""
+        with self._lock:
+            for executor in (self._executor, self._local_executor):
+                if executor is not None:
+                    executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+            self._local_executor = None
+
+
+# 全域單例
+worker_pool = WorkerPool()
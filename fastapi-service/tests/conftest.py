@@ -0,0 +1,129 @@
+"""
+測試共用的合成天賦樹
+
+以方格或自訂連線產生最小的 data.json，經過與正式資料相同的
+編譯 / 解碼流程建立鄰接索引。
+"""
+import random
+from typing import Dict, Iterable, List, Tuple
+
+import pytest
+
+from app.passive_tree_index import PassiveTreeIndex
+
+GRID_WIDTH = 9
+
+
+def grid_node_id(row: int, col: int, width: int = GRID_WIDTH) -> int:
+    """方格座標 -> 節點 ID（由 1 起算）"""
+    return row * width + col + 1
+
+
+def build_tree_index(
+    edges: Iterable[Tuple[int, int]],
+    class_starts: Iterable[int] = (),
+    version: str = "test"
+) -> PassiveTreeIndex:
+    """
+    由節點連線建立鄰接索引
+
+    Args:
+        edges: 無向連線（節點 ID 對）
+        class_starts: 職業起始節點 ID（不可經過）
+        version: 天賦樹版本
+    """
+    nodes: Dict[str, dict] = {}
+
+    def node(node_id: int) -> dict:
+        return nodes.setdefault(str(node_id), {
+            "skill": node_id,
+            "name": f"Node {node_id}",
+            "stats": [f"+{node_id % 10} to Strength"],
+            "out": [],
+            "in": []
+        })
+
+    for a, b in edges:
+        node(a)["out"].append(str(b))
+        node(b)
+    for index, node_id in enumerate(class_starts):
+        node(node_id)["classStartIndex"] = index
+    nodes["root"] = {"out": [min(nodes, key=int)]}
+    return PassiveTreeIndex.from_tree_data({"tree": "Default", "nodes": nodes, "classes": []}, version)
+
+
+def grid_edges(width: int = GRID_WIDTH) -> List[Tuple[int, int]]:
+    """width x width 方格的連線"""
+    edges = []
+    for row in range(width):
+        for col in range(width):
+            if col + 1 < width:
+                edges.append((grid_node_id(row, col, width), grid_node_id(row, col + 1, width)))
+            if row + 1 < width:
+                edges.append((grid_node_id(row, col, width), grid_node_id(row + 1, col, width)))
+    return edges
+
+
+def random_tree_edges(count: int, rng: random.Random) -> List[Tuple[int, int]]:
+    """count 個節點（ID 1..count）的隨機樹"""
+    return [(rng.randint(1, node_id - 1), node_id) for node_id in range(2, count + 1)]
+
+
+@pytest.fixture(scope="session")
+def grid_index() -> PassiveTreeIndex:
+    """方格天賦樹：左上角與中央為職業起始節點"""
+    center = grid_node_id(GRID_WIDTH // 2, GRID_WIDTH // 2)
+    return build_tree_index(grid_edges(), class_starts=(1, center))
+
+
+def class_starts_of(index: PassiveTreeIndex) -> List[int]:
+    """不可經過的職業起始節點 ID"""
+    return [node_id for node_id in index.node_ids if not index.traversable[index.index_of[node_id]]]
+
+
+def is_connected_order(
+    index: PassiveTreeIndex,
+    allocated: Iterable[int],
+    order: Iterable[int]
+) -> bool:
+    """
+    order 中每個節點是否都與先前的配置相連
+
+    職業起始節點除非本身已配置，只能作為葉節點，不能經由它接上後續節點。
+    """
+    allocated = set(allocated)
+    have = set(allocated)
+    for node_id in order:
+        anchors = [
+            index.node_ids[position]
+            for position in index.neighbors_of(index.index_of[node_id])
+        ]
+        if not any(
+            anchor in have and (anchor in allocated or index.traversable[index.index_of[anchor]])
+            for anchor in anchors
+        ):
+            return False
+        have.add(node_id)
+    return True
+
+
+def connected_to(
+    index: PassiveTreeIndex,
+    allocated: Iterable[int],
+    nodes: Iterable[int]
+) -> bool:
+    """已配置節點加上 nodes 是否連通（只經由 nodes 與已配置節點）"""
+    allocated = set(allocated)
+    members = allocated | set(nodes)
+    seen = set(allocated)
+    stack = list(allocated)
+    while stack:
+        node_id = stack.pop()
+        if node_id not in allocated and not index.traversable[index.index_of[node_id]]:
+            continue
+        for position in index.neighbors_of(index.index_of[node_id]):
+            neighbor = index.node_ids[position]
+            if neighbor in members and neighbor not in seen:
+                seen.add(neighbor)
+                stack.append(neighbor)
+    return seen == members
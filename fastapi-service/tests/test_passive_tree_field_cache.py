@@ -0,0 +1,71 @@
+"""天賦樹距離場快取：增量更新與重新建立比對的隨機測試"""
+import random
+
+from app.passive_tree_field_cache import DistanceFieldCache, allocation_fingerprint
+
+from conftest import build_tree_index, class_starts_of, grid_edges, grid_node_id
+
+WIDTH = 15
+
+
+def _check_field(index, field, allocated):
+    """距離與重新 BFS 相同，且父節點、起點連結一致"""
+    expected = index.distance_field(allocated)
+    assert list(field.distances) == list(expected.distances)
+
+    sources = set(index.to_indices(allocated))
+    for position in range(len(index)):
+        distance = field.distances[position]
+        if distance > 0:
+            parent = field.parents[position]
+            assert field.distances[parent] == distance - 1
+            assert position in index.neighbors_of(parent)
+            assert parent in sources or index.traversable[parent]
+            assert field.roots[position] == field.roots[parent]
+        elif distance == 0:
+            assert field.roots[position] == position
+
+
+def test_incremental_updates_match_fresh_bfs():
+    """隨機新增 / 移除節點（含職業起始節點），每一步都與重新建立的距離場相同"""
+    starts = [grid_node_id(row, col, WIDTH) for row, col in ((0, 0), (7, 7), (3, 11), (12, 4))]
+    index = build_tree_index(grid_edges(WIDTH), class_starts=starts)
+    assert class_starts_of(index) == sorted(starts)
+
+    rng = random.Random(20)
+    node_ids = list(index.node_ids)
+    cache = DistanceFieldCache(index, max_fields=8)
+    steps = 0
+    for _ in range(16):
+        allocated = set(rng.sample(node_ids, rng.randint(0, 30)))
+        for _ in range(25):
+            choice = rng.random()
+            if choice < 0.3 or not allocated:
+                allocated.add(rng.choice(node_ids))
+            elif choice < 0.45:
+                allocated.symmetric_difference_update({rng.choice(starts)})
+            elif choice < 0.8:
+                allocated.discard(rng.choice(sorted(allocated)))
+            else:
+                for _ in range(rng.randint(1, 6)):
+                    allocated.symmetric_difference_update({rng.choice(node_ids)})
+            _check_field(index, cache.get(sorted(allocated)), sorted(allocated))
+            steps += 1
+
+    assert steps == 400
+    assert cache.incremental > steps // 2
+
+
+def test_cached_field_is_shared_and_unchanged():
+    """相同配置（順序、重複無關）命中快取，增量更新不修改快取中的距離場"""
+    index = build_tree_index(grid_edges(WIDTH))
+    cache = DistanceFieldCache(index)
+    field = cache.get([1, 2, 3])
+    before = list(field.distances)
+
+    assert cache.get([3, 2, 1, 1]) is field
+    cache.get([1, 2, 3, 4])
+    cache.get([1, 2])
+    assert list(field.distances) == before
+    assert cache.hits == 1
+    assert allocation_fingerprint([3, 1, 2]) == allocation_fingerprint([1, 2, 3, 3])
@@ -0,0 +1,155 @@
+"""天賦樹配置規劃：與暴力搜尋比對的隨機測試"""
+import itertools
+import logging
+import random
+
+import app.passive_tree_planner as planner
+from app.passive_tree_planner import AllocationPlan, plan_budget_allocation, plan_steiner_allocation
+
+from conftest import (
+    build_tree_index,
+    class_starts_of,
+    connected_to,
+    is_connected_order,
+    random_tree_edges
+)
+
+
+def _near_nodes(index, allocated, max_distance):
+    """距離已配置節點 1..max_distance 的可經過節點"""
+    field = index.distance_field(allocated, max_distance=max_distance)
+    return [
+        node_id for node_id in index.node_ids
+        if field.cost(node_id) and index.traversable[index.index_of[node_id]]
+    ]
+
+
+def _optimal_cost(index, allocated, targets, others, limit):
+    """最少新增點數（暴力列舉 targets 加上 others 的子集）；超過 limit 時為 None"""
+    for extra_count in range(0, limit - len(targets) + 1):
+        for extra in itertools.combinations(others, extra_count):
+            if connected_to(index, allocated, set(targets) | set(extra)):
+                return len(targets) + extra_count
+    return None
+
+
+def test_steiner_plan_reports_every_target(grid_index):
+    """每個目標都必須已到達或列為無法到達，且配置順序保持連通"""
+    rng = random.Random(18)
+    node_ids = list(grid_index.node_ids)
+    starts = class_starts_of(grid_index)
+    for _ in range(300):
+        allocated = rng.sample(node_ids, rng.randint(1, 3))
+        targets = rng.sample(node_ids, rng.randint(1, 6)) + rng.sample(starts, 1) + [99999]
+        plan = plan_steiner_allocation(grid_index, allocated, targets)
+
+        assert set(plan.targets) | set(plan.unreachable) == set(targets) - set(allocated)
+        assert not set(plan.targets) & set(plan.unreachable)
+        assert 99999 in plan.unreachable
+        assert is_connected_order(grid_index, allocated, plan.order)
+        assert plan.total_cost == len(plan.order)
+        assert plan.total_cost <= plan.independent_cost
+
+
+def test_steiner_plan_within_bound_of_optimum(grid_index):
+    """小型實例與暴力最佳解比對（最短路徑合併法保證不超過 2 倍）"""
+    rng = random.Random(3)
+    starts = set(class_starts_of(grid_index))
+    candidates = [node_id for node_id in grid_index.node_ids if node_id not in starts]
+    optimal_hits = 0
+    for _ in range(40):
+        allocated = [rng.choice(candidates)]
+        near = _near_nodes(grid_index, allocated, 3)
+        targets = rng.sample(near, 3)
+        plan = plan_steiner_allocation(grid_index, allocated, targets)
+        assert sorted(plan.targets) == sorted(targets)
+
+        others = [node_id for node_id in near if node_id not in targets]
+        best = _optimal_cost(grid_index, allocated, targets, others, plan.total_cost)
+        assert best is not None and best * 2 >= plan.total_cost
+        optimal_hits += best == plan.total_cost
+    # 分支重接與修剪後，小型實例幾乎都是最佳解
+    assert optimal_hits >= 36
+
+
+def test_missed_targets_become_unreachable(grid_index, monkeypatch, caplog):
+    """修剪遺漏目標時改列為無法到達並記錄警告，而不是拋出例外"""
+    dropped = []
+
+    def prune_last(index, allocated, added, target_set):
+        order = original(index, allocated, added, target_set)
+        dropped.append(order[-1])
+        return order[:-1]
+
+    original = planner._prune_and_order
+    monkeypatch.setattr(planner, "_prune_and_order", prune_last)
+    with caplog.at_level(logging.WARNING, logger=planner.__name__):
+        plan = plan_steiner_allocation(grid_index, [2], [4])
+
+    assert dropped == [4]
+    assert plan.targets == []
+    assert plan.unreachable == [4]
+    assert not plan.found
+    assert "遺漏" in caplog.text
+
+
+def test_plan_found():
+    """至少到達一個目標，或沒有無法到達的目標時視為找到"""
+    assert AllocationPlan([5], [5], [7], 1, 1).found
+    assert AllocationPlan([], [], [], 0, 0).found
+    assert not AllocationPlan([], [], [7], 0, 0).found
+
+
+def _best_budget_value(index, allocated, candidates, values, budget):
+    """預算內連通子集的最高價值（暴力列舉）"""
+    best = 0.0
+    for count in range(1, budget + 1):
+        for subset in itertools.combinations(candidates, count):
+            value = sum(values[node_id] for node_id in subset)
+            if value > best and connected_to(index, allocated, subset):
+                best = value
+    return best
+
+
+def _random_values(rng, candidates):
+    return {node_id: rng.choice([0, 0, 1, 5, 50, 100]) for node_id in candidates}
+
+
+def test_budget_plan_is_optimal_on_trees():
+    """候選子圖為樹時樹狀背包為精確解，與暴力搜尋結果相同"""
+    rng = random.Random(19)
+    for _ in range(40):
+        index = build_tree_index(random_tree_edges(12, rng))
+        allocated = [1]
+        candidates = list(range(2, 13))
+        values = _random_values(rng, candidates)
+        budget = rng.randint(0, 6)
+        plan = plan_budget_allocation(index, allocated, candidates, values, budget)
+
+        assert plan.total_cost <= budget
+        assert is_connected_order(index, allocated, plan.order)
+        assert plan.value == _best_budget_value(index, allocated, candidates, values, budget)
+
+
+def test_budget_plan_on_grid(grid_index):
+    """方格（有環）上為近似解：結果合法且不超過暴力最佳解"""
+    rng = random.Random(7)
+    starts = set(class_starts_of(grid_index))
+    node_ids = [node_id for node_id in grid_index.node_ids if node_id not in starts]
+    optimal_hits = 0
+    for _ in range(40):
+        allocated = [rng.choice(node_ids)]
+        near = _near_nodes(grid_index, allocated, 3)
+        candidates = rng.sample(near, min(10, len(near))) + [99999]
+        values = _random_values(rng, candidates)
+        budget = rng.randint(1, 4)
+        plan = plan_budget_allocation(grid_index, allocated, candidates, values, budget)
+
+        assert plan.total_cost <= budget
+        assert is_connected_order(grid_index, allocated, plan.order)
+        assert 99999 in plan.unreachable
+        assert set(plan.order) | set(plan.skipped) | set(plan.unreachable) == set(candidates)
+        best = _best_budget_value(grid_index, allocated, candidates[:-1], values, budget)
+        assert plan.value <= best
+        optimal_hits += plan.value == best
+    assert optimal_hits >= 30
@@ -34,6 +34,57 @@ apiClient.interceptors.response.use(
     }
 )
 
+// ===== 天賦樹節點快取 =====
+
+// 整棵天賦樹每份資料只下載一次：網址帶版本與內容摘要的傾印由瀏覽器 HTTP 快取永久保存
+// （同一版本的資料被替換時摘要改變，網址也隨之改變），本頁面內則保存解碼後的節點表
+let passiveTreePromise = null
+
+function buildPassiveTree(dump) {
+    const { columns, fields } = dump
+    const positions = new Map()
+    columns.id.forEach((nodeId, position) => positions.set(nodeId, position))
+
+    return {
+        version: dump.version,
+        has(nodeId) {
+            return positions.has(Number(nodeId))
+        },
+        node(nodeId) {
+            const position = positions.get(Number(nodeId))
+            if (position === undefined) return null
+            const node = {}
+            fields.forEach((field) => {
+                node[field] = columns[field][position]
+            })
+            return node
+        }
+    }
+}
+
+async function fetchPassiveTree() {
+    const status = await apiClient.get('/passive-tree/status')
+    const version = status.data.tree_version
+    // 沒有內容摘要時（null）axios 會省略該參數，改為每次以 ETag 驗證
+    const digest = status.data.tree_digest
+    const response = await apiClient.get('/passive-tree/dump', {
+        params: { version, digest, format: 'columnar' }
+    })
+    console.log('🌳 天賦樹已載入:', version, response.data.count, '個節點')
+    return buildPassiveTree(response.data)
+}
+
+export function loadPassiveTree() {
+    if (!passiveTreePromise) {
+        passiveTreePromise = fetchPassiveTree().catch((treeError) => {
+            // 失敗時不保留，下次重新下載
+            passiveTreePromise = null
+            throw treeError
+        })
+    }
+    return passiveTreePromise
+}
+
 // ===== API 方法 =====
 
 export const poeApi = {
@@ -101,17 +152,39 @@ export const poeApi = {
         }
     },
 
-    // 天賦樹相關 API（保持原有功能）
+    // 天賦樹相關 API（節點資訊優先由本機快取的整棵天賦樹取得）
+    loadPassiveTree,
+
     async getPassiveNodeInfo(nodeId) {
+        const tree = await loadPassiveTree()
+        if (tree.has(nodeId)) {
+            return { success: true, node: tree.node(nodeId) }
+        }
+
+        // 不在天賦樹中的節點由後端補上預設資訊
         const response = await apiClient.get(`/passive-tree/node/${nodeId}`)
         return response.data
     },
 
     async getPassiveNodesInfo(nodeIds) {
-        const response = await apiClient.post('/passive-tree/nodes', {
-            node_ids: nodeIds
+        const tree = await loadPassiveTree()
+        const nodes = {}
+        const missingIds = []
+        nodeIds.forEach((nodeId) => {
+            if (tree.has(nodeId)) {
+                nodes[nodeId] = tree.node(nodeId)
+            } else {
+                missingIds.push(nodeId)
+            }
         })
-        return response.data
+
+        if (missingIds.length > 0) {
+            const response = await apiClient.post('/passive-tree/nodes', {
+                node_ids: missingIds
+            })
+            Object.assign(nodes, response.data.nodes)
+        }
+        return { success: true, count: Object.keys(nodes).length, nodes }
     },
 
     async calculatePassivePath(startNodes, targetNode) {
@@ -18,8 +18,10 @@ export default class BuildDataTransformer {
 
     /**
      * 將 FastAPI PoB 解析結果轉換為前端標準格式
+     * @param {Object} pobData - 標準化角色資料
+     * @param {Array<string>} playerStatNames - player_stats 向量的能力值名稱（API 回應的 player_stat_names）
      */
-    static transformPobDataToBuild(pobData) {
+    static transformPobDataToBuild(pobData, playerStatNames = []) {
         console.log('轉換 PoB 資料:', pobData)
 
         // 新架構：使用 StandardizedCharacter 格式
@@ -32,8 +34,9 @@ export default class BuildDataTransformer {
         const buildInfo = pobData.build_info || {}
         const config = pobData.config || {}
 
-        // 計算基礎數值
-        const stats = this.calculateStatsFromPoB(buildInfo, config)
+        // 計算基礎數值（優先使用 PoB 匯出的 PlayerStat）
+        const playerStats = this.mapPlayerStats(pobData.player_stats, playerStatNames)
+        const stats = this.calculateStatsFromPoB(buildInfo, config, playerStats)
 
         return {
             stats: {
@@ -329,10 +332,26 @@ export default class BuildDataTransformer {
         )
     }
 
+    /**
+     * 將 player_stats 向量對應為 { 能力值名稱: 數值 }（缺值略過）
+     */
+    static mapPlayerStats(vector, names) {
+        const stats = {}
+        if (!Array.isArray(vector) || !Array.isArray(names)) return stats
+
+        names.forEach((name, index) => {
+            const value = vector[index]
+            if (value !== null && value !== undefined) {
+                stats[name] = value
+            }
+        })
+        return stats
+    }
+
     /**
      * 從 PoB 資料計算角色數值
      */
-    static calculateStatsFromPoB(buildInfo, config) {
+    static calculateStatsFromPoB(buildInfo, config, playerStats = {}) {
         const level = buildInfo.level || 90
         const baseLife = 38 + (level - 1) * 12
 
@@ -342,15 +361,22 @@ export default class BuildDataTransformer {
         const configMana = this.extractConfigValue(config, ['Mana', 'TotalMana', 'MaxMana'])
         const configES = this.extractConfigValue(config, ['EnergyShield', 'ES', 'MaxES'])
 
+        // PoB 匯出的 PlayerStat 為實際計算結果，優先使用
+        const stat = (key) => {
+            const value = playerStats[key]
+            return value === undefined ? null : Math.round(value)
+        }
+        const dps = stat('FullDPS') || stat('CombinedDPS') || stat('TotalDPS')
+
         return {
-            life: configLife || baseLife,
-            energy_shield: configES || 0,
-            mana: configMana || 300 + (level * 8),
-            dps: configDPS || 0,
-            fire_res: 75,
-            cold_res: 75,
-            lightning_res: 75,
-            chaos_res: 0
+            life: stat('Life') ?? (configLife || baseLife),
+            energy_shield: stat('EnergyShield') ?? (configES || 0),
+            mana: stat('Mana') ?? (configMana || 300 + (level * 8)),
+            dps: dps || configDPS || 0,
+            fire_res: stat('FireResist') ?? 75,
+            cold_res: stat('ColdResist') ?? 75,
+            lightning_res: stat('LightningResist') ?? 75,
+            chaos_res: stat('ChaosResist') ?? 0
         }
     }
 
@@ -42,7 +42,7 @@ export const useBuildStore = defineStore('build', {
         const result = await pobApi.parsePobCode(pobCode)
 
         if (result.status === 'success') {
-          this.playerBuild = BuildDataTransformer.transformPobDataToBuild(result.data)
+          this.playerBuild = BuildDataTransformer.transformPobDataToBuild(result.data, result.player_stat_names)
           this.playerPobCode = pobCode  // 保存原始 PoB 代碼
           console.log('玩家角色載入成功:', this.playerBuild)
 
@@ -77,7 +77,7 @@ export const useBuildStore = defineStore('build', {
         const result = await pobApi.parsePobCode(pobCode)
 
         if (result.status === 'success') {
-          this.targetBuild = BuildDataTransformer.transformPobDataToBuild(result.data)
+          this.targetBuild = BuildDataTransformer.transformPobDataToBuild(result.data, result.player_stat_names)
           this.targetPobCode = pobCode  // 保存原始 PoB 代碼
           console.log('目標流派載入成功:', this.targetBuild)
 